@@ -0,0 +1,81 @@
+"""
+Benchmark - getting the line details of every top-level block in a synthetic 10,000 line module.
+Compares get_el_lines_dets run per block element (gathers every line number in the module for every block)
+with get_blocks_lines_dets (one pass over the AST statements).
+
+$ python benchmarks/block_lines_benchmark.py
+"""
+from pathlib import Path
+import sys
+from textwrap import dedent
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).parent.parent))  ## so it runs from a source checkout
+
+from superhelp import messages
+from superhelp.ast_funcs import general as ast_gen
+
+N_LINES = 10_000
+N_OLD_SAMPLE_BLOCKS = 50  ## the per block approach takes minutes over the whole module so time a sample and scale up
+
+BLOCK_TEMPLATES = [
+    dedent("""\
+        @decorator
+        def func_{n}(a, b=None):
+            \"\"\"
+            Docstring
+            \"\"\"
+            if a > {n}:
+                return a
+            return b
+        """),
+    dedent("""\
+        fruit_{n} = [
+            'apple',
+            'banana',
+        ]  # trailing comment
+        """),
+    "total_{n} = {n} + 1; count_{n} = 0\n",
+    dedent("""\
+        class Thing{n}:
+            size = {n}
+
+            def method(self):
+                return self.size
+        """),
+]
+
+def get_synthetic_module(n_lines=N_LINES) -> str:
+    blocks = []
+    total_lines = 0
+    n = 0
+    while total_lines < n_lines:
+        block = BLOCK_TEMPLATES[n % len(BLOCK_TEMPLATES)].format(n=n)
+        blocks.append(block)
+        total_lines += block.count('\n')
+        n += 1
+    return '\n'.join(blocks)
+
+def main():
+    snippet = get_synthetic_module()
+    snippet_context = messages.get_snippet_context(snippet)
+    print(f"Synthetic module: {snippet_context.n_lines:,} lines, "
+        f"{len(snippet_context.block_els):,} top-level blocks")
+    n_blocks = len(snippet_context.block_els)
+    sample_block_els = snippet_context.block_els[:N_OLD_SAMPLE_BLOCKS]
+    start = perf_counter()
+    old_lines_dets = [ast_gen.get_el_lines_dets(block_el) for block_el in sample_block_els]
+    old_secs = (perf_counter() - start) * n_blocks / len(sample_block_els)
+    start = perf_counter()
+    new_lines_dets = ast_gen.get_blocks_lines_dets(snippet_context.tree.body)
+    new_secs = perf_counter() - start
+    assert old_lines_dets == new_lines_dets[:N_OLD_SAMPLE_BLOCKS]
+    print(f"get_el_lines_dets per block: {old_secs:,.1f}s (estimated from the first {len(sample_block_els)} blocks)")
+    print(f"get_blocks_lines_dets: {new_secs * 1_000:,.2f}ms ({old_secs / new_secs:,.0f}x faster)")
+    start = perf_counter()
+    messages.get_block_specs(snippet_context)
+    print(f"get_block_specs (all blocks): {(perf_counter() - start) * 1_000:,.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
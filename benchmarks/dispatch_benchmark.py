@@ -0,0 +1,55 @@
+"""
+Micro-benchmark - dispatching top-level blocks to indiv_block_help helpers.
+Compares running every helper's xpath over the whole module and climbing back up to each match's block
+with building the tag index once per module and looking up each helper's tags in it.
+
+$ python benchmarks/dispatch_benchmark.py
+"""
+from pathlib import Path
+import sys
+from timeit import timeit
+
+sys.path.insert(0, str(Path(__file__).parent.parent))  ## so it runs from a source checkout
+
+from superhelp import conf, helpers, messages
+
+conf.INCLUDE_LINTING = False  ## not what we're measuring
+helpers.load_helpers()
+
+N_RUNS = 5
+
+def get_corpus_snippet_contexts() -> list[messages.SnippetContext]:
+    tests_path = Path(__file__).parent.parent / 'tests'
+    return [messages.get_snippet_context(file_path.read_text())
+        for file_path in sorted(tests_path.glob('*.py'))]
+
+def dispatch_by_xpath(snippet_context, block_specs):
+    for helper_spec in helpers.INDIV_BLOCK_HELPERS:
+        if not isinstance(helper_spec, helpers.IndivBlockHelperSpec) or not helper_spec.xpath:
+            continue
+        block_els = {element.xpath('ancestor-or-self::*')[2] for element in helper_spec.compiled_xpath(snippet_context.xml)}
+        [block_spec for block_spec in block_specs if block_spec.element in block_els]
+
+def dispatch_by_tag(snippet_context, block_specs):
+    tag2block_idxs = messages.get_tag2block_idxs(snippet_context.block_els)  ## include building the index
+    for helper_spec in helpers.INDIV_BLOCK_HELPERS:
+        if not isinstance(helper_spec, helpers.IndivBlockHelperSpec) or not helper_spec.xpath:
+            continue
+        messages._get_filtered_block_specs(helper_spec, block_specs, tag2block_idxs)
+
+def main():
+    snippet_contexts = get_corpus_snippet_contexts()
+    n_lines = sum(snippet_context.n_lines for snippet_context in snippet_contexts)
+    print(f"Corpus: {len(snippet_contexts)} test modules, {n_lines:,} lines")
+    contexts_and_specs = [(snippet_context, messages.get_block_specs(snippet_context))
+        for snippet_context in snippet_contexts]
+    timings = {}
+    for label, dispatch in [('xpath', dispatch_by_xpath), ('tag index', dispatch_by_tag)]:
+        timings[label] = timeit(lambda: [dispatch(*context_and_specs) for context_and_specs in contexts_and_specs],
+            number=N_RUNS) / N_RUNS
+        print(f"Dispatch by {label}: {timings[label] * 1_000:,.1f}ms")
+    print(f"Tag index {timings['xpath'] / timings['tag index']:.1f}x faster")
+
+
+if __name__ == '__main__':
+    main()
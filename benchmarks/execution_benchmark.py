@@ -0,0 +1,43 @@
+"""
+Benchmark - getting the values of every assigned collection in a synthetic module with execute_code on.
+Compares running all the code up to and including the block for every name
+(as get_val used to) with SnippetExecution (each block run once and values looked up).
+
+$ python benchmarks/execution_benchmark.py
+"""
+from pathlib import Path
+import sys
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).parent.parent))  ## so it runs from a source checkout
+
+from superhelp import code_execution, conf, messages
+
+N_BLOCKS = 1_000
+
+def get_synthetic_module(n_blocks=N_BLOCKS) -> str:
+    return '\n'.join(f"fruit_{n} = ['apple', 'banana', {n}]" for n in range(n_blocks))
+
+def get_val_by_exec(block_spec, name):
+    namespace = {}
+    exec(block_spec.pre_block_code_str + block_spec.block_code_str, namespace)
+    return namespace[name]
+
+def main():
+    snippet = get_synthetic_module()
+    block_specs = messages.get_block_specs(messages.get_snippet_context(snippet))
+    print(f"Synthetic module: {len(block_specs):,} collection assignments")
+    start = perf_counter()
+    old_vals = [get_val_by_exec(block_spec, f"fruit_{n}") for n, block_spec in enumerate(block_specs)]
+    old_secs = perf_counter() - start
+    start = perf_counter()
+    new_vals = [code_execution.get_val(block_spec, conf.STD_NAME, [f"fruit_{n}"], f"fruit_{n}")
+        for n, block_spec in enumerate(block_specs)]
+    new_secs = perf_counter() - start
+    assert old_vals == new_vals
+    print(f"Executing up to each block: {old_secs:,.2f}s")
+    print(f"Incremental execution: {new_secs:,.2f}s ({old_secs / new_secs:,.0f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
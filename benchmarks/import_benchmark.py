@@ -0,0 +1,38 @@
+"""
+Benchmark - how long importing SuperHELP takes in a fresh process
+(once the helper manifest has been made so helper modules are registered without being imported).
+
+$ python benchmarks/import_benchmark.py
+"""
+from pathlib import Path
+import subprocess
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))  ## so it runs from a source checkout
+
+from superhelp import helpers, helper_manifest
+
+N_RUNS = 5
+
+CHECK_IMPORT = """\
+import time
+start = time.perf_counter()
+import superhelp
+print(time.perf_counter() - start)
+"""
+
+def main():
+    helpers.load_helpers()
+    helper_manifest.store_helper_manifest()  ## as made on first run
+    package_path = Path(__file__).parent.parent
+    import_secs = []
+    for _n in range(N_RUNS):
+        result = subprocess.run([sys.executable, '-c', CHECK_IMPORT], cwd=package_path,
+            capture_output=True, text=True, check=True)
+        import_secs.append(float(result.stdout))
+    print(f"Import superhelp: best {min(import_secs) * 1_000:,.1f}ms; "
+        f"worst {max(import_secs) * 1_000:,.1f}ms (of {N_RUNS} runs)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""
+Benchmark - the full pipeline (code items to formatted help) for every output format over
+generated modules of increasing size and a corpus of real standard library modules (benchmarks/corpus/stdlib).
+
+For each corpus and format reports throughput (lines / sec and files / sec), peak RSS,
+and where the time went by stage and by helper (see profiling). Each case runs in a fresh process so peak RSS is for that case only.
+Help is formatted but not displayed (no browser tabs or terminal output) and nothing comes from the analysis cache.
+
+Results are saved as JSON (by default in benchmarks/results named after the current commit)
+so a regression can be found by comparing the results from two commits.
+
+$ python benchmarks/pipeline_benchmark.py
+$ python benchmarks/pipeline_benchmark.py --sizes 100 1000 --formats json md
+$ python benchmarks/pipeline_benchmark.py --sizes 20000 --formats json --block-by-block-min-lines 0
+$ python benchmarks/pipeline_benchmark.py --compare benchmarks/results/pipeline_abc1234.json benchmarks/results/pipeline_def5678.json
+$ python benchmarks/pipeline_benchmark.py --compare OLD.json NEW.json --helpers magic_number short_name_check
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import json
+import multiprocessing
+from pathlib import Path
+import platform
+import resource
+import subprocess
+import sys
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).parent.parent))  ## so it runs from a source checkout
+
+from superhelp import conf
+from superhelp.conf import Format
+
+BENCHMARKS_PATH = Path(__file__).parent
+STDLIB_CORPUS_PATH = BENCHMARKS_PATH / 'corpus' / 'stdlib'
+RESULTS_PATH = BENCHMARKS_PATH / 'results'
+SIZES = [100, 1_000, 5_000, 20_000]  ## lines in each generated module (approx)
+FORMATS = [Format.JSON, Format.MD, Format.HTML, Format.CLI]
+
+MODULE_UNIT = '''\
+def get_total_{n}(items, factor=2):
+    """
+    Total of the items once scaled.
+    """
+    total = 0
+    for i in range(len(items)):
+        total = total + items[i] * factor
+    return total
+
+
+class Fruit{n}:
+
+    def __init__(self, name, price):
+        self.name = name
+        self.price = price
+
+    def describe(self):
+        return 'Fruit: ' + self.name + ' costs ' + str(self.price)
+
+
+fruits_{n} = ['apple', 'banana', 'cherry', 'date', 'elderberry']
+prices_{n} = {{'apple': 1.5, 'banana': 0.25, 'cherry': {n}}}
+if len(fruits_{n}) > 3:
+    message_{n} = f"{{len(fruits_{n})}} fruits"
+else:
+    message_{n} = 'Few fruits'
+'''
+
+def get_generated_module(n_lines: int) -> str:
+    """
+    Realistic(ish) code with something for most helpers to say. As close to n_lines as whole units allow.
+    """
+    unit_lines = MODULE_UNIT.count('\n') + 1  ## including the blank line between units
+    n_units = max(1, round(n_lines / unit_lines))
+    return '\n'.join(MODULE_UNIT.format(n=n) for n in range(n_units))
+
+def get_corpora(sizes: list[int]) -> dict[str, list[tuple[str, str]]]:
+    """
+    :return: code items (code and name) by corpus name
+    """
+    corpora = {f"generated_{size}_lines": [(get_generated_module(size), f"generated_{size}.py")] for size in sizes}
+    corpora['stdlib'] = [(file_path.read_text(encoding='utf-8'), file_path.name)
+        for file_path in sorted(STDLIB_CORPUS_PATH.glob('*.py'))]
+    return corpora
+
+def _get_peak_rss_mib() -> float:
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / (1024 ** 2 if sys.platform == 'darwin' else 1024)  ## bytes on macOS, KiB elsewhere
+
+def run_case(code_items: list[tuple[str, str]], format_name: Format, block_by_block_min_lines: int) -> dict:
+    """
+    Run in a fresh process.
+
+    :param block_by_block_min_lines: see conf.BLOCK_BY_BLOCK_MIN_LINES e.g. 0 to convert every module into XML
+     a block at a time and compare peak RSS with converting whole modules
+    """
+    conf.BLOCK_BY_BLOCK_MIN_LINES = block_by_block_min_lines
+    from superhelp.helper import OutputSettings, Pipeline
+    output_settings = OutputSettings(format_name=format_name, use_cache=False, profile=True)
+    session = Pipeline.new_session(output_settings)
+    start_rss_mib = _get_peak_rss_mib()
+    start = perf_counter()
+    code_items_dets = Pipeline.get_code_items_dets(
+        ((code, Path(name)) for code, name in code_items), output_settings=output_settings, session=session)
+    for _formatted_help_dets in Pipeline.get_formatted_help_dets(code_items_dets, output_settings, session=session):
+        pass
+    secs = perf_counter() - start
+    n_lines = sum(code.count('\n') + 1 for code, _name in code_items)
+    profile_dict = session.profile.to_dict()
+    return {
+        'files': len(code_items),
+        'lines': n_lines,
+        'secs': secs,
+        'lines_per_sec': n_lines / secs,
+        'files_per_sec': len(code_items) / secs,
+        'start_rss_mib': start_rss_mib,  ## before the run (helpers, the linter etc. are loaded as the run needs them)
+        'peak_rss_mib': _get_peak_rss_mib(),
+        'stages': profile_dict['stages'],
+        'helper_secs': {helper_name: timing['total_secs'] + timing['filter_secs']  ## calls plus filtering
+            for helper_name, timing in profile_dict['helpers'].items()},
+    }
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARKS_PATH,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def run(sizes: list[int], format_names: list[Format], *,
+        block_by_block_min_lines: int = conf.BLOCK_BY_BLOCK_MIN_LINES) -> dict:
+    cases = []
+    for corpus_name, code_items in get_corpora(sizes).items():
+        for format_name in format_names:
+            ## a fresh process for each case (spawned not forked) so peak RSS isn't inherited
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                case = executor.submit(run_case, code_items, format_name, block_by_block_min_lines).result()
+            case = {'corpus': corpus_name, 'format': str(format_name), **case}
+            print(f"{corpus_name:<22} {format_name:<5} {case['lines']:>7,} lines {case['secs']:>8.2f}s "
+                f"{case['lines_per_sec']:>9,.0f} lines/s {case['files_per_sec']:>7.2f} files/s "
+                f"peak RSS {case['peak_rss_mib']:>7.1f} MiB")
+            cases.append(case)
+    return {
+        'commit': get_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'block_by_block_min_lines': block_by_block_min_lines,
+        'cases': cases,
+    }
+
+def compare(old_path: Path, new_path: Path, helper_names: list[str] | None = None):
+    """
+    Show how each case changed from one set of results to the other (matching on corpus and format).
+
+    :param helper_names: if supplied, also show how these helpers changed (the end of the full name is enough
+     e.g. magic_number)
+    """
+    old_results = json.loads(old_path.read_text())
+    new_results = json.loads(new_path.read_text())
+    key2old_case = {(case['corpus'], case['format']): case for case in old_results['cases']}
+    print(f"{old_results['commit']} -> {new_results['commit']}")
+    for new_case in new_results['cases']:
+        old_case = key2old_case.get((new_case['corpus'], new_case['format']))
+        if not old_case:
+            continue
+        speed_ratio = new_case['lines_per_sec'] / old_case['lines_per_sec']
+        rss_ratio = new_case['peak_rss_mib'] / old_case['peak_rss_mib']
+        print(f"{new_case['corpus']:<22} {new_case['format']:<5} "
+            f"lines/s x{speed_ratio:.2f} ({old_case['lines_per_sec']:,.0f} -> {new_case['lines_per_sec']:,.0f}) "
+            f"peak RSS x{rss_ratio:.2f} ({old_case['peak_rss_mib']:.1f} -> {new_case['peak_rss_mib']:.1f} MiB)")
+        old_helper_secs = old_case.get('helper_secs', {})
+        for helper_name, new_secs in new_case.get('helper_secs', {}).items():
+            if not any(helper_name.endswith(name) for name in helper_names or []):
+                continue
+            old_secs = old_helper_secs.get(helper_name)
+            if old_secs:
+                print(f"    {helper_name:<60} x{old_secs / new_secs:>6.2f} faster "
+                    f"({old_secs * 1_000:,.1f} -> {new_secs * 1_000:,.1f}ms)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the full SuperHELP pipeline")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES,
+        help="Lines in each generated module")
+    parser.add_argument('--formats', type=Format, nargs='+', default=FORMATS, choices=FORMATS,
+        help="Output formats")
+    parser.add_argument('--block-by-block-min-lines', type=int, default=conf.BLOCK_BY_BLOCK_MIN_LINES,
+        help="Modules with at least this many lines are converted into XML a block at a time (0 for every module)")
+    parser.add_argument('--output', type=Path, required=False,
+        help="Where to save the results (default benchmarks/results/pipeline_<commit>.json)")
+    parser.add_argument('--compare', type=Path, nargs=2, metavar=('OLD', 'NEW'),
+        help="Compare two saved results instead of running the benchmark")
+    parser.add_argument('--helpers', nargs='+', required=False,
+        help="When comparing, also compare these helpers e.g. magic_number")
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare, helper_names=args.helpers)
+        return
+    results = run(args.sizes, args.formats, block_by_block_min_lines=args.block_by_block_min_lines)
+    output_path = args.output or RESULTS_PATH / f"pipeline_{results['commit']}.json"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(results, indent=2))
+    print(f"Results saved to {output_path}")
+
+
+if __name__ == '__main__':
+    main()
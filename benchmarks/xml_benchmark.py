@@ -0,0 +1,53 @@
+"""
+Micro-benchmark - converting the AST into XML with astpath (convert_to_xml) vs SuperHELP's own converter (ast_xml)
+over the standard library corpus (benchmarks/corpus/stdlib) and a large generated module.
+
+$ python -m pip install -r requirements-dev.txt  ## astpath isn't needed by SuperHELP itself
+$ python benchmarks/xml_benchmark.py
+"""
+import ast
+from pathlib import Path
+import sys
+from timeit import repeat
+
+sys.path.insert(0, str(Path(__file__).parent.parent))  ## so it runs from a source checkout
+
+import astpath
+
+from superhelp.ast_xml import convert_to_xml
+
+BENCHMARKS_PATH = Path(__file__).parent
+N_RUNS = 5
+N_GENERATED_LINES = 20_000
+
+def get_corpora() -> dict[str, list[ast.Module]]:
+    from pipeline_benchmark import get_generated_module  ## same generated code as the pipeline benchmark
+    stdlib_trees = [ast.parse(file_path.read_text(encoding='utf-8'))
+        for file_path in sorted((BENCHMARKS_PATH / 'corpus' / 'stdlib').glob('*.py'))]
+    return {
+        'stdlib': stdlib_trees,
+        f'generated_{N_GENERATED_LINES}_lines': [ast.parse(get_generated_module(N_GENERATED_LINES))],
+    }
+
+def compare(label: str, trees: list[ast.Module]):
+    def run_astpath():
+        for tree in trees:
+            astpath.asts.convert_to_xml(tree)
+    def run_own():
+        for tree in trees:
+            convert_to_xml(tree)
+    ## best of several runs - the least disturbed by everything else going on
+    astpath_secs = min(repeat(run_astpath, number=1, repeat=N_RUNS))
+    own_secs = min(repeat(run_own, number=1, repeat=N_RUNS))
+    n_nodes = sum(1 for tree in trees for _node in ast.walk(tree))
+    print(f"{label} ({len(trees)} modules, {n_nodes:,} nodes): "
+        f"astpath {astpath_secs * 1_000:,.1f}ms vs ast_xml {own_secs * 1_000:,.1f}ms "
+        f"({astpath_secs / own_secs:.1f}x faster)")
+
+def main():
+    for label, trees in get_corpora().items():
+        compare(label, trees)
+
+
+if __name__ == '__main__':
+    main()
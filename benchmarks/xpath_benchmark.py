@@ -0,0 +1,74 @@
+"""
+Micro-benchmark - raw string xpaths (el.xpath(xpath)) vs precompiled xpaths (gen_utils.run_xpath)
+over the test corpus i.e. the modules in the tests folder.
+
+Covers the xpaths registered by indiv_block_help helpers (run against whole modules)
+and the xpaths helpers run internally (run against every top-level block).
+
+$ python benchmarks/xpath_benchmark.py
+"""
+from pathlib import Path
+import sys
+from timeit import timeit
+
+sys.path.insert(0, str(Path(__file__).parent.parent))  ## so it runs from a source checkout
+
+from superhelp import conf, gen_utils, helpers, messages
+
+conf.INCLUDE_LINTING = False  ## not what we're measuring
+helpers.load_helpers()
+
+N_RUNS = 5
+
+def get_corpus_snippet_contexts() -> list[messages.SnippetContext]:
+    tests_path = Path(__file__).parent.parent / 'tests'
+    return [messages.get_snippet_context(file_path.read_text())
+        for file_path in sorted(tests_path.glob('*.py'))]
+
+def get_internal_xpaths(snippet_contexts: list[messages.SnippetContext]) -> list[str]:
+    """
+    Run every helper over the corpus recording the expressions run through the shared cache.
+    """
+    xpaths_seen = set()
+    orig_get_compiled_xpath = gen_utils.get_compiled_xpath
+    def recording_get_compiled_xpath(xpath):
+        xpaths_seen.add(xpath)
+        return orig_get_compiled_xpath(xpath)
+    gen_utils.get_compiled_xpath = recording_get_compiled_xpath
+    try:
+        for snippet_context in snippet_contexts:
+            messages.get_separated_message_specs(snippet_context, execute_code=False)
+    finally:
+        gen_utils.get_compiled_xpath = orig_get_compiled_xpath
+    return sorted(xpaths_seen)
+
+def compare(label: str, xpaths: list[str], els: list):
+    def run_raw():
+        for el in els:
+            for xpath in xpaths:
+                el.xpath(xpath)
+    def run_compiled():
+        for el in els:
+            for xpath in xpaths:
+                gen_utils.run_xpath(el, xpath)
+    raw_secs = timeit(run_raw, number=N_RUNS) / N_RUNS
+    compiled_secs = timeit(run_compiled, number=N_RUNS) / N_RUNS
+    print(f"{label} ({len(xpaths)} xpaths x {len(els):,} elements): "
+        f"raw {raw_secs * 1_000:,.1f}ms vs compiled {compiled_secs * 1_000:,.1f}ms "
+        f"({raw_secs / compiled_secs:.1f}x faster)")
+
+def main():
+    snippet_contexts = get_corpus_snippet_contexts()
+    n_lines = sum(snippet_context.n_lines for snippet_context in snippet_contexts)
+    print(f"Corpus: {len(snippet_contexts)} test modules, {n_lines:,} lines")
+    registered_xpaths = sorted({helper_spec.xpath for helper_spec in helpers.INDIV_BLOCK_HELPERS
+        if isinstance(helper_spec, helpers.IndivBlockHelperSpec) and helper_spec.xpath})
+    module_els = [snippet_context.xml for snippet_context in snippet_contexts]
+    compare('Registered helper xpaths over whole modules', registered_xpaths, module_els)
+    internal_xpaths = [xpath for xpath in get_internal_xpaths(snippet_contexts) if xpath not in registered_xpaths]
+    block_els = [block_el for snippet_context in snippet_contexts for block_el in snippet_context.block_els]
+    compare('Internal helper xpaths over top-level blocks', internal_xpaths, block_els)
+
+
+if __name__ == '__main__':
+    main()
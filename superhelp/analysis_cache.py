@@ -0,0 +1,217 @@
+"""
+Persistent on-disk cache of isolated snippet details (see messages.IsolatedSnippetDets)
+so re-running SuperHELP on unchanged code skips parsing, helpers, and linting entirely.
+
+Entries are keyed by a hash of the code plus everything else that could change the result:
+the SuperHELP version, a fingerprint of the SuperHELP source (including every helper),
+and the options affecting analysis.
+Analysis which executes the code is never cached (see helper.Pipeline.get_analysis_cache) - what executed code does
+can depend on far more than the code (e.g. which modules are installed, what is in the files it reads).
+
+Isolated details don't depend on what was said about any other snippets
+so cached entries are reconciled like any others (messages.reconcile_isolated_snippet_dets).
+
+Once the cache grows beyond its size limit the least recently used entries are evicted.
+
+The cache lives in the user's own cache folder (see gen_utils.get_user_cache_dir) which only they can get at
+and entries are plain JSON - reading a cache entry can never run code, even one planted by someone else.
+Any entry not belonging to the current user is ignored.
+"""
+from dataclasses import asdict
+from functools import cache
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import tempfile
+
+from superhelp import conf, gen_utils, helpers
+from superhelp.messages import IsolatedSnippetDets, MessageLevelStrs, MessageSpec, RepeatVariant
+
+CACHE_ENTRY_SUFFIX = '.json'
+
+@cache
+def get_superhelp_version() -> str:
+    from importlib import metadata  ## slow to import and only needed when caching
+    try:
+        version = metadata.version('superhelp')
+    except metadata.PackageNotFoundError:  ## e.g. running from a source checkout - the code fingerprint still protects us
+        version = 'unknown'
+    return version
+
+@cache
+def get_code_fingerprint() -> str:
+    """
+    Any change to SuperHELP code (a new helper, a reworded message, a change in a lint setting etc)
+    has to invalidate cached results. Hashing all the source is cheap compared with analysing even one module.
+    """
+    hasher = hashlib.sha256()
+    package_path = Path(__file__).parent
+    for source_path in sorted(package_path.rglob('*.py')):
+        hasher.update(source_path.relative_to(package_path).as_posix().encode('utf-8'))
+        hasher.update(source_path.read_bytes())
+    all_helper_specs = helpers.INDIV_BLOCK_HELPERS + helpers.MULTI_BLOCK_HELPERS + helpers.SNIPPET_STR_HELPERS
+    for helper_name in sorted(helper_spec.helper_name for helper_spec in all_helper_specs):
+        hasher.update(helper_name.encode('utf-8'))
+    return hasher.hexdigest()
+
+def _message_spec_from_json(message_spec_dict: dict) -> MessageSpec:
+    message_level_strs = MessageLevelStrs(**message_spec_dict.pop('message_level_strs'))
+    return MessageSpec(message_level_strs=message_level_strs, **message_spec_dict)
+
+def _repeat_variants_to_json(repeat_variants: dict[int, RepeatVariant]) -> list:
+    return [[n, repeat_variant.helper_name,
+            None if repeat_variant.message_spec is None else asdict(repeat_variant.message_spec),
+            None if repeat_variant.reminded_message_spec is None else asdict(repeat_variant.reminded_message_spec)]
+        for n, repeat_variant in repeat_variants.items()]
+
+def _repeat_variants_from_json(repeat_variants_list: list) -> dict[int, RepeatVariant]:
+    return {n: RepeatVariant(helper_name,
+            None if message_spec_dict is None else _message_spec_from_json(message_spec_dict),
+            None if reminded_message_spec_dict is None else _message_spec_from_json(reminded_message_spec_dict))
+        for n, helper_name, message_spec_dict, reminded_message_spec_dict in repeat_variants_list}
+
+def isolated_snippet_dets_to_json(isolated_snippet_dets: IsolatedSnippetDets) -> str:
+    """
+    :raises TypeError: if a prepared input (see helpers.OverallCodeHelperSpec) can't be stored as JSON
+    """
+    return json.dumps({
+        'snippet': isolated_snippet_dets.snippet,
+        'overall_message_specs': [asdict(message_spec)
+            for message_spec in isolated_snippet_dets.overall_message_specs],
+        'block_message_specs': [asdict(message_spec) for message_spec in isolated_snippet_dets.block_message_specs],
+        'overall_repeat_variants': _repeat_variants_to_json(isolated_snippet_dets.overall_repeat_variants),
+        'block_repeat_variants': _repeat_variants_to_json(isolated_snippet_dets.block_repeat_variants),
+        'fired_helper_names': sorted(isolated_snippet_dets.fired_helper_names),
+        'f_str_reminded': isolated_snippet_dets.f_str_reminded,
+        'multi_block': isolated_snippet_dets.multi_block,
+        'prepared_inputs': isolated_snippet_dets.prepared_inputs,
+    })
+
+def isolated_snippet_dets_from_json(json_str: str) -> IsolatedSnippetDets:
+    """
+    Prepared inputs come back as JSON has them e.g. tuples as lists
+    """
+    dets = json.loads(json_str)
+    return IsolatedSnippetDets(
+        snippet=dets['snippet'],
+        overall_message_specs=[_message_spec_from_json(message_spec_dict)
+            for message_spec_dict in dets['overall_message_specs']],
+        block_message_specs=[_message_spec_from_json(message_spec_dict)
+            for message_spec_dict in dets['block_message_specs']],
+        overall_repeat_variants=_repeat_variants_from_json(dets['overall_repeat_variants']),
+        block_repeat_variants=_repeat_variants_from_json(dets['block_repeat_variants']),
+        fired_helper_names=set(dets['fired_helper_names']),
+        f_str_reminded=dets['f_str_reminded'],
+        multi_block=dets['multi_block'],
+        prepared_inputs=dets['prepared_inputs'],
+    )
+
+def get_analysis_cache(cache_path: Path | None = None) -> 'AnalysisCache | None':
+    """
+    :return: None if the cache folder can't be used (e.g. it belongs to someone else) - analysis just isn't cached
+    """
+    try:
+        return AnalysisCache(cache_path)
+    except OSError as e:
+        logging.warning(f"Not caching analysis - {e}")
+        return None
+
+
+class AnalysisCache:
+
+    def __init__(self, cache_path: Path | None = None, *, max_bytes: int = conf.MAX_ANALYSIS_CACHE_BYTES):
+        """
+        :raises PermissionError: if the cache folder belongs to someone else (see gen_utils.make_private_dir)
+        """
+        if cache_path is None:
+            cache_path = gen_utils.get_user_cache_dir(folder=conf.SUPERHELP_ANALYSIS_CACHE)
+        self.cache_path = gen_utils.make_private_dir(cache_path)
+        self.max_bytes = max_bytes
+        self._total_bytes = None  ## only worked out the first time something is stored
+
+    @staticmethod
+    def get_key(code: str, *, warnings_only=False) -> str:
+        """
+        Only for analysis without executing code (see module docstring)
+        """
+        hasher = hashlib.sha256()
+        key_parts = [get_superhelp_version(), get_code_fingerprint(),
+            f"{warnings_only=}", f"{conf.INCLUDE_LINTING=}",
+            f"{conf.BLOCK_BY_BLOCK_MIN_LINES=}", code]
+        for key_part in key_parts:
+            hasher.update(key_part.encode('utf-8'))
+            hasher.update(b'\0')  ## so parts can't run into each other
+        return hasher.hexdigest()
+
+    def _get_entry_path(self, key: str) -> Path:
+        return self.cache_path / f"{key}{CACHE_ENTRY_SUFFIX}"
+
+    def get(self, key: str) -> IsolatedSnippetDets | None:
+        entry_path = self._get_entry_path(key)
+        try:
+            with open(entry_path, encoding='utf-8') as f:
+                if not gen_utils.is_owned_by_user(os.fstat(f.fileno())):
+                    raise ValueError("not written by the current user")
+                isolated_snippet_dets = isolated_snippet_dets_from_json(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:  ## e.g. truncated by a crash part way through writing - just start again
+            logging.debug(f"Discarding unreadable cache entry {entry_path} - {e}")
+            entry_path.unlink(missing_ok=True)
+            return None
+        try:
+            os.utime(entry_path)  ## recently used so last in line for eviction
+        except OSError:
+            pass
+        return isolated_snippet_dets
+
+    def store(self, key: str, isolated_snippet_dets: IsolatedSnippetDets):
+        """
+        Written to a temporary file first and then moved into place
+        so concurrent runs never see a partially written entry.
+        """
+        try:
+            json_str = isolated_snippet_dets_to_json(isolated_snippet_dets)
+        except TypeError as e:
+            logging.debug(f"Not caching snippet details - {e}")
+            return
+        entry_path = self._get_entry_path(key)
+        with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', dir=self.cache_path, delete=False) as tmp_fh:
+            tmp_fh.write(json_str)
+        os.replace(tmp_fh.name, entry_path)
+        if self._total_bytes is None:
+            self._total_bytes = self._get_total_bytes()
+        else:
+            self._total_bytes += entry_path.stat().st_size
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def _get_entries_dets(self) -> list[tuple[float, int, Path]]:
+        entries_dets = []
+        for entry_path in self.cache_path.glob(f"*{CACHE_ENTRY_SUFFIX}"):
+            try:
+                stat = entry_path.stat()
+            except FileNotFoundError:  ## another run evicted it
+                continue
+            entries_dets.append((stat.st_mtime, stat.st_size, entry_path))
+        return entries_dets
+
+    def _get_total_bytes(self) -> int:
+        return sum(size for _mtime, size, _entry_path in self._get_entries_dets())
+
+    def evict(self):
+        """
+        Evict least recently used entries until comfortably under the size limit
+        (so we aren't evicting again on the very next store).
+        """
+        target_bytes = int(self.max_bytes * 0.9)
+        entries_dets = sorted(self._get_entries_dets())  ## oldest first
+        total_bytes = sum(size for _mtime, size, _entry_path in entries_dets)
+        for _mtime, size, entry_path in entries_dets:
+            if total_bytes <= target_bytes:
+                break
+            entry_path.unlink(missing_ok=True)
+            total_bytes -= size
+        self._total_bytes = total_bytes
@@ -0,0 +1,28 @@
+"""
+Everything one run of SuperHELP keeps track of as it goes (e.g. from module to module in a project)
+so messages aren't repeated in full, lint types aren't explained twice, terminal help is in the right colours etc.
+
+A session is made for each run and handed explicitly to every stage that needs it (messages, helpers, formatters)
+so there is no state shared between runs - many runs can be in progress at once in the same process
+(e.g. a shared pool of threads serving many snippets).
+"""
+from dataclasses import dataclass, field
+
+from superhelp.conf import Theme
+from superhelp.profiling import Profile
+
+@dataclass
+class AnalysisSession:
+    theme_name: Theme = Theme.DARK  ## for terminal help
+    repeat_set: set[str] = field(default_factory=set)  ## helpers which have already given their full message
+    lint_supplemented: set[str] = field(default_factory=set)  ## lint message types already explained in full
+    f_str_reminded: bool = False  ## already suggested f-strings instead of other ways of combining strings
+    profile: Profile | None = None  ## where the time goes (only if profiling)
+
+    @property
+    def colours(self):
+        """
+        Terminal colours for the session's theme
+        """
+        from superhelp.formatters.cli_extras.cli_colour import get_theme_colours  ## only needed for terminal help
+        return get_theme_colours(self.theme_name)
@@ -1,7 +1,10 @@
+import ast
 import logging
 
 from superhelp import conf, gen_utils, utils
 
+SAFE_EXTRA_LINES = 10  ## see get_el_lines_dets
+
 def ast_detective(snippet: str):
     """
     You have a snippet and you're wondering how to identify its signature. Start by seeing ast as xml.
@@ -70,8 +73,9 @@ def get_el_lines_dets(el, *, ignore_trailing_lines=False) -> tuple[int, int, int
                 )
             )
         )
+
+    Note - for all the top-level blocks of a snippet at once use get_blocks_lines_dets.
     """
-    SAFE_EXTRA_LINES = 10
     line_no_strs = set(el.xpath('descendant-or-self::*[@lineno]/@lineno'))
     line_nos = [int(line_no_str) for line_no_str in line_no_strs]
     if not line_nos:
@@ -87,6 +91,10 @@ def get_el_lines_dets(el, *, ignore_trailing_lines=False) -> tuple[int, int, int
                 module_el.xpath('descendant::*[@lineno]/@lineno'))
             all_line_nos = [
                 int(line_no_str) for line_no_str in all_line_no_strs]
+            ## a block converted into XML on its own knows where the next block starts (see messages.SnippetContext)
+            following_line_no_str = module_el.get('following_lineno')
+            if following_line_no_str:
+                all_line_nos.append(int(following_line_no_str))
             subsequent_line_nos = [line_no for line_no in all_line_nos
                 if line_no > last_ast_line_no]
             if not subsequent_line_nos:
@@ -96,6 +104,40 @@ def get_el_lines_dets(el, *, ignore_trailing_lines=False) -> tuple[int, int, int
         el_lines_n = last_line_no - first_line_no + 1
     return first_line_no, last_line_no, el_lines_n
 
+def get_blocks_lines_dets(block_nodes: list[ast.stmt]) -> list[tuple[int, int, int]]:
+    """
+    Line details for every top-level block (i.e. the statements in the body of the AST Module) in one pass.
+    Same trailing lines approach as get_el_lines_dets (see there) but using the start and end line numbers
+    the AST already provides for each statement rather than gathering every line number in the module
+    for every block (which made getting block specs quadratic in the size of the snippet).
+
+    The first line of a decorated function or class is the first decorator line (the statement itself starts
+    at the def / class line). A block runs until the line before the next block starting after it ends
+    (usually the very next block) so trailing lines are included e.g. closing brackets and comments.
+    The last block gets SAFE_EXTRA_LINES added in case of anything trailing.
+
+    :param block_nodes: the statements in the body of the AST Module
+    :return: first_line_no, last_line_no, el_lines_n for each block in the same order
+    """
+    first_line_nos = [min([block_node.lineno]
+            + [decorator.lineno for decorator in getattr(block_node, 'decorator_list', [])])
+        for block_node in block_nodes]
+    end_line_nos = [block_node.end_lineno for block_node in block_nodes]
+    n_blocks = len(block_nodes)
+    blocks_lines_dets = []
+    next_idx = 0
+    for idx, (first_line_no, end_line_no) in enumerate(zip(first_line_nos, end_line_nos)):
+        ## blocks never end earlier than the one before so next_idx never needs to go backwards
+        next_idx = max(next_idx, idx + 1)
+        while next_idx < n_blocks and first_line_nos[next_idx] <= end_line_no:  ## e.g. a = 1; b = 2
+            next_idx += 1
+        if next_idx < n_blocks:
+            last_line_no = first_line_nos[next_idx] - 1
+        else:
+            last_line_no = end_line_no + SAFE_EXTRA_LINES
+        blocks_lines_dets.append((first_line_no, last_line_no, last_line_no - first_line_no + 1))
+    return blocks_lines_dets
+
 def store_ast_output(xml):
     """
     Useful for seeing what the original AST XML looks like that
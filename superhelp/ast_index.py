@@ -0,0 +1,149 @@
+"""
+Helpers working directly on AST nodes rather than the XML version of the tree (see helpers.ast_block_help).
+
+Converting the AST into XML is the most expensive part of getting ready to run the helpers
+and running xpath over it is usually the most expensive part of running them.
+A helper only needing to find nodes of some types, and look at their fields and parents,
+can use the AstIndex instead - built in a single walk of the tree.
+
+Values are read the way they appear in the XML (see xml_type and xml_value)
+so a helper ported from xpath says exactly what it used to.
+"""
+import ast
+from collections import defaultdict
+from numbers import Number
+import re
+
+## lxml refuses to set attributes with these in them (astpath then uses an empty string instead)
+XML_INCOMPATIBLE_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+## the same instances are shared throughout a parsed tree (e.g. every Load context) so they have no one parent
+SHARED_NODE_TYPES = (ast.expr_context, ast.boolop, ast.operator, ast.unaryop, ast.cmpop)
+## node types with a target or targets field e.g. Assign, For, comprehension
+TARGET_NODE_TYPES = sorted(name for name, node_type in vars(ast).items()
+    if isinstance(node_type, type) and issubclass(node_type, ast.AST)
+    and {'target', 'targets'} & set(node_type._fields))
+
+class AstIndex:
+    """
+    Built once per snippet in a single walk of the tree:
+    * the parent of every node
+    * the nodes in every top-level block (including the block node itself) by node type name e.g. 'Compare'.
+      In the order an xpath would find them (document order) so helpers see nodes in the same order as before.
+    """
+
+    def __init__(self, tree: ast.Module):
+        self.node2parent: dict[ast.AST, ast.AST] = {}
+        self.block_type_name2nodes: list[dict[str, list[ast.AST]]] = []
+        for block_node in tree.body:
+            self.node2parent[block_node] = tree
+            type_name2nodes = defaultdict(list)
+            nodes = [block_node]
+            while nodes:  ## iterative so no recursion limit on deeply nested code
+                node = nodes.pop()
+                type_name2nodes[node.__class__.__name__].append(node)
+                child_nodes = list(ast.iter_child_nodes(node))
+                for child_node in child_nodes:
+                    if not isinstance(child_node, SHARED_NODE_TYPES):
+                        self.node2parent[child_node] = node
+                nodes.extend(reversed(child_nodes))
+            self.block_type_name2nodes.append(dict(type_name2nodes))
+
+    def get_nodes(self, block_idx: int, *type_names: str) -> list[ast.AST]:
+        """
+        :return: nodes of the types in the block (in document order within each type)
+        """
+        type_name2nodes = self.block_type_name2nodes[block_idx]
+        if len(type_names) == 1:
+            return type_name2nodes.get(type_names[0], [])
+        return [node for type_name in type_names for node in type_name2nodes.get(type_name, [])]
+
+    def has_any(self, block_idx: int, type_names) -> bool:
+        type_name2nodes = self.block_type_name2nodes[block_idx]
+        return any(type_name in type_name2nodes for type_name in type_names)
+
+    def get_parent(self, node: ast.AST) -> ast.AST | None:
+        return self.node2parent.get(node)
+
+    def get_ancestor(self, node: ast.AST, ancestor_type: type[ast.AST]) -> ast.AST | None:
+        """
+        :return: nearest ancestor of the type (if any)
+        """
+        parent = self.node2parent.get(node)
+        while parent is not None:
+            if isinstance(parent, ancestor_type):
+                return parent
+            parent = self.node2parent.get(parent)
+        return None
+
+def xml_literal(value) -> str:
+    """
+    A scalar field value as astpath puts it in the XML e.g. 'caf&#233;' for 'café'
+    """
+    if isinstance(value, Number):
+        return str(value)
+    if not isinstance(value, str):
+        return ''  ## e.g. bytes or Ellipsis - unable to be encoded so an empty string
+    if value.isascii() and value.isprintable():  ## nearly every identifier and string - nothing to do
+        return value
+    value = value.encode('ascii', 'xmlcharrefreplace').decode('ascii')
+    if XML_INCOMPATIBLE_CHARS.search(value):
+        return ''
+    return value
+
+def _is_scalar(value) -> bool:
+    return value is not None and not isinstance(value, (ast.AST, list))
+
+def xml_type(node: ast.AST) -> str | None:
+    """
+    The type attribute astpath gives the node in the XML i.e. the type of its last scalar field (if any)
+    e.g. 'int' for Constant(value=1) and 'str' for Name(id='x')
+    """
+    type_name = None
+    for field_name in node._fields:
+        value = getattr(node, field_name, None)
+        if _is_scalar(value):
+            type_name = type(value).__name__
+    return type_name
+
+def xml_value(node: ast.AST, field_name: str) -> str | None:
+    """
+    The attribute astpath gives the node for the field in the XML (None if it has no such attribute)
+    """
+    value = getattr(node, field_name, None)
+    if not _is_scalar(value):
+        return None
+    return xml_literal(value)
+
+def val_dets(node: ast.AST) -> tuple[object, bool] | None:
+    """
+    See ast_funcs.val_dets
+
+    :return: value and whether it needs quoting (None if not an int, float or str)
+    """
+    const_type = xml_type(node)
+    raw_val = xml_value(node, 'value')
+    if const_type == 'int':
+        return int(raw_val), False
+    if const_type == 'float':
+        return float(raw_val), False
+    if const_type == 'str':
+        return raw_val, True
+    return None
+
+def _num_str_from_constant(node: ast.AST) -> str | None:
+    if xml_type(node) in ('int', 'float'):
+        return xml_value(node, 'value')
+    return None
+
+def num_str_from_node(node: ast.AST) -> str | None:
+    """
+    See ast_funcs.num_str_from_el e.g. '-1.5' for -1.5 (None if not a number)
+    """
+    if isinstance(node, ast.Constant):
+        return _num_str_from_constant(node)
+    if isinstance(node, ast.UnaryOp):
+        if not (isinstance(node.op, ast.USub) and isinstance(node.operand, ast.Constant)):
+            return None
+        pos_num = _num_str_from_constant(node.operand)
+        return None if pos_num is None else f'-{pos_num}'
+    return None
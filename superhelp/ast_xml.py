@@ -0,0 +1,204 @@
+"""
+Converting the AST into the XML the helpers' xpaths run against.
+
+Makes exactly the tree astpath's convert_to_xml makes (so every xpath keeps working) except that col_offset
+attributes are left out - nothing queries them. Each node becomes an element named after its type
+with lineno, a type attribute (the type of the node's last scalar field e.g. int for Constant(value=1)),
+and an attribute for each scalar field (e.g. id for Name). Each AST (or list) field becomes a child element
+named after the field holding the converted node(s) (or item elements for scalars e.g. Global names).
+
+E.g. x = 1 becomes
+<Module>
+  <body>
+    <Assign lineno="1">
+      <targets>
+        <Name lineno="1" type="str" id="x">
+          <ctx>
+            <Store/>
+          </ctx>
+        </Name>
+      </targets>
+      <value>
+        <Constant lineno="1" type="int" value="1"/>
+      </value>
+    </Assign>
+  </body>
+  <type_ignores/>
+</Module>
+
+Huge dict, list and tuple literals made of nothing but constants (lookup tables, embedded JSON etc) are collapsed.
+If there are more than conf.MAX_LITERAL_ITEMS_IN_XML items only the first conf.MAX_ITEMS_EVALUATED are kept
+(no helper looks at more) followed by a collapsed_items element with the total number of items (n_items)
+and the last line of the items left out (so the lines a block spans are unchanged) e.g.
+<elts>
+  <Constant lineno="1" type="int" value="0"/>
+  ...
+  <collapsed_items lineno="5000" n_items="5000"/>
+</elts>
+Every xpath then has orders of magnitude fewer elements to walk. The AST itself is left untouched.
+
+About 1.5x faster than astpath (see benchmarks/xml_benchmark.py) - most of what is left is lxml making elements.
+Elements are made with all their attributes in one SubElement call, every node's fields are only looked at once,
+tag names and fields are worked out once per node type, and values only need encoding if not plain ASCII.
+The tree is walked iteratively so there is no recursion limit on deeply nested (e.g. generated) code.
+"""
+import ast
+from dataclasses import dataclass
+
+from lxml import etree
+
+from superhelp import conf
+from superhelp.ast_index import xml_literal
+
+_SubElement = etree.SubElement
+
+COLLAPSIBLE_NODE_TYPES = (ast.Dict, ast.List, ast.Tuple)  ## not Set - set_overview works out which items are distinct
+## node type -> (tag, fields, collapsible) - worked out once for each type of node
+_node_type2dets: dict[type, tuple[str, tuple[str, ...], bool]] = {}
+
+@dataclass(frozen=True)
+class CollapsedItems:
+    """
+    Stands in for the items of a huge literal left out of the XML
+    """
+    n_items: int  ## all the items in the literal (including those kept)
+    last_line_no: int
+
+    @property
+    def attrib(self) -> dict[str, str]:
+        return {'lineno': str(self.last_line_no), 'n_items': str(self.n_items)}
+
+def _get_node_type_dets(node_type: type) -> tuple[str, tuple[str, ...], bool]:
+    node_type_dets = _node_type2dets.get(node_type)
+    if node_type_dets is None:
+        node_type_dets = (node_type.__name__, node_type._fields, issubclass(node_type, COLLAPSIBLE_NODE_TYPES))
+        _node_type2dets[node_type] = node_type_dets
+    return node_type_dets
+
+def _get_constants_last_line_no(nodes: list[ast.AST]) -> int | None:
+    """
+    :return: the last line any of the nodes start on if they are nothing but constants
+     e.g. 1, -1.5, 'a', None, (1, 2), {'a': [1, 2]} - otherwise None
+    """
+    last_line_no = 0
+    nodes = list(nodes)
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, ast.Constant):
+            pass
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.operand, ast.Constant):  ## e.g. -1
+            nodes.append(node.operand)
+        elif isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+            nodes.extend(node.elts)
+        elif isinstance(node, ast.Dict) and None not in node.keys:  ## a None key is **unpacking
+            nodes.extend(node.keys)
+            nodes.extend(node.values)
+        else:
+            return None
+        last_line_no = max(last_line_no, node.lineno)  ## lineno as in the XML
+    return last_line_no
+
+def get_collapsed_items(node: ast.AST) -> CollapsedItems | None:
+    """
+    What stands in for the items left out of a huge dict, list, or tuple literal
+    (None unless long enough and nothing but constants beyond the items kept)
+    """
+    item_nodes = node.values if isinstance(node, ast.Dict) else node.elts
+    n_items = len(item_nodes)
+    if n_items <= conf.MAX_LITERAL_ITEMS_IN_XML:
+        return None
+    left_out_nodes = item_nodes[conf.MAX_ITEMS_EVALUATED:]
+    if not left_out_nodes:  ## e.g. MAX_LITERAL_ITEMS_IN_XML set below MAX_ITEMS_EVALUATED - nothing to stand in for
+        return None
+    if isinstance(node, ast.Dict):
+        left_out_nodes = node.keys[conf.MAX_ITEMS_EVALUATED:] + left_out_nodes
+    last_line_no = _get_constants_last_line_no(left_out_nodes)
+    if last_line_no is None:
+        return None
+    return CollapsedItems(n_items, last_line_no)
+
+def _get_collapsed_child_fields(node: ast.AST, child_fields: list) -> list:
+    collapsed_items = get_collapsed_items(node)
+    if collapsed_items is None:
+        return child_fields
+    return [(field_name, value[:conf.MAX_ITEMS_EVALUATED] + [collapsed_items] if isinstance(value, list) else value)
+        for field_name, value in child_fields]
+
+def _get_attrib_and_child_fields(node: ast.AST, fields: tuple[str, ...],
+        collapsible=False) -> tuple[dict[str, str], list]:
+    """
+    A single pass through the node's fields
+
+    :param collapsible: a dict, list or tuple literal (which might be huge)
+    :return: attributes (lineno, type, then scalar fields - the same order as astpath sets them),
+     and the AST (or list) fields as (field name, value)
+    """
+    attrib = {}
+    lineno = getattr(node, 'lineno', None)
+    if lineno is not None:
+        attrib['lineno'] = str(lineno)
+    child_fields = []
+    for field_name in fields:
+        value = getattr(node, field_name, None)
+        if value is None:
+            continue
+        if isinstance(value, (ast.AST, list)):
+            child_fields.append((field_name, value))
+        else:
+            attrib['type'] = type(value).__name__  ## the last scalar field wins (but keeps its place)
+            attrib[field_name] = xml_literal(value)
+    if collapsible:
+        child_fields = _get_collapsed_child_fields(node, child_fields)
+    return attrib, child_fields
+
+def convert_to_xml(tree: ast.AST) -> etree._Element:
+    tag, fields, collapsible = _get_node_type_dets(tree.__class__)
+    attrib, child_fields = _get_attrib_and_child_fields(tree, fields, collapsible)
+    root = etree.Element(tag, attrib)
+    els_and_child_fields = [(root, child_fields)]
+    while els_and_child_fields:  ## every element is made in place when its parent is expanded so expansion order doesn't matter
+        el, child_fields = els_and_child_fields.pop()
+        for field_name, value in child_fields:
+            field_el = _SubElement(el, field_name)
+            for item in (value, ) if isinstance(value, ast.AST) else value:
+                if isinstance(item, ast.AST):
+                    tag, fields, collapsible = _get_node_type_dets(item.__class__)
+                    attrib, item_child_fields = _get_attrib_and_child_fields(item, fields, collapsible)
+                    item_el = _SubElement(field_el, tag, attrib)
+                    if item_child_fields:
+                        els_and_child_fields.append((item_el, item_child_fields))
+                elif isinstance(item, CollapsedItems):
+                    _SubElement(field_el, conf.COLLAPSED_ITEMS_TAG, item.attrib)
+                else:
+                    _SubElement(field_el, 'item').text = xml_literal(item)
+    return root
+
+def get_xml_tags(node: ast.AST) -> set[str]:
+    """
+    Every tag the node would have in its XML (itself and all its descendants) without making any XML
+    e.g. {'Assign', 'targets', 'Name', 'ctx', 'Store', 'value', 'Constant'} for x = 1.
+    Walks the tree exactly as convert_to_xml does.
+    """
+    tags = set()
+    nodes = [node]
+    while nodes:
+        node = nodes.pop()
+        tag, fields, collapsible = _get_node_type_dets(node.__class__)
+        tags.add(tag)
+        child_fields = [(field_name, getattr(node, field_name)) for field_name in fields
+            if isinstance(getattr(node, field_name, None), (ast.AST, list))]
+        if collapsible:
+            child_fields = _get_collapsed_child_fields(node, child_fields)
+        for field_name, value in child_fields:
+            tags.add(field_name)
+            if isinstance(value, ast.AST):
+                nodes.append(value)
+                continue
+            for item in value:
+                if isinstance(item, ast.AST):
+                    nodes.append(item)
+                elif isinstance(item, CollapsedItems):
+                    tags.add(conf.COLLAPSED_ITEMS_TAG)
+                else:
+                    tags.add('item')
+    return tags
@@ -0,0 +1,119 @@
+"""
+asyncio versions of the pipeline stages for callers running an event loop (e.g. a web service).
+
+All the real work (reading files, analysing code, formatting help) is handed to a bounded pool of threads
+so the event loop is never blocked, and results are yielded as async iterators as soon as each is ready.
+Any number of runs can be in progress at once - each run has its own session (see analysis_session)
+and runs share nothing but the threads.
+
+E.g.
+
+    async for formatted_help, code_file_path in get_formatted_help_dets(code, output_settings=output_settings):
+        ...
+
+Unlike the synchronous pipeline, code items are analysed one at a time in threads rather than in worker processes
+(output_settings.jobs is ignored) and snippet string helper inputs (e.g. linting) aren't batch prepared.
+"""
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, Sequence
+
+from superhelp import conf
+from superhelp.analysis_session import AnalysisSession
+from superhelp.helper import OutputSettings, Pipeline
+
+_DONE = object()
+
+class AsyncPipeline:
+    """
+    The pipeline stages of helper.Pipeline as async iterators.
+
+    :param executor: where the work is done. If not supplied, a thread pool of conf.ASYNC_WORKERS threads
+     (shut down by close).
+    """
+
+    def __init__(self, executor: Executor | None = None):
+        self.own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=conf.ASYNC_WORKERS, thread_name_prefix='superhelp_async')
+
+    def close(self):
+        if self.own_executor:
+            self.executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_exc_dets):
+        self.close()
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    async def get_code_items(self, *, code: str | None = None, file_path: Path | str | None = None,
+            project_path: Path | str | None = None, exclude_folders=None, include_patterns: Sequence[str] | None = None,
+            exclude_patterns: Sequence[str] | None = None, use_gitignore=False) -> AsyncIterator[tuple]:
+        """
+        See Pipeline.get_code_items. Finding and reading files happens in the executor.
+        """
+        code_items = Pipeline.get_code_items(code=code, file_path=file_path, project_path=project_path,
+            exclude_folders=exclude_folders, include_patterns=include_patterns, exclude_patterns=exclude_patterns,
+            use_gitignore=use_gitignore)
+        while True:
+            code_item = await self._run(next, code_items, _DONE)
+            if code_item is _DONE:
+                break
+            yield code_item
+
+    async def get_code_items_dets(self, code_items: AsyncIterable[tuple], *,
+            output_settings: OutputSettings, session: AnalysisSession | None = None) -> AsyncIterator[tuple]:
+        """
+        See Pipeline.get_code_items_dets. Each code item is analysed in the executor as soon as it arrives.
+        """
+        if session is None:
+            session = Pipeline.new_session(output_settings)
+        async for code, code_file_path in code_items:
+            messages_dets, multi_block = await self._run(Pipeline._get_code_item_dets, code,
+                output_settings=output_settings, session=session)
+            yield code, code_file_path, messages_dets, multi_block
+
+    async def get_formatted_help_dets(self, code_items_dets: AsyncIterable[tuple], output_settings: OutputSettings,
+            in_notebook=False, *, session: AnalysisSession | None = None) -> AsyncIterator[tuple[str, Path | None]]:
+        """
+        See Pipeline.get_formatted_help_dets. Formatting happens in the executor.
+        """
+        if session is None:
+            session = Pipeline.new_session(output_settings)
+        formatter_module = await self._run(Pipeline._get_formatter_module, output_settings.format_name)
+        async for code, code_file_path, messages_dets, multi_block in code_items_dets:
+            kwargs = Pipeline._get_formatter_kwargs(code, code_file_path, messages_dets, multi_block,
+                output_settings=output_settings, in_notebook=in_notebook, session=session)
+            formatted_help = await self._run(formatter_module.get_formatted_help, **kwargs)
+            yield formatted_help, code_file_path
+
+async def get_formatted_help_dets(code: str | None = None, *,
+        file_path: Path | str | None = None, project_path: Path | str | None = None,
+        exclude_folders: Sequence[Path] | Sequence[str] | None = None,
+        include_patterns: Sequence[str] | None = None, exclude_patterns: Sequence[str] | None = None,
+        use_gitignore=False, output_settings: OutputSettings | None = None, in_notebook=False,
+        executor: Executor | None = None) -> AsyncIterator[tuple[str, Path | None]]:
+    """
+    Async iterator version of helper.get_formatted_help_dets (see that for the parameters).
+
+    :param executor: shared by all callers ideally (so the number of threads is bounded overall).
+     If not supplied, a thread pool just for this run.
+    """
+    if not output_settings:
+        output_settings = OutputSettings()
+    session = Pipeline.new_session(output_settings)
+    async with AsyncPipeline(executor) as pipeline:
+        code_items = pipeline.get_code_items(code=code, file_path=file_path, project_path=project_path,
+            exclude_folders=exclude_folders, include_patterns=include_patterns, exclude_patterns=exclude_patterns,
+            use_gitignore=use_gitignore)
+        code_items_dets = pipeline.get_code_items_dets(code_items, output_settings=output_settings, session=session)
+        async for formatted_help, code_file_path in pipeline.get_formatted_help_dets(code_items_dets,
+                output_settings, in_notebook=in_notebook, session=session):
+            yield formatted_help, code_file_path
@@ -1,58 +1,263 @@
+import ast
+from bisect import bisect_right
+from copy import deepcopy
+import gc
 import logging
+from types import BuiltinFunctionType, FunctionType, ModuleType
 
 from superhelp import conf
 
-def get_val(pre_block_code_str, block_code_str,
-        name_type, name_details, name_str):
+IMPORT_PROBLEM_MSG = ("SuperHELP only has modules from the Python standard library installed - "
+    "it looks like your snippet relies on a module from outside the standard library.")
+
+_DELETED = object()  ## marks a name no longer in the namespace e.g. after del
+_ATOMIC_TYPES = (type(None), bool, int, float, complex, str, bytes)  ## nothing inside to share or mutate
+_UNFOLLOWED_TYPES = (ModuleType, type, FunctionType, BuiltinFunctionType)  ## might reach everything e.g. via globals
+
+def _get_touched_names(block_node: ast.stmt) -> set[str]:
+    """
+    Names a top-level block might bind, rebind, delete, or mutate e.g. a, b, and c in
+    a = b.append(c)
+    """
+    names = set()
+    for node in ast.walk(block_node):
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                names.add((alias.asname or alias.name).split('.')[0])
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+    return names
+
+def _has_star_import(block_node: ast.stmt) -> bool:
+    return any(isinstance(node, ast.ImportFrom) and node.names[0].name == '*' for node in ast.walk(block_node))
+
+def _has_call(block_node: ast.stmt) -> bool:
+    """
+    A call could change anything (e.g. a function appending to a global list) - not just the names in the block.
+    """
+    return any(isinstance(node, ast.Call) for node in ast.walk(block_node))
+
+def _get_reachable_ids(val, *, seen_ids: set[int], max_objs: int) -> set[int] | None:
+    """
+    Identities of the value and every object reachable from it e.g. the lists inside a list.
+    Modules, classes, and functions are included but not followed.
+
+    :param seen_ids: identities never to be included or followed e.g. the namespace itself
+    :return: None if more than max_objs objects are reachable
+    """
+    reachable_ids = set()
+    vals = [val]
+    while vals:
+        val = vals.pop()
+        val_id = id(val)
+        if val_id in reachable_ids or val_id in seen_ids or isinstance(val, _ATOMIC_TYPES):
+            continue
+        reachable_ids.add(val_id)
+        if len(reachable_ids) > max_objs:
+            return None
+        if not isinstance(val, _UNFOLLOWED_TYPES):
+            vals.extend(gc.get_referents(val))
+    return reachable_ids
+
+def _get_snapshot_val(val):
+    """
+    Later blocks might mutate the value (e.g. append to a list) so keep a copy of how it was at the end of the block.
+    Some values can't be copied (e.g. modules) - they are kept as they are.
+    """
+    try:
+        return deepcopy(val)
+    except Exception:
+        return val
+
+class SnippetExecution:
     """
+    Executes a snippet once, top-level block by top-level block, and only as far as the latest block asked about.
+    After each block, the values of the names the block touched (or which share objects with them -
+    or every name if the block makes any calls) are recorded (as they were at that point)
+    so looking up a name as at any block is a dictionary lookup plus a bisect rather than executing
+    all the code up to and including the block all over again for every name.
+
     Executing supplied code from end users - nope - nothing to see here from a
     security point of view ;-) Needs addressing if this code is ever used as a
     service for other users.
 
     Note - can be the source of mysterious output in stdout (e.g. exec a print
     function).
+    """
+
+    def __init__(self, block_nodes: list[ast.stmt]):
+        """
+        :param block_nodes: the statements in the body of the snippet's AST Module
+        """
+        self.block_nodes = block_nodes
+        self.namespace = {}
+        self.n_blocks_run = 0
+        self.name_versions = {}  ## name: (block idxs, vals) with a new version every time a block touches the name
+        self.exception = None
+        self.exception_block_idx = None
+        self.unversioned_block_idx = None  ## first block after which we couldn't tell which names had changed
+        self.fresh_execution = None  ## run up to a block from scratch for names we can't rely on the versions of
+
+    def _record_versions(self, block_idx: int, names: set[str]):
+        for name in names:
+            val = _get_snapshot_val(self.namespace[name]) if name in self.namespace else _DELETED
+            block_idxs, vals = self.name_versions.setdefault(name, ([], []))
+            if not vals and val is _DELETED:
+                continue
+            block_idxs.append(block_idx)
+            vals.append(val)
+
+    def _get_shared_names(self, touched_names: set[str]) -> set[str] | None:
+        """
+        Names not touched by the block but which share objects with names that were e.g. a in
+        a = []
+        b = a
+        b.append(1)  ## a has changed as well as b
+        Shared means either name's value is, or is reachable from, the other's e.g. a list inside a list.
+
+        :return: None if there is too much to check (see conf.MAX_ALIAS_SCAN_OBJECTS)
+        """
+        seen_ids = {id(self.namespace), id(self.namespace.get('__builtins__'))}
+        max_objs = conf.MAX_ALIAS_SCAN_OBJECTS
+        touched_ids = set()
+        for name in touched_names:
+            if name not in self.namespace:
+                continue
+            reachable_ids = _get_reachable_ids(self.namespace[name], seen_ids=seen_ids, max_objs=max_objs)
+            if reachable_ids is None:
+                return None
+            touched_ids.update(reachable_ids)
+            max_objs -= len(reachable_ids)
+        shared_names = set()
+        if not touched_ids:
+            return shared_names
+        for name, val in self.namespace.items():
+            if name in touched_names or name == '__builtins__':
+                continue
+            reachable_ids = _get_reachable_ids(val, seen_ids=seen_ids, max_objs=max_objs)
+            if reachable_ids is None:
+                return None
+            if not reachable_ids.isdisjoint(touched_ids):
+                shared_names.add(name)
+            max_objs -= len(reachable_ids)
+        return shared_names
+
+    def _run_block(self, block_idx: int):
+        block_node = self.block_nodes[block_idx]
+        names_before = set(self.namespace) if _has_star_import(block_node) else None
+        code = compile(ast.Module(body=[block_node], type_ignores=[]), filename='<snippet>', mode='exec')
+        try:
+            exec(code, self.namespace)
+        except ImportError as e:
+            logging.debug(f"Import problem running {__file__} (specifically {__name__}): {e}")
+            self.exception = ImportError(IMPORT_PROBLEM_MSG)
+        except Exception as e:
+            self.exception = e
+        if self.exception is not None:
+            self.exception_block_idx = block_idx
+            return
+        if self.unversioned_block_idx is not None:
+            return
+        touched_names = _get_touched_names(block_node)
+        if names_before is not None:
+            touched_names.update(set(self.namespace) - names_before)
+        if _has_call(block_node):  ## no telling what changed so record every name
+            self._record_versions(block_idx, touched_names | (set(self.namespace) - {'__builtins__'}))
+            return
+        shared_names = self._get_shared_names(touched_names)
+        if shared_names is None:
+            self.unversioned_block_idx = block_idx
+            return
+        self._record_versions(block_idx, touched_names | shared_names)
+
+    def run_to(self, block_idx: int):
+        """
+        Make sure everything up to and including the block has been run.
+        Raises whatever the code raised if it failed at or before the block
+        (as it would if all that code had been run together).
+        """
+        while self.n_blocks_run <= block_idx and self.exception is None:
+            self._run_block(self.n_blocks_run)
+            self.n_blocks_run += 1
+        if self.exception is not None and self.exception_block_idx <= block_idx:
+            raise self.exception
 
+    def get_name_val(self, block_idx: int, name: str):
+        """
+        :return: value of name as it was at the end of the block. Raises KeyError if no such name then.
+        """
+        self.run_to(block_idx)
+        if self.unversioned_block_idx is not None and block_idx >= self.unversioned_block_idx:
+            return self._get_fresh_name_val(block_idx, name)
+        block_idxs, vals = self.name_versions.get(name, ((), ()))
+        version_idx = bisect_right(block_idxs, block_idx) - 1
+        if version_idx < 0 or vals[version_idx] is _DELETED:
+            raise KeyError(name)
+        return vals[version_idx]
+
+    def _get_fresh_name_val(self, block_idx: int, name: str):
+        """
+        Value of name as it was at the end of the block by running the code up to and including the block from scratch
+        (reusing the last such run if it was for the same block). For when the versions can't be relied on.
+        """
+        fresh_execution = self.fresh_execution
+        if fresh_execution is None or fresh_execution.n_blocks_run != block_idx + 1:
+            fresh_execution = SnippetExecution(self.block_nodes[:block_idx + 1])
+            fresh_execution.unversioned_block_idx = -1  ## nothing to version - the live namespace is all we need
+            fresh_execution.run_to(block_idx)
+            self.fresh_execution = fresh_execution
+        return fresh_execution.namespace[name]
+
+    def get_val(self, block_idx: int, name_type, name_details, name_str):
+        """
+        See get_val (module-level function)
+        """
+        if name_type == conf.STD_NAME:
+            val = self.get_name_val(block_idx, name_details[0])
+        elif name_type == conf.OBJ_ATTR_NAME:
+            obj_name, attr_name = name_details
+            try:
+                val = getattr(self.get_name_val(block_idx, obj_name), attr_name)
+            except AttributeError:
+                raise KeyError(f"Unable to find name '{name_str}' in block {block_idx}")
+        elif name_type == conf.DICT_KEY_NAME:
+            dict_name, key_name = name_details
+            try:
+                val = self.get_name_val(block_idx, dict_name)[key_name]
+            except NameError:
+                raise KeyError(f"Unable to find name '{name_str}' in block {block_idx}")
+        else:
+            raise Exception(f"Unexpected name_type: '{name_type}'")
+        return val
+
+def get_val(block_spec, name_type, name_details, name_str):
+    """
+    Value of the name as at the end of the block once all the code up to and including the block has run.
+
+    :param block_spec: BlockSpec - normally with a snippet execution (see execution_sandbox.get_snippet_execution)
+     shared by all the blocks in the snippet. If not, the code up to and including the block is run just for this name.
     :param str name_type: e.g. conf.STD_NAME. Lets us know how to handle the
      parts of the name e.g. dict name and key name.
     :param list name_details: e.g. name; dict and key; obj and attr
     :param str name_str: name as string e.h. Family.pet or capitals['NZ']
     :return: value if possible. Raises KeyError if unable to get value.
     """
-    exp_dets = {}
-    try:
-        exec(pre_block_code_str + block_code_str, exp_dets)
-    except ImportError as e:
-        logging.debug(
-            f"Import problem running {__file__} (specifically {__name__}): {e}")
-        raise ImportError("SuperHELP only has modules from the Python standard "
-            "library installed - it looks like your snippet relies on a module "
-            "from outside the standard library.")
-    if name_type == conf.STD_NAME:
-        val = exp_dets[name_details[0]]
-    elif name_type == conf.OBJ_ATTR_NAME:
-        obj_name, attr_name = name_details
-        try:
-            val = getattr(exp_dets[obj_name], attr_name)
-        except AttributeError:
-            raise KeyError(f"Unable to find name '{name_str}' "
-                f"in code_str\n{block_code_str}")
-    elif name_type == conf.DICT_KEY_NAME:
-        dict_name, key_name = name_details
-        try:
-            val = exp_dets[dict_name][key_name]
-        except NameError:
-            raise KeyError(f"Unable to find name '{name_str}' "
-                f"in code_str\n{block_code_str}")
+    snippet_execution = block_spec.snippet_execution
+    if snippet_execution is None:
+        snippet_execution = SnippetExecution(
+            ast.parse(block_spec.pre_block_code_str + block_spec.block_code_str).body)
+        block_idx = len(snippet_execution.block_nodes) - 1
     else:
-        raise Exception(f"Unexpected name_type: '{name_type}'")
-    return val
+        block_idx = block_spec.block_idx
+    return snippet_execution.get_val(block_idx, name_type, name_details, name_str)
 
 def execute_collection_dets(block_spec, name_dets):
     try:
-        items = get_val(
-            block_spec.pre_block_code_str, block_spec.block_code_str,
-            name_dets.name_type, name_dets.name_details,
-            name_dets.name_str)
+        items = get_val(block_spec, name_dets.name_type, name_dets.name_details, name_dets.name_str)
     except Exception:
         items = conf.UNKNOWN_ITEMS
     else:
@@ -13,13 +13,15 @@ class Format(StrEnum):
     CLI = 'cli'
     HTML = 'html'
     MD = 'md'
+    JSON = 'json'  ## one JSON object per code item i.e. JSON Lines for projects
 
-FORMAT_OPTIONS = (Format.CLI, Format.HTML, Format.MD)
+FORMAT_OPTIONS = (Format.CLI, Format.HTML, Format.MD, Format.JSON)
 FORMAT_INTERACTIVE_FORMATS = (Format.CLI, Format.MD)
 
 c = Format.CLI
 h = Format.HTML
 m = Format.MD
+j = Format.JSON
 
 ## can be overriden in tests.__init__
 RECORD_AST = f  ## (f)
@@ -122,6 +124,7 @@ DICT_KEY_NAME = 'dict_key_name'
 OBJ_ATTR_NAME = 'obj_attr_name'
 
 NON_STD_EL_KEYS = ('lineno', 'col_offset')
+COLLAPSED_ITEMS_TAG = 'collapsed_items'  ## stands in for the items of a huge literal left out of the XML (see ast_xml)
 
 MAX_BRIEF_FUNC_LOC = 35
 MAX_BRIEF_FUNC_ARGS = 6
@@ -130,7 +133,24 @@ MIN_BRIEF_NAME = 3
 MAX_BRIEF_NESTED_BLOCK = 20
 MIN4ANY_OR_ALL = 3
 MAX_ITEMS_EVALUATED = 25
-MAX_PROJECT_MODULES = 50
+MAX_LITERAL_ITEMS_IN_XML = 100  ## longer dict, list and tuple literals of constants only keep their first MAX_ITEMS_EVALUATED items in the XML (see ast_xml)
+BLOCK_BY_BLOCK_MIN_LINES = 20_000  ## snippets this long are converted into XML (and analysed) a block at a time to bound memory (see messages.SnippetContext)
+MAX_PROJECT_MODULES = 50  ## a warning (but nothing more) beyond this - probably including modules by accident e.g. a virtual env
+BATCH_PREPARE_MAX_ITEMS = 20  ## project modules read, linted as a batch, and reported on before moving on to the next lot
+FILE_READ_THREADS = 8  ## threads reading and decoding project modules
+ASYNC_WORKERS = 4  ## threads doing the work for the asyncio pipeline (see async_helper) unless given an executor
+PROJECT_REPORT_MODULES_PER_PAGE = 50  ## rows shown at a time in the module table of an HTML project report
+MAX_ANALYSIS_CACHE_BYTES = 200 * 1024 * 1024  ## least recently used entries evicted beyond this
+SANDBOX_CODE_EXECUTION = t  ## run snippet code in separate, resource-limited worker processes (where the platform allows)
+CODE_EXECUTION_WORKERS = 2
+MAX_ALIAS_SCAN_OBJECTS = 10_000  ## beyond this, values after a block come from running the code up to it from scratch (see code_execution)
+CODE_EXECUTION_TIMEOUT_SECS = 5  ## wall-clock wait for any one value before giving up on executing that snippet
+CODE_EXECUTION_MAX_CPU_SECS = 10  ## per snippet
+CODE_EXECUTION_MAX_BYTES = 1024 * 1024 * 1024  ## address space available to each worker process
+DAEMON_HOST = '127.0.0.1'  ## shelp --serve only ever listens locally
+DAEMON_PORT = 0  ## 0 means any free port - clients find it in the daemon state file
+DAEMON_TIMEOUT_SECS = 60  ## clients fall back to analysing in-process if no reply in time
+DAEMON_THREADS = 4  ## requests the daemon works on at once (each in its own analysis session)
 MAX_FILE_PATH_IN_HEADING = 75
 MAX_STD_LINE_LEN = 70
 
@@ -216,6 +236,7 @@ POPULAR_LIBS = ['urllib3', 'six', 'botocore', 'requests', 's3transfer', 'idna',
 
 SUPERHELP_PROJECT_OUTPUT = 'superhelp_project_output'
 SUPERHELP_GEN_OUTPUT = 'superhelp_output'
+SUPERHELP_ANALYSIS_CACHE = 'analysis_cache'  ## inside the user's own cache folder (see gen_utils.get_user_cache_dir)
 
 HTML_HEAD = f"""\
 <head>
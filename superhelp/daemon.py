@@ -0,0 +1,308 @@
+"""
+A long-running SuperHELP process (shelp --serve) so editors, notebooks etc. don't pay the start-up costs
+(interpreter start, importing helpers and formatters, setting up the linter) every time they want help.
+
+The daemon listens on localhost HTTP (a free port unless one is specified) and records where it is listening,
+its process id, a secret token, and a fingerprint of the SuperHELP code it is running in a state file
+only readable by the user who started it (in a folder private to them - see gen_utils.get_user_runtime_dir).
+Clients only read the state file if it belongs to them and nobody else can read it. They must send the token
+so only that user can use the daemon. A daemon running different SuperHELP code (e.g. from before an upgrade) is ignored.
+
+Requests (POST /help) are JSON:
+  {"code_items": [[code, code_file_path or null], ...], "output_settings": {"format_name": "json", ...}}
+and replies are JSON:
+  {"formatted_help_dets": [[formatted_help, code_file_path or null], ...]}
+Clients read any files themselves and send the code so the daemon never reads files on anyone's behalf.
+The help is formatted by the daemon but displayed by the client (so HTML tabs open, and terminal output appears,
+where the client is). Requests are handled at the same time by a shared pool of threads
+(conf.DAEMON_THREADS) - each request is a separate run with its own analysis session.
+
+GET /status returns the daemon's process id and code fingerprint.
+"""
+from dataclasses import dataclass
+import json
+import logging
+import os
+from pathlib import Path
+import secrets
+import signal
+import stat
+import sys
+
+from superhelp import conf, gen_utils
+from superhelp.analysis_cache import get_code_fingerprint
+from superhelp.conf import Format, Level, Theme
+
+DAEMON_STATE_FNAME = 'daemon.json'
+TOKEN_HEADER = 'X-SuperHELP-Token'
+HELP_PATH = '/help'
+STATUS_PATH = '/status'
+
+## output settings clients can set - the rest (e.g. where to put temporary HTML) only matter for display
+OUTPUT_SETTING2TYPE = {
+    'format_name': Format,
+    'theme_name': Theme,
+    'detail_level': Level,
+    'warnings_only': bool,
+    'execute_code': bool,
+    'use_cache': bool,
+}
+
+@dataclass(frozen=True)
+class DaemonDets:
+    host: str
+    port: int
+    pid: int
+    token: str
+    fingerprint: str
+
+def get_daemon_state_path() -> Path:
+    return gen_utils.get_user_runtime_dir() / DAEMON_STATE_FNAME
+
+def _is_private_state_file(stat_result: os.stat_result) -> bool:
+    if not gen_utils.is_owned_by_user(stat_result):
+        return False
+    return not hasattr(os, 'getuid') or stat.S_IMODE(stat_result.st_mode) == 0o600  ## no POSIX modes on Windows
+
+def _store_daemon_dets(daemon_dets: DaemonDets):
+    state_path = get_daemon_state_path()
+    gen_utils.make_private_dir(state_path.parent)
+    tmp_state_path = state_path.with_suffix(f'.{os.getpid()}.tmp')
+    fd = os.open(tmp_state_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)  ## the token is a secret
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        if hasattr(os, 'fchmod'):
+            os.fchmod(f.fileno(), 0o600)  ## whatever the umask - clients insist on exactly this
+        json.dump(daemon_dets.__dict__, f)
+    tmp_state_path.replace(state_path)
+
+def _remove_daemon_dets(daemon_dets: DaemonDets):
+    """
+    Only if still ours (another daemon may have started since).
+    """
+    if get_daemon_dets() == daemon_dets:
+        get_daemon_state_path().unlink(missing_ok=True)
+
+def get_daemon_dets() -> DaemonDets | None:
+    """
+    :return: details of the most recently started daemon if there is a state file (it may no longer be running).
+     None if the state file (or its folder) doesn't belong to the current user or others can read it -
+     it could be someone else's daemon, or someone after the token.
+    """
+    state_path = get_daemon_state_path()
+    try:
+        gen_utils.make_private_dir(state_path.parent)
+        with open(state_path, encoding='utf-8') as f:
+            if not _is_private_state_file(os.fstat(f.fileno())):
+                logging.debug(f"Ignoring daemon state file '{state_path}' - not private to the current user")
+                return None
+            return DaemonDets(**json.loads(f.read()))
+    except (OSError, ValueError, TypeError):
+        return None
+
+def get_output_settings_dict(output_settings) -> dict:
+    return {setting: getattr(output_settings, setting) for setting in OUTPUT_SETTING2TYPE}
+
+def get_output_settings(output_settings_dict: dict):
+    """
+    :return: OutputSettings from a request - only settings clients can set. Raises ValueError if anything is wrong.
+    """
+    from superhelp.helper import OutputSettings
+    kwargs = {}
+    for setting, val in output_settings_dict.items():
+        try:
+            setting_type = OUTPUT_SETTING2TYPE[setting]
+        except KeyError:
+            raise ValueError(f"Unexpected output setting '{setting}'")
+        if setting_type is bool:
+            if not isinstance(val, bool):
+                raise ValueError(f"Output setting '{setting}' must be true or false")
+            kwargs[setting] = val
+        else:
+            kwargs[setting] = setting_type(val)
+    return OutputSettings(**kwargs)
+
+def get_formatted_help_dets(request_dict: dict) -> list[tuple[str, str | None]]:
+    """
+    Raises ValueError if the request is malformed.
+    """
+    from superhelp.helper import Pipeline
+    output_settings = get_output_settings(request_dict.get('output_settings', {}))
+    code_items = []
+    for code, code_file_path in request_dict['code_items']:
+        if not isinstance(code, str) or not (code_file_path is None or isinstance(code_file_path, str)):
+            raise ValueError("Each code item must be code and a code file path (or null)")
+        code_items.append((code, None if code_file_path is None else Path(code_file_path)))
+    code_items_dets = Pipeline.get_code_items_dets(iter(code_items), output_settings=output_settings)
+    formatted_help_dets = Pipeline.get_formatted_help_dets(code_items_dets, output_settings)
+    return [(formatted_help, None if code_file_path is None else str(code_file_path))
+        for formatted_help, code_file_path in formatted_help_dets]
+
+def warm_up():
+    """
+    Everything a first request would otherwise have to wait for - importing every helper (and compiling its xpath),
+    setting up the linter, importing every formatter, and analysing a snippet.
+    """
+    from superhelp import helpers
+    from superhelp.helper import Pipeline
+    from superhelp.lint_engine import get_lint_engine
+    helpers.load_helpers()
+    get_lint_engine()
+    for format_name in conf.FORMAT_OPTIONS:
+        Pipeline._get_formatter_module(format_name)
+    get_formatted_help_dets({'code_items': [(conf.TEST_SNIPPET, None)],
+        'output_settings': {'format_name': Format.JSON, 'use_cache': False}})
+
+def _get_request_handler_class(token: str):
+    from http.server import BaseHTTPRequestHandler
+
+    class HelpRequestHandler(BaseHTTPRequestHandler):
+
+        def _send_json(self, status: int, reply: dict):
+            content = json.dumps(reply).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def _has_token(self) -> bool:
+            if secrets.compare_digest(self.headers.get(TOKEN_HEADER, ''), token):
+                return True
+            self._send_json(403, {'error': "Missing or incorrect token"})
+            return False
+
+        def do_GET(self):
+            if not self._has_token():
+                return
+            if self.path != STATUS_PATH:
+                self._send_json(404, {'error': f"Unknown path '{self.path}'"})
+                return
+            self._send_json(200, {'pid': os.getpid(), 'fingerprint': get_code_fingerprint()})
+
+        def do_POST(self):
+            if not self._has_token():
+                return
+            if self.path != HELP_PATH:
+                self._send_json(404, {'error': f"Unknown path '{self.path}'"})
+                return
+            try:
+                content_len = int(self.headers.get('Content-Length', 0))
+                request_dict = json.loads(self.rfile.read(content_len))
+                formatted_help_dets = get_formatted_help_dets(request_dict)
+            except (ValueError, KeyError, TypeError) as e:
+                self._send_json(400, {'error': f"Bad request - {e}"})
+                return
+            except Exception as e:
+                logging.exception("Unable to get help")
+                self._send_json(500, {'error': f"Unable to get help - {e}"})
+                return
+            self._send_json(200, {'formatted_help_dets': formatted_help_dets})
+
+        def log_message(self, format, *args):
+            logging.debug(f"{self.address_string()} - {format % args}")
+
+    return HelpRequestHandler
+
+def _get_server_class():
+    from concurrent.futures import ThreadPoolExecutor
+    from http.server import HTTPServer
+
+    class PooledHTTPServer(HTTPServer):
+        """
+        Handles each request in a shared, bounded pool of threads (rather than a new thread per request).
+        """
+        def server_activate(self):
+            self.executor = ThreadPoolExecutor(max_workers=conf.DAEMON_THREADS, thread_name_prefix='superhelp_daemon')
+            super().server_activate()
+
+        def _process_request_in_pool(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+        def process_request(self, request, client_address):
+            self.executor.submit(self._process_request_in_pool, request, client_address)
+
+        def server_close(self):
+            super().server_close()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    return PooledHTTPServer
+
+def serve(*, port: int | None = None):
+    """
+    Run the daemon until interrupted (e.g. Ctrl-C) or terminated.
+
+    :param port: default conf.DAEMON_PORT (0 means any free port)
+    """
+    if port is None:
+        port = conf.DAEMON_PORT
+    token = secrets.token_urlsafe(32)
+    warm_up()
+    server = _get_server_class()((conf.DAEMON_HOST, port), _get_request_handler_class(token))
+    host, port = server.server_address[:2]
+    daemon_dets = DaemonDets(host=host, port=port, pid=os.getpid(), token=token, fingerprint=get_code_fingerprint())
+    _store_daemon_dets(daemon_dets)
+    signal.signal(signal.SIGTERM, lambda _signum, _frame: sys.exit(0))  ## so the state file is still tidied up
+    print(f"SuperHELP daemon listening on http://{host}:{port} (Ctrl-C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        _remove_daemon_dets(daemon_dets)
+
+def request_formatted_help_dets(code_items: list[tuple[str, Path | str | None]], output_settings
+        ) -> list[tuple[str, Path | None]] | None:
+    """
+    Thin client - get formatted help from a running daemon.
+
+    :return: formatted help and code file path for each code item,
+     or None if no daemon running the same SuperHELP code could supply it (so the caller can do it in-process)
+    """
+    daemon_dets = get_daemon_dets()
+    if daemon_dets is None:
+        return None
+    if daemon_dets.fingerprint != get_code_fingerprint():
+        logging.debug("Not using SuperHELP daemon - it is running different SuperHELP code")
+        return None
+    from http.client import HTTPConnection, HTTPException
+    request_dict = {
+        'code_items': [(code, None if code_file_path is None else str(code_file_path))
+            for code, code_file_path in code_items],
+        'output_settings': get_output_settings_dict(output_settings),
+    }
+    conn = HTTPConnection(daemon_dets.host, daemon_dets.port, timeout=conf.DAEMON_TIMEOUT_SECS)
+    try:
+        conn.request('POST', HELP_PATH, body=json.dumps(request_dict).encode('utf-8'),
+            headers={'Content-Type': 'application/json', TOKEN_HEADER: daemon_dets.token})
+        response = conn.getresponse()
+        reply = json.loads(response.read())
+    except (OSError, HTTPException, ValueError) as e:
+        logging.debug(f"Not using SuperHELP daemon - {e}")
+        return None
+    finally:
+        conn.close()
+    if response.status != 200:
+        logging.debug(f"SuperHELP daemon unable to help ({response.status}) - {reply.get('error')}")
+        return None
+    return [(formatted_help, None if code_file_path is None else Path(code_file_path))
+        for formatted_help, code_file_path in reply['formatted_help_dets']]
+
+def show_help(code: str | None = None, *, file_path: Path | str | None = None, output_settings) -> bool:
+    """
+    Show help on a snippet or script as helper.show_help would - but formatted by a running daemon.
+
+    :return: True if shown; False if no suitable daemon running (nothing shown)
+    """
+    from superhelp.helper import Pipeline
+    code_items = list(Pipeline.get_code_items(code=code, file_path=file_path))
+    formatted_help_dets = request_formatted_help_dets(code_items, output_settings)
+    if formatted_help_dets is None:
+        return False
+    Pipeline.display_help(iter(formatted_help_dets), output_settings, single_script=True)
+    return True
@@ -1,4 +1,6 @@
 from pathlib import Path
+import tempfile
+from urllib.parse import quote
 import webbrowser
 
 from superhelp import conf, gen_utils
@@ -22,3 +24,39 @@ def display(formatted_help: str, *, code_file_path: Path, tmp_html_path: Path |
         tmp_fh.write(formatted_help)
     url = fpath.as_uri()
     webbrowser.open_new_tab(url)
+
+REPORT_INDEX_FNAME = 'index.html'
+REPORT_MODULES_FOLDER = 'modules'
+
+def make_report_folder(*, tmp_html_path: Path | None = None) -> Path:
+    """
+    A fresh folder for a project report (index page plus a page per module).
+    """
+    if tmp_html_path:
+        superhelp_tmpdir = tmp_html_path
+    else:
+        superhelp_tmpdir = gen_utils.get_superhelp_tmpdir(folder=conf.SUPERHELP_PROJECT_OUTPUT)
+    superhelp_tmpdir.mkdir(parents=True, exist_ok=True)
+    report_path = Path(tempfile.mkdtemp(prefix='report_', dir=superhelp_tmpdir))
+    (report_path / REPORT_MODULES_FOLDER).mkdir()
+    return report_path
+
+def write_report_module_page(formatted_help: str, *, report_path: Path, code_file_path: Path, page_n: int) -> str:
+    """
+    Written as soon as the module is formatted so the help for every module isn't held in memory.
+
+    :param page_n: sequence number of the module in the report - makes the page name unique
+     (cleaned paths aren't e.g. pkg/a_b.py and pkg_a/b.py) while the stem keeps it recognisable
+    :return: url of the page relative to the index page (quoted in case of e.g. spaces or # in the module name)
+    """
+    page_fname = f"{page_n}_{Path(code_file_path).stem}.html"
+    (report_path / REPORT_MODULES_FOLDER / page_fname).write_text(formatted_help, encoding='utf-8')
+    return f"{REPORT_MODULES_FOLDER}/{quote(page_fname)}"
+
+def display_report(formatted_index: str, *, report_path: Path, **_kwargs):
+    """
+    Only the index page is opened - module pages are loaded from there when selected.
+    """
+    index_path = report_path / REPORT_INDEX_FNAME
+    index_path.write_text(formatted_index, encoding='utf-8')
+    webbrowser.open_new_tab(index_path.as_uri())
@@ -0,0 +1,9 @@
+import sys
+
+def display(formatted_help: str, **_kwargs):
+    """
+    One line per code item (JSON Lines) flushed straight away so consumers can process results as they arrive.
+    Nothing else is written to stdout so the output can be piped straight into other tools.
+    """
+    sys.stdout.write(formatted_help + '\n')
+    sys.stdout.flush()
@@ -0,0 +1,291 @@
+"""
+Running snippet code in a pool of pre-started, resource-limited worker processes.
+
+Executing code supplied by end users in the analysing process means one runaway snippet (an infinite loop,
+a huge allocation) hangs or kills the whole run. Instead each snippet is executed (see
+code_execution.SnippetExecution) inside a worker process with a cap on its address space (RLIMIT_AS) and on the
+CPU time each snippet can use (RLIMIT_CPU), and the analysing process only ever waits a limited wall-clock time
+for any value. If the limits are hit the worker is replaced and the snippet is treated as if its values could not
+be worked out - the helpers fall back to what they can get from the AST alone (e.g. conf.UNKNOWN_ITEMS).
+
+Workers are fresh Python processes (see ExecutionWorker.start) rather than forks of the analysing process.
+By the time code is executed there are often other threads running (e.g. reading project files,
+or serving daemon requests) and forking a multi-threaded process can leave locks held by those threads
+locked forever in the child. And unlike the multiprocessing spawn and forkserver start methods,
+nothing re-imports the __main__ module in the worker (e.g. a script calling superhelp.this()).
+
+Only what helpers need of a value comes back from a worker - the value itself if a simple builtin (or a small
+collection of them), otherwise a stand-in with the same type name and repr (see marshal_val).
+"""
+import builtins
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from fractions import Fraction
+from functools import cache
+from hashlib import sha256
+import logging
+import os
+from pathlib import Path
+import sys
+from threading import Lock
+
+try:
+    import resource
+except ImportError:  ## e.g. Windows
+    resource = None
+
+from superhelp import conf
+from superhelp.code_execution import SnippetExecution
+from superhelp.gen_utils import get_tree
+
+MAX_MARSHAL_DEPTH = 3  ## nested collections deeper than this come back as stand-ins
+MAX_WORKER_SNIPPETS = 8  ## snippets (and their namespaces) a worker keeps loaded
+WORKER_CODE = ("import sys; sys.path.insert(0, sys.argv[1]); "
+    "from superhelp.execution_sandbox import run_worker; run_worker(*sys.argv[2:])")
+
+SIMPLE_TYPES = (type(None), bool, int, float, complex, str, bytes, Decimal, Fraction, date, datetime, time, timedelta)
+
+class MarshalledObject:
+    """
+    Stand-in for a value which can't (or shouldn't) be sent back from a worker process as it is.
+    Looks like the original as far as helpers are concerned - type name and repr.
+    """
+
+    def __init__(self, repr_str: str):
+        self.repr_str = repr_str
+
+    def __repr__(self):
+        return self.repr_str
+
+    def __eq__(self, other):
+        return type(other).__name__ == type(self).__name__ and repr(other) == self.repr_str
+
+    def __hash__(self):
+        return hash((type(self).__name__, self.repr_str))
+
+    def __reduce__(self):
+        return make_marshalled_object, (type(self).__name__, self.repr_str)
+
+@cache
+def _get_marshalled_type(type_name: str) -> type:
+    return type(type_name, (MarshalledObject, ), {})
+
+def make_marshalled_object(type_name: str, repr_str: str) -> MarshalledObject:
+    return _get_marshalled_type(type_name)(repr_str)
+
+def marshal_val(val, *, depth: int = 0):
+    """
+    Strip a value down to what the helpers use (type name, repr, length, items) so it can be sent back from a worker.
+
+    Collections are truncated to one more than conf.MAX_ITEMS_EVALUATED items - enough for helpers to see they
+    are oversized without sending the lot.
+    """
+    val_type = type(val)
+    if val_type in SIMPLE_TYPES:
+        return val
+    if depth < MAX_MARSHAL_DEPTH and val_type in (list, tuple, set, frozenset, dict):
+        max_items = conf.MAX_ITEMS_EVALUATED + 1
+        if val_type is dict:
+            return {marshal_val(k, depth=depth + 1): marshal_val(v, depth=depth + 1)
+                for _n, (k, v) in zip(range(max_items), val.items())}
+        return val_type(marshal_val(item, depth=depth + 1) for _n, item in zip(range(max_items), val))
+    try:
+        repr_str = repr(val)
+    except Exception as e:
+        repr_str = f"<{val_type.__name__} object (repr failed: {e})>"
+    return make_marshalled_object(val_type.__name__, repr_str)
+
+def _limit_cpu(max_cpu_secs: int):
+    """
+    Give the next snippet max_cpu_secs of CPU time on top of what the worker has already used.
+    Beyond that the worker is sent SIGXCPU and dies.
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft_limit = int(usage.ru_utime + usage.ru_stime) + max_cpu_secs
+    _soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        soft_limit = min(soft_limit, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft_limit, hard))
+
+def _worker_main(conn, *, max_bytes: int, max_cpu_secs: int):
+    """
+    Requests (all tuples):
+      ('load', snippet_key, snippet)
+      ('get', snippet_key, block_idx, name_type, name_details, name_str)
+    Replies:
+      ('ok', marshalled value)
+      ('error', exception type name, message)
+      ('missing', ) - snippet not loaded (or no longer) so load it and ask again
+    """
+    _soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard == resource.RLIM_INFINITY or max_bytes < hard:
+        resource.setrlimit(resource.RLIMIT_AS, (max_bytes, hard))
+    snippet_executions = {}
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        request_type, snippet_key, *details = request
+        if request_type == 'load':
+            snippet, = details
+            snippet_executions.pop(snippet_key, None)
+            if len(snippet_executions) >= MAX_WORKER_SNIPPETS:
+                del snippet_executions[next(iter(snippet_executions))]  ## oldest loaded
+            snippet_executions[snippet_key] = SnippetExecution(get_tree(snippet).body)
+            _limit_cpu(max_cpu_secs)
+            conn.send(('ok', None))
+        elif request_type == 'get':
+            snippet_execution = snippet_executions.get(snippet_key)
+            if snippet_execution is None:
+                conn.send(('missing', ))
+                continue
+            try:
+                val = snippet_execution.get_val(*details)
+                reply = ('ok', marshal_val(val))
+            except Exception as e:
+                reply = ('error', type(e).__name__, str(e))
+            conn.send(reply)
+        else:
+            raise Exception(f"Unexpected request type: '{request_type}'")
+
+def run_worker(fd: str, max_bytes: str, max_cpu_secs: str):
+    """
+    Entry point of a worker process (see ExecutionWorker.start) - all arguments come from the command line.
+
+    :param fd: file descriptor of the worker's end of the socket pair connecting it to the analysing process
+    """
+    from multiprocessing.connection import Connection  ## only needed in worker processes
+    _worker_main(Connection(int(fd)), max_bytes=int(max_bytes), max_cpu_secs=int(max_cpu_secs))
+
+class WorkerFailed(Exception):
+    """
+    The worker timed out or died (e.g. hit its memory or CPU limit).
+    """
+
+class ExecutionWorker:
+
+    def __init__(self):
+        self.lock = Lock()  ## one request (and reply) at a time
+        self.process = None
+        self.conn = None
+        self.start()
+
+    def start(self):
+        """
+        Start a new Python process running run_worker - safe even with other threads running
+        (subprocess execs straight after forking). When the analysing process exits, its end of the socket pair
+        is closed and the worker stops.
+        """
+        ## only imported once code is actually executed
+        from multiprocessing.connection import Connection
+        import socket
+        import subprocess
+        conn_sock, child_sock = socket.socketpair()
+        with child_sock:
+            superhelp_parent = str(Path(__file__).resolve().parent.parent)  ## so the worker imports this superhelp
+            self.process = subprocess.Popen([sys.executable, '-c', WORKER_CODE, superhelp_parent,
+                    str(child_sock.fileno()), str(conf.CODE_EXECUTION_MAX_BYTES), str(conf.CODE_EXECUTION_MAX_CPU_SECS)],
+                stdin=subprocess.DEVNULL, pass_fds=(child_sock.fileno(), ))
+        self.conn = Connection(conn_sock.detach())
+
+    def restart(self):
+        self.process.kill()
+        self.process.wait()
+        self.conn.close()
+        self.start()
+
+    def request(self, request: tuple) -> tuple:
+        """
+        Must already hold the lock. Raises WorkerFailed (after replacing the worker) if no reply in time.
+        """
+        try:
+            self.conn.send(request)
+            if self.conn.poll(conf.CODE_EXECUTION_TIMEOUT_SECS):
+                return self.conn.recv()
+            problem = f"no reply within {conf.CODE_EXECUTION_TIMEOUT_SECS} seconds"
+        except (EOFError, OSError) as e:
+            problem = f"worker died ({e.__class__.__name__})"
+        logging.debug(f"Code execution worker failed - {problem}")
+        self.restart()
+        raise WorkerFailed(problem)
+
+class ExecutionWorkerPool:
+
+    def __init__(self, n_workers: int):
+        self.workers = [ExecutionWorker() for _n in range(n_workers)]
+
+    def get_worker(self, snippet_key: str) -> ExecutionWorker:
+        """
+        The same snippet always goes to the same worker so it only has to be run once.
+        """
+        return self.workers[int(snippet_key, 16) % len(self.workers)]
+
+_pool = None
+_pool_pid = None
+_pool_lock = Lock()
+
+def get_execution_worker_pool() -> ExecutionWorkerPool:
+    """
+    Made on first use. Each process (e.g. a worker process analysing code items in parallel) gets its own.
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ExecutionWorkerPool(conf.CODE_EXECUTION_WORKERS)
+            _pool_pid = os.getpid()
+    return _pool
+
+def _get_exception(exception_type_name: str, msg: str) -> Exception:
+    """
+    Same type of exception as raised in the worker where a builtin (e.g. KeyError) so callers can handle it as usual.
+    """
+    exception_type = getattr(builtins, exception_type_name, None)
+    if isinstance(exception_type, type) and issubclass(exception_type, Exception):
+        return exception_type(msg)
+    return Exception(f"{exception_type_name}: {msg}")
+
+class SandboxedSnippetExecution:
+    """
+    Same interface as code_execution.SnippetExecution (get_val) but the code runs in a worker process.
+    Nothing is sent to a worker until a value is asked for.
+    """
+
+    def __init__(self, snippet: str):
+        self.snippet = snippet
+        self.snippet_key = sha256(snippet.encode('utf-8')).hexdigest()
+        self.failed = False  ## once the limits have been hit there's no point trying again
+
+    def get_val(self, block_idx: int, name_type, name_details, name_str):
+        """
+        See code_execution.get_val. Raises KeyError if the worker had to give up on the snippet.
+        """
+        if self.failed:
+            raise KeyError(f"Unable to execute snippet to find name '{name_str}'")
+        worker = get_execution_worker_pool().get_worker(self.snippet_key)
+        get_request = ('get', self.snippet_key, block_idx, name_type, name_details, name_str)
+        with worker.lock:
+            try:
+                reply = worker.request(get_request)
+                if reply[0] == 'missing':
+                    worker.request(('load', self.snippet_key, self.snippet))
+                    reply = worker.request(get_request)
+            except WorkerFailed as e:
+                self.failed = True
+                raise KeyError(f"Unable to execute snippet to find name '{name_str}' - {e}")
+        reply_type, *reply_details = reply
+        if reply_type == 'ok':
+            val, = reply_details
+            return val
+        raise _get_exception(*reply_details)
+
+def can_sandbox() -> bool:
+    return resource is not None
+
+def get_snippet_execution(snippet: str, block_nodes) -> SnippetExecution | SandboxedSnippetExecution:
+    """
+    :param block_nodes: the statements in the body of the snippet's AST Module
+    """
+    if conf.SANDBOX_CODE_EXECUTION and can_sandbox():
+        return SandboxedSnippetExecution(snippet)
+    return SnippetExecution(block_nodes)
@@ -1 +0,0 @@
-from superhelp.formatters import cli_formatter, html_formatter, md_formatter
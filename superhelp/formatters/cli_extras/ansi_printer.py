@@ -24,8 +24,7 @@ class AnsiPrinter(Treeprocessor):
                 if text[len_admon_start:].startswith(admon_lbl):
                     break
             else:  ## i.e. never exited
-                admon_lbl = text[len_admon_start:].split(" ", 1)[0]
-                cli_colour.ADMONS[admon_lbl] = cli_colour.ADMONS.values()[0]
+                admon_lbl = text[len_admon_start:].split(" ", 1)[0]  ## coloured as the default admonition
             prefix = body_prefix = '┃ '
             prefix += admon_lbl.capitalize()
             admon_lbl_used = admon_lbl
@@ -38,7 +37,7 @@ class AnsiPrinter(Treeprocessor):
             iout = []
             AnsiPrinter.formatter(child_el, iout, nesting_level + 2, parent=el)
             pr = cli_colour.colourise(
-                cli_conf.BQUOTE_PREFIX, cli_colour.H1_COLOUR)  # @UndefinedVariable
+                cli_conf.BQUOTE_PREFIX, cli_colour.get_colours().h1_colour)
             sp = ' ' * (nesting_level + 2)
             for l in iout:
                 for l1 in l.splitlines():
@@ -216,13 +215,14 @@ class AnsiPrinter(Treeprocessor):
             # indent. can color the prefixes now, no more len checks:
             if admon_lbl_used:
                 out.append("\n")
-                colour = globals()[cli_colour.ADMONS[admon_lbl_used]]
+                colour_name = cli_colour.ADMONS.get(admon_lbl_used, cli_colour.ADMONS[cli_colour.DEFAULT_ADMON])
+                colour = cli_colour.get_colours().theme[colour_name]
                 prefix = cli_colour.colourise(prefix, colour)
                 body_prefix = cli_colour.colourise(body_prefix, colour)
 
             if prefix:
                 h_level = ((nesting_level - 2) % 5) + 1
-                colour = getattr(cli_colour, f"H{h_level}_COLOUR")
+                colour = cli_colour.get_colours().level2colour[h_level]
                 if (prefix == cli_conf.LIST_PREFIX
                         or prefix.split('.', 1)[0].isdigit()):
                     prefix = cli_colour.colourise(prefix, colour)
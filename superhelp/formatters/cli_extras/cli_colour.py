@@ -1,4 +1,9 @@
 
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import cache
+
 from superhelp.formatters.cli_extras import cli_conf
 
 DEFAULT_ANSI_COLOUR_BYTE_STR = '\033[0m'
@@ -43,20 +48,26 @@ light = {
     'FLOAT': 232,  ## black
 }
 
-def set_global_colours(theme_name):
+@dataclass(frozen=True)
+class Colours:
     """
-    Given I had no desire to completely refactor the CLI code I focused the evil
-    in this one place. If you read this, please forgive me.
+    ANSI colours for one theme. Which colours are in use is per thread / asyncio task (see using_colours)
+    so terminal help in different themes can be formatted at the same time.
     """
-    theme = globals()[theme_name]
-    global H1_COLOUR
-    global TOKEN_NAME_TO_HL_COLOUR
-    global LEVEL2COLOUR
-    global BOUNDS2COLOUR
-    global TEXT
-    global CODE_COLOUR
-    global LOW_VIS_COLOUR
-    TOKEN_NAME_TO_HL_COLOUR = {
+    theme: dict[str, int]
+    token_name2hl_colour: dict[str, int]
+    level2colour: dict[int, int]
+    bounds2colour: dict[tuple[str, str], int]
+    text: int
+    h1_colour: int
+    h3_colour: int
+    code_colour: int
+    low_vis_colour: int
+
+@cache
+def get_theme_colours(theme_name) -> Colours:
+    theme = {'dark': dark, 'light': light}[theme_name]
+    token_name2hl_colour = {
         "Comment": theme['LOW_VIS_COLOUR'],
         "Error": theme['ERROR'],
         "Generic": theme['H2_COLOUR'],
@@ -73,23 +84,42 @@ def set_global_colours(theme_name):
         "Literal.Number.Float": theme['FLOAT'],
         "Keyword.Constant": theme['KEYWORD'],
     }
-    LEVEL2COLOUR = {
+    level2colour = {
         1: theme['H1_COLOUR'],
         2: theme['H2_COLOUR'],
         3: theme['H3_COLOUR'],
         4: theme['H4_COLOUR'],
         5: theme['H5_COLOUR'],
     }
-    BOUNDS2COLOUR = {
+    bounds2colour = {
         cli_conf.CODE_BOUNDS: theme['H2_COLOUR'],
         cli_conf.STRONG_BOUNDS: theme['H2_COLOUR'],
         cli_conf.LINK_BOUNDS: theme['H2_COLOUR'],
         cli_conf.EMPH_BOUNDS: theme['H3_COLOUR'],
     }
-    TEXT = theme['TEXT']
-    H1_COLOUR = theme['H1_COLOUR']
-    CODE_COLOUR = theme['CODE_COLOUR']
-    LOW_VIS_COLOUR = theme['LOW_VIS_COLOUR']
+    return Colours(theme=theme, token_name2hl_colour=token_name2hl_colour, level2colour=level2colour,
+        bounds2colour=bounds2colour, text=theme['TEXT'], h1_colour=theme['H1_COLOUR'], h3_colour=theme['H3_COLOUR'],
+        code_colour=theme['CODE_COLOUR'], low_vis_colour=theme['LOW_VIS_COLOUR'])
+
+_colours: ContextVar[Colours] = ContextVar('colours')
+
+@contextmanager
+def using_colours(colours: Colours):
+    """
+    Colours for the current thread / asyncio task until the end of the with block
+    (e.g. a session's colours while formatting its help).
+    """
+    token = _colours.set(colours)
+    try:
+        yield colours
+    finally:
+        _colours.reset(token)
+
+def get_colours() -> Colours:
+    try:
+        return _colours.get()
+    except LookupError:
+        return get_theme_colours('dark')
 
 ADMONS = { ## Will be extended dynamically to avoid pointless recalculation if admonitions with other keys found in markdown text received
     'note': 'H3_COLOUR',
@@ -104,6 +134,7 @@ ADMONS = { ## Will be extended dynamically to avoid pointless recalculation if a
     'hint': 'H4_COLOUR',
     'caution': 'H2_COLOUR',
 }
+DEFAULT_ADMON = 'note'
 
 def colourise(text, colour, *, reverse=False, bold=False, no_reset=False):
     """
@@ -126,7 +157,7 @@ def colourise(text, colour, *, reverse=False, bold=False, no_reset=False):
      content until toggled off.
     """
     reset_colour = '' if no_reset else DEFAULT_ANSI_COLOUR_BYTE_STR
-    for (start, end), inner_colour in BOUNDS2COLOUR.items():
+    for (start, end), inner_colour in get_colours().bounds2colour.items():
         if start in text:
             if start == cli_conf.LINK_START:
                 uon, uoff = "\033[4m", "\033[24m"
@@ -142,7 +173,7 @@ def colourise(text, colour, *, reverse=False, bold=False, no_reset=False):
     return text
 
 def colourise_low_vis(text):
-    return colourise(text, LOW_VIS_COLOUR)
+    return colourise(text, get_colours().low_vis_colour)
 
 def colourise_plain(text, **_kwargs):
     """
@@ -150,4 +181,4 @@ def colourise_plain(text, **_kwargs):
 
     Used in context where multiple args supplied but we ignore them here.
     """
-    return colourise(text, TEXT)
+    return colourise(text, get_colours().text)
@@ -127,7 +127,7 @@ ansi_escape = re.compile(r"\x1b[^m]*m")
 def get_code_hl_tokens():
     code_hl_tokens = {}
     # replace code strs with tokens:
-    for token_name, colour in cli_colour.TOKEN_NAME_TO_HL_COLOUR.items():  # @UndefinedVariable
+    for token_name, colour in cli_colour.get_colours().token_name2hl_colour.items():
         if '.' not in token_name:  ## cope with Operator.Word as token_name
             code_hl_tokens[getattr(token, token_name)] = colour
         else:
@@ -149,7 +149,7 @@ def style_ansi(raw_code):
     for my_token, text in tokens:
         if not text:
             continue
-        colour = code_hl_tokens.get(my_token, cli_colour.CODE_COLOUR)  # @UndefinedVariable
+        colour = code_hl_tokens.get(my_token, cli_colour.get_colours().code_colour)
         code_lines.append(cli_colour.colourise(text, colour))
         logging.debug(my_token, colour)
     styled_ansi_code = ''.join(code_lines)
@@ -188,7 +188,7 @@ def split_blocks(text_block, width, n_cols, part_formatter=None):
                 (' '
                 +
                 cli_colour.colourise(
-                    cli_conf.TEXT_BLOCK_CUT, cli_colour.LOW_VIS_COLOUR,  # @UndefinedVariable
+                    cli_conf.TEXT_BLOCK_CUT, cli_colour.get_colours().low_vis_colour,
                     no_reset=True)
                 + line[i : i + scols]
                 )
@@ -203,7 +203,7 @@ def split_blocks(text_block, width, n_cols, part_formatter=None):
             tpart.append(lines_block[block_part_nr])
         if part_formatter:
             part_formatter(tpart)
-        tpart[1] = cli_colour.colourise(tpart[1], cli_colour.H3_COLOUR)  # @UndefinedVariable
+        tpart[1] = cli_colour.colourise(tpart[1], cli_colour.get_colours().h3_colour)
         blocks.append("\n".join(tpart))
     text = 'n' + '\n'.join(blocks) + '\n'
     return text
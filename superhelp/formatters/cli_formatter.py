@@ -2,9 +2,10 @@ from pathlib import Path
 from textwrap import dedent
 
 from superhelp import conf
+from superhelp.analysis_session import AnalysisSession
 from superhelp.conf import Level, Theme
 from superhelp.formatters.cli_extras import md2cli
-from superhelp.formatters.cli_extras.cli_colour import set_global_colours
+from superhelp.formatters.cli_extras.cli_colour import get_theme_colours, using_colours
 from superhelp.gen_utils import get_code_desc, get_intro, get_line_numbered_snippet, layout_comment as layout
 from superhelp.messages import MessageSpec
 """
@@ -51,11 +52,19 @@ def _need_snippet_displayed(overall_messages_dets, block_messages_dets, *,
 
 def get_formatted_help(code: str, code_file_path: Path, messages_dets, *,
         detail_level: Level = Level.BRIEF, theme_name: Theme = Theme.LIGHT,
-        warnings_only=False, multi_block=False) -> str:
+        warnings_only=False, multi_block=False, session: AnalysisSession | None = None) -> str:
     """
     Show by code blocks.
+
+    :param session: if supplied, its colours are used (rather than those of theme_name)
     """
-    set_global_colours(theme_name)
+    colours = session.colours if session else get_theme_colours(theme_name)
+    with using_colours(colours):
+        return _get_formatted_help(code, code_file_path, messages_dets,
+            detail_level=detail_level, warnings_only=warnings_only, multi_block=multi_block)
+
+def _get_formatted_help(code: str, code_file_path: Path, messages_dets, *,
+        detail_level: Level = Level.BRIEF, warnings_only=False, multi_block=False) -> str:
     md2cli.term_columns = TERMINAL_WIDTH
     if warnings_only:
         options_msg = conf.WARNINGS_ONLY_MSG
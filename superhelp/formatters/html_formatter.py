@@ -2,6 +2,9 @@
 Code highlighting approach:
 https://coderbook.com/@marcus/how-to-render-markdown-syntax-as-html-using-python/
 """
+from collections import Counter
+from dataclasses import dataclass
+from html import escape
 from pathlib import Path
 from textwrap import dedent, indent
 
@@ -154,9 +157,98 @@ VISIBILITY_SCRIPT = """\
 </script>
 """ % {'brief': Level.BRIEF, 'main': Level.MAIN, 'extra': Level.EXTRA}
 
+PROJECT_INDEX_HTML_WRAPPER = """\
+<!DOCTYPE html>
+<html lang="en">
+{head}
+<body>
+{logo_svg}
+<h1>SuperHELP - Help for Humans!</h1>
+<p>Help on {n_modules:,} modules in '{project_desc}'. Select a module to see its help below.</p>
+<h2>Warnings by source</h2>
+{sources_table}
+<h2>Modules</h2>
+{modules_table}
+<p id="pages"></p>
+<iframe name="{module_frame_name}" title="Module help"></iframe>
+{pagination_script}
+</body>
+</html>"""
+
+PROJECT_INDEX_CSS = """\
+table {
+  border-collapse: collapse;
+  font-size: 11px;
+}
+th, td {
+  padding: 2px 10px 2px 0;
+  text-align: left;
+}
+td.count {
+  text-align: right;
+}
+#pages a {
+  margin-right: 6px;
+}
+iframe {
+  border: 1px solid #0072aa;
+  width: 100%;
+  height: 800px;
+}
+"""
+
+MODULE_FRAME_NAME = 'module-help'
+
+## only one page of the module table is shown at a time so even huge projects give a usable index
+PAGINATION_SCRIPT = """\
+<script>
+ var rowsPerPage = %(rows_per_page)s;
+ var moduleRows = document.querySelectorAll('#modules tbody tr');
+ var nPages = Math.ceil(moduleRows.length / rowsPerPage);
+
+ function showPage(pageIdx) {
+   moduleRows.forEach(function(row, rowIdx) {
+     row.style.display = Math.floor(rowIdx / rowsPerPage) === pageIdx ? '' : 'none';
+   });
+ }
+
+ if (nPages > 1) {
+   var pages = document.getElementById('pages');
+   for (let pageIdx = 0; pageIdx < nPages; pageIdx++) {
+     var pageLink = document.createElement('a');
+     pageLink.href = '#';
+     pageLink.textContent = pageIdx + 1;
+     pageLink.addEventListener('click', function(event) {
+       event.preventDefault();
+       showPage(pageIdx);
+     });
+     pages.appendChild(pageLink);
+   }
+ }
+ showPage(0);
+</script>
+""" % {'rows_per_page': conf.PROJECT_REPORT_MODULES_PER_PAGE}
+
 PART = 'part'
 IS_CODE = 'is_code'
 
+@dataclass
+class ModuleSummary:
+    """
+    What the project index needs to know about the help on a module.
+    """
+    code_file_path: Path
+    page_url: str  ## relative to the index page
+    n_messages: int
+    warning_source_counts: Counter  ## number of warnings by message source
+
+def get_module_summary(code_file_path: Path, messages_dets, *, page_url: str) -> ModuleSummary:
+    overall_messages_dets, block_messages_dets = messages_dets
+    all_messages_dets = [*overall_messages_dets, *block_messages_dets]
+    warning_source_counts = Counter(
+        message_dets.source for message_dets in all_messages_dets if message_dets.warning)
+    return ModuleSummary(code_file_path, page_url, len(all_messages_dets), warning_source_counts)
+
 def _get_radio_buttons(*, detail_level=Level.BRIEF):
     radio_buttons_dets = []
     for message_type in LEVEL_OPTIONS:
@@ -348,11 +440,11 @@ def _get_all_html_strs(code: str, file_path: Path,
         all_html_strs.extend(message_html_strs)
     return all_html_strs
 
-def _get_head(*, in_notebook=False):
+def _get_head(*, in_notebook=False, full_width=False, extra_css=''):
     internal_css = conf.INTERNAL_CSS % {
-        'code_css': CODE_CSS,
+        'code_css': CODE_CSS + extra_css,
         'margin_css': '' if in_notebook else 'margin: 40px 70px 20px 70px;',
-        'max_width_css': '' if in_notebook else 'max-width: 700px;'
+        'max_width_css': '' if in_notebook or full_width else 'max-width: 700px;'
     }
     head = conf.HTML_HEAD % {
         'internal_css': internal_css}
@@ -387,3 +479,41 @@ def get_formatted_help(code: str, code_file_path: Path, messages_dets, *,
             body_inner=body_inner,
             visibility_script=VISIBILITY_SCRIPT)
     return formatted_help
+
+def _get_sources_table(module_summaries: list[ModuleSummary]) -> str:
+    source_counts = Counter()
+    source_n_modules = Counter()
+    for module_summary in module_summaries:
+        source_counts.update(module_summary.warning_source_counts)
+        source_n_modules.update(module_summary.warning_source_counts.keys())
+    if not source_counts:
+        return "<p>No warnings.</p>"
+    rows = [f"<tr><td>{escape(source)}</td><td class='count'>{n_warnings:,}</td>"
+        f"<td class='count'>{source_n_modules[source]:,}</td></tr>"
+        for source, n_warnings in sorted(source_counts.items(), key=lambda source_count: (-source_count[1], source_count[0]))]
+    rows_html = '\n'.join(rows)
+    return (f"<table id='sources'>\n<thead><tr><th>Source</th><th>Warnings</th><th>Modules</th></tr></thead>\n"
+        f"<tbody>\n{rows_html}\n</tbody>\n</table>")
+
+def _get_modules_table(module_summaries: list[ModuleSummary]) -> str:
+    rows = [f"<tr><td><a href='{escape(module_summary.page_url)}' target='{MODULE_FRAME_NAME}'>"
+        f"{escape(str(module_summary.code_file_path))}</a></td>"
+        f"<td class='count'>{sum(module_summary.warning_source_counts.values()):,}</td>"
+        f"<td class='count'>{module_summary.n_messages:,}</td></tr>"
+        for module_summary in module_summaries]
+    rows_html = '\n'.join(rows)
+    return (f"<table id='modules'>\n<thead><tr><th>Module</th><th>Warnings</th><th>Messages</th></tr></thead>\n"
+        f"<tbody>\n{rows_html}\n</tbody>\n</table>")
+
+def get_project_index(module_summaries: list[ModuleSummary], *, project_desc: str) -> str:
+    """
+    Index page for a project report - a summary of warnings by source, and a paginated table of modules.
+    Module pages are only loaded (into a frame on the index page) when selected.
+    """
+    return PROJECT_INDEX_HTML_WRAPPER.format(
+        head=_get_head(full_width=True, extra_css=PROJECT_INDEX_CSS), logo_svg=conf.LOGO_SVG,
+        n_modules=len(module_summaries), project_desc=escape(project_desc),
+        sources_table=_get_sources_table(module_summaries),
+        modules_table=_get_modules_table(module_summaries),
+        module_frame_name=MODULE_FRAME_NAME,
+        pagination_script=PAGINATION_SCRIPT)
@@ -0,0 +1,61 @@
+"""
+Machine-readable help - one JSON object per code item (so a project run is a stream of JSON Lines).
+
+Each code item is serialised as soon as its details are available
+so consumers can process results as they arrive rather than waiting for a whole project.
+Message text is Markdown (as in md output) with every level of detail included
+so consumers can choose what to show.
+"""
+import json
+from pathlib import Path
+from textwrap import dedent
+
+from superhelp import conf
+from superhelp.conf import LEVEL_OPTIONS, Level
+from superhelp.messages import MessageSpec
+
+MD_CODE_FENCE = "```"
+
+OVERALL_SCOPE = 'overall'
+BLOCK_SCOPE = 'block'
+
+def _get_level_str(message_str: str) -> str:
+    return (dedent(message_str)
+        .replace(conf.PYTHON_CODE_START, '\n' + MD_CODE_FENCE)
+        .replace('\n    ' + conf.PYTHON_CODE_END, MD_CODE_FENCE + '\n')
+        .strip('\n'))
+
+def get_message_dict(message_spec: MessageSpec, *, scope: str) -> dict:
+    message_level_strs = message_spec.message_level_strs
+    level2str = {
+        Level.BRIEF: message_level_strs.brief,
+        Level.MAIN: message_level_strs.main,
+        Level.EXTRA: message_level_strs.extra,  ## only what extra adds to main
+    }
+    return {
+        'scope': scope,
+        'source': message_spec.source,
+        'warning': message_spec.warning,
+        'first_line_no': message_spec.first_line_no,
+        'code_str': message_spec.code_str,
+        'message_level_strs': {detail_level.value: _get_level_str(level2str[detail_level])
+            for detail_level in LEVEL_OPTIONS},
+    }
+
+def get_formatted_help(code: str, code_file_path: Path | None, messages_dets, *,
+        warnings_only=False, multi_block=False, **_kwargs) -> str:
+    """
+    :return: a single line of JSON
+    """
+    overall_messages_dets, block_messages_dets = messages_dets
+    message_dicts = [get_message_dict(message_dets, scope=OVERALL_SCOPE) for message_dets in overall_messages_dets]
+    message_dicts.extend(get_message_dict(message_dets, scope=BLOCK_SCOPE)
+        for message_dets in sorted(block_messages_dets, key=lambda nt: (nt.first_line_no, nt.warning)))
+    code_item_dict = {
+        'code_file_path': None if code_file_path is None else str(code_file_path),
+        'n_lines': len(code.splitlines()),
+        'multi_block': multi_block,
+        'warnings_only': warnings_only,
+        'messages': message_dicts,
+    }
+    return json.dumps(code_item_dict, ensure_ascii=False)
@@ -1,20 +1,24 @@
 from contextlib import contextmanager
+from functools import cache
 import inspect
 import logging
 import os
 from pathlib import Path
 import platform
 import re
+import stat
 import sys
 import tempfile
 from textwrap import dedent, wrap
-from typing import Sequence
+from typing import TYPE_CHECKING, Sequence
 import webbrowser
 
 import ast
 
 from superhelp import code_execution, conf, name_utils
-import astpath
+
+if TYPE_CHECKING:
+    from lxml import etree  ## lxml only imported once there is code to analyse
 
 starting_num_space_pattern = r"""(?x)
     ^      ## start
@@ -42,6 +46,21 @@ def get_items(raw_item_els):
             items.append(val)
     return items
 
+def get_field_items(field_el):
+    """
+    Items of a collection field element e.g. elts.
+    Huge literals only have their first items in the XML (see ast_xml) -
+    the items left out are conf.UNKNOWN_ITEMs so there are still as many items as in the code.
+
+    :rtype: list
+    """
+    item_els = field_el.getchildren()
+    if item_els and item_els[-1].tag == conf.COLLAPSED_ITEMS_TAG:
+        n_items = int(item_els[-1].get('n_items'))
+        item_els = item_els[:-1]
+        return get_items(item_els) + [conf.UNKNOWN_ITEM] * (n_items - len(item_els))
+    return get_items(item_els)
+
 def ast_collection_items(named_el):
     """
     Get items in collection using AST only. Cope with unknowns using
@@ -66,17 +85,14 @@ def ast_collection_items(named_el):
     items = []
     tag = named_el.tag
     if tag == 'Dict':
-        raw_key_els = named_el.xpath('keys')[0].getchildren()
-        raw_val_els = named_el.xpath('values')[0].getchildren()
-        keys = get_items(raw_key_els)
-        vals = get_items(raw_val_els)
+        keys = get_field_items(named_el.xpath('keys')[0])
+        vals = get_field_items(named_el.xpath('values')[0])
         items = list(zip(keys, vals))
     elif tag == 'Set':
-        raw_val_els = named_el.xpath('elts')[0].getchildren()
+        raw_val_els = named_el.xpath('elts')[0].getchildren()  ## set literals are never collapsed (see ast_xml)
         items = list(set(get_items(raw_val_els)))  ## inner set casting needed in case multiple Nones - just because they must be different to be in a set doesn't mean this code can tell the difference ;-)
     elif tag in ('List', 'Tuple'):
-        raw_val_els = named_el.xpath('elts')[0].getchildren()
-        items = get_items(raw_val_els)
+        items = get_field_items(named_el.xpath('elts')[0])
     elif tag == 'ListComp':
         items = conf.UNKNOWN_ITEMS  ## impractical to evaluate using AST
     elif tag == 'Name':
@@ -96,10 +112,13 @@ def ast_collection_items(named_el):
                         raise Exception("All tuples in a dict definition should"
                             " be two-tuples (key, value)")
                     tups_list.append(tup_items)
+                collapsed_els = elts_els[0].xpath(conf.COLLAPSED_ITEMS_TAG)
+                if collapsed_els:  ## the two-tuples left out of a huge literal (see get_field_items)
+                    n_left_out = int(collapsed_els[0].get('n_items')) - (len(elts_els[0]) - 1)
+                    tups_list.extend([conf.UNKNOWN_ITEM, conf.UNKNOWN_ITEM] for _n in range(n_left_out))
                 items = tups_list
             else:
-                raw_val_els = elts_els[0].getchildren()
-                items = get_items(raw_val_els)
+                items = get_field_items(elts_els[0])
         elif len(elts_els) == 0 and name_id in ('list', 'set', 'tuple'):
             items = []  ## empty collection that's why no elts_els
         else:
@@ -238,9 +257,26 @@ def get_tree(snippet, *, debug=False):
     return tree
 
 def xml_from_tree(tree):
-    xml = astpath.asts.convert_to_xml(tree)
+    from superhelp.ast_xml import convert_to_xml  ## imports lxml so only once there is code to analyse
+    xml = convert_to_xml(tree)
     return xml
 
+@cache
+def get_compiled_xpath(xpath: str) -> 'etree.XPath':
+    """
+    Compiling an XPath expression once and reusing it is much faster than evaluating the raw string every time
+    (which is what el.xpath(xpath) does). Shared by everything so each distinct expression is only compiled once.
+    """
+    from lxml import etree
+    return etree.XPath(xpath)
+
+def run_xpath(el, xpath: str) -> list:
+    """
+    Drop-in replacement for el.xpath(xpath) using the shared cache of compiled expressions.
+    Use inside helpers, especially anything run in loops.
+    """
+    return get_compiled_xpath(xpath)(el)
+
 def get_intro(file_path, *, multi_block=False):
     if not file_path:
         if multi_block:
@@ -316,6 +352,45 @@ def get_superhelp_tmpdir(folder='superhelp') -> Path:
     superhelp_tmpdir = os.path.join(tmpdir, folder)
     return Path(superhelp_tmpdir)
 
+def get_user_cache_dir(folder: str | None = None) -> Path:
+    """
+    SuperHELP's folder in the current user's own cache folder
+    e.g. ~/.cache/superhelp ($XDG_CACHE_HOME/superhelp if set) or a folder inside it
+    """
+    cache_home = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    user_cache_dir = Path(cache_home) / 'superhelp'
+    return user_cache_dir / folder if folder else user_cache_dir
+
+def get_user_runtime_dir() -> Path:
+    """
+    SuperHELP's folder in the current user's own runtime folder e.g. /run/user/1000/superhelp
+    ($XDG_RUNTIME_DIR/superhelp) - for things only relevant while processes are running e.g. how to reach the daemon.
+    If there is no runtime folder, SuperHELP's folder in the user's cache folder (see get_user_cache_dir).
+    """
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    return Path(runtime_dir) / 'superhelp' if runtime_dir else get_user_cache_dir()
+
+def is_owned_by_user(stat_result: os.stat_result) -> bool:
+    getuid = getattr(os, 'getuid', None)  ## not on Windows - where folders in the user's own profile are private anyway
+    return getuid is None or stat_result.st_uid == getuid()
+
+def make_private_dir(dir_path: Path) -> Path:
+    """
+    Make the folder (and any parents) if not already there so only the current user can get at it (0700).
+    Anything SuperHELP reads back and trusts (e.g. cached analysis or details of the daemon) must be kept in one -
+    never in a shared folder such as the standard temp folder where anyone could plant it.
+
+    :raises PermissionError: if the folder belongs to someone else or is not a real folder (e.g. a symlink)
+    """
+    dir_path = Path(dir_path)
+    dir_path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    stat_result = dir_path.lstat()
+    if not stat.S_ISDIR(stat_result.st_mode) or not is_owned_by_user(stat_result):
+        raise PermissionError(f"Unable to use '{dir_path}' - it isn't a folder belonging to the current user")
+    if stat.S_IMODE(stat_result.st_mode) & 0o077:  ## e.g. made by hand - keep everyone else out from now on
+        dir_path.chmod(0o700)
+    return dir_path
+
 @contextmanager
 def make_open_tmp_file(fname, *, superhelp_tmpdir=None, mode='w'):
     """
@@ -1,23 +1,24 @@
 import argparse
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
+from importlib import import_module
+from itertools import islice
 import logging
-import os
 from pathlib import Path
 from types import ModuleType
 from typing import Generator, Sequence
 
-from superhelp import conf, gen_utils, helpers, messages
+from superhelp import conf, gen_utils, helpers, messages, profiling, project_files
+from superhelp.analysis_cache import AnalysisCache, get_analysis_cache
+from superhelp.analysis_session import AnalysisSession
 from superhelp.conf import (FORMAT_INTERACTIVE_FORMATS, FORMAT_OPTIONS, LEVEL_OPTIONS, THEME_OPTIONS,
     Format, Level, Theme)
-from superhelp.formatters import cli_formatter, html_formatter, md_formatter
-from superhelp.displayers import cli_displayer, html_displayer, md_displayer
 
 logging.basicConfig(
     level=conf.LOG_LEVEL,
     format='%(asctime)s %(levelname)-8s %(message)s',
     datefmt='%Y-%m-%d %H:%M:%S')
 
-helpers.load_helpers()
+helpers.load_helpers(lazy=True)  ## helper modules only imported when needed
 
 @dataclass(frozen=True)
 class OutputSettings:
@@ -26,37 +27,53 @@ class OutputSettings:
     detail_level: Level = Level.MAIN  ## level of detail e.g. Extra
     warnings_only: bool = False  ## show warnings only
     execute_code: bool = False  ## execute code (vs only relying on inspection of AST)
+    jobs: int = 1  ## number of worker processes analysing project modules (1 means no worker processes)
+    use_cache: bool = False  ## reuse analysis of unchanged code from earlier runs (shelp opts in unless --no-cache) - never if executing code
+    cache_path: Path | None = None  ## where the analysis cache lives (default is inside the user's own cache folder e.g. ~/.cache/superhelp)
+    project_report: bool = True  ## HTML help on a project as one report (index plus module pages) rather than a tab per module
     tmp_html_path: Path | None = None  ## necessary if using HTML output and snap packing sand-boxing prevents access to standard temp folders (grrrr!)
+    profile: bool = False  ## time every stage and helper (see profiling) - analysis is always in-process and uncached
+
+def _get_isolated_code_item_dets(code: str, warnings_only: bool, execute_code: bool,
+        prepared_inputs: dict[str, object] | None = None, profile: profiling.Profile | None = None
+        ) -> messages.IsolatedSnippetDets | tuple[tuple[list[messages.MessageSpec], list[messages.MessageSpec]], bool]:
+    """
+    Run in worker processes so must be importable at module level.
+
+    :param prepared_inputs: snippet string helper inputs already prepared e.g. by batch linting the project
+    :param profile: only ever supplied in-process (profiling never uses worker processes)
+
+    :return: isolated snippet details ready to reconcile in the parent
+     or, for system messages (special code or errors), the final messages_dets and multi_block
+    """
+    system_messages_dets = Pipeline._get_system_messages_dets(code)
+    if system_messages_dets:
+        return system_messages_dets, False
+    try:
+        isolated_snippet_dets = messages.get_isolated_snippet_dets(code,
+            warnings_only=warnings_only, execute_code=execute_code, prepared_inputs=prepared_inputs,
+            profile=profile)
+    except Exception as e:
+        return messages.get_error_message_specs(e, code), False
+    return isolated_snippet_dets
 
 
 class Pipeline:
     """
     The parts of the pipeline from source inputs to either formatted help content or displayed help content.
     """
+    ## modules named rather than imported so only the selected format's stack is imported
+    ## e.g. markdown and pygments for the terminal but neither for JSON
     FORMAT2FORMATTER_MODULE = {
-        Format.HTML: html_formatter,
-        Format.CLI: cli_formatter,
-        Format.MD: md_formatter}
+        Format.HTML: 'superhelp.formatters.html_formatter',
+        Format.CLI: 'superhelp.formatters.cli_formatter',
+        Format.MD: 'superhelp.formatters.md_formatter',
+        Format.JSON: 'superhelp.formatters.json_formatter'}
     FORMAT2DISPLAYER_MODULE = {
-        Format.HTML: html_displayer,
-        Format.CLI: cli_displayer,
-        Format.MD: md_displayer}
-    @staticmethod
-    def _get_file_paths(project_path: Path, exclude_folders: Sequence[Path]) -> list[Path]:
-        """
-        Very easy to end up with far too many modules to process
-        e.g. if inadvertently looking at every module inside the site packages in a virtual env ;-).
-        """
-        file_paths = []
-        for root, dirs, files in os.walk(project_path, topdown=True):
-            dirs[:] = [d for d in dirs if d not in exclude_folders]
-            py_files = [Path(os.path.join(root, file)) for file in files if file.endswith('.py')]
-            file_paths.extend(py_files)
-        if len(file_paths) > conf.MAX_PROJECT_MODULES:
-            raise Exception(
-                f"Too many modules to process - {len(file_paths):,}")
-        return file_paths
-
+        Format.HTML: 'superhelp.displayers.html_displayer',
+        Format.CLI: 'superhelp.displayers.cli_displayer',
+        Format.MD: 'superhelp.displayers.md_displayer',
+        Format.JSON: 'superhelp.displayers.json_displayer'}
     @staticmethod
     def _neutralise_superhelp_import_in_code(code: str) -> str:
         ## prevent infinite recursion where superhelp executes script calling superhelp which in turn would etc etc
@@ -70,15 +87,15 @@ class Pipeline:
 
     @staticmethod
     def _get_file_code(file_path: Path) -> str:
-        with open(file_path) as f:
-            code = f.read()
+        code = project_files.read_code_file(file_path)
         code = code.strip('\n')
         code = Pipeline._neutralise_superhelp_import_in_code(code)
         return code
 
     @staticmethod
     def get_code_items(*, code: str = None, file_path: Path = None,
-            project_path: Path = None, exclude_folders=None) -> Generator:
+            project_path: Path = None, exclude_folders=None, include_patterns: Sequence[str] | None = None,
+            exclude_patterns: Sequence[str] | None = None, use_gitignore=False) -> Generator:
         """
         The start of the pipeline.
 
@@ -89,6 +106,10 @@ class Pipeline:
         This function exists to handle cases where there are multiple code files
         i.e. because we are looking for all scripts in a project folder.
         In most cases, only yielding a single result because there is only one snippet of code / one script involved.
+
+        Project modules are yielded as they are found (and read, in threads) rather than after finding them all.
+        See project_files.iter_project_file_paths for exclude_folders, include_patterns, exclude_patterns,
+        and use_gitignore.
         """
         if code:
             code = code.strip('\n')
@@ -99,10 +120,9 @@ class Pipeline:
             code_file_path = file_path
             yield code, code_file_path
         elif project_path:
-            code_file_paths = Pipeline._get_file_paths(project_path, exclude_folders)
-            for code_file_path in code_file_paths:
-                code = Pipeline._get_file_code(code_file_path)
-                yield code, code_file_path
+            code_file_paths = project_files.iter_project_file_paths(project_path, exclude_folders=exclude_folders,
+                include_patterns=include_patterns, exclude_patterns=exclude_patterns, use_gitignore=use_gitignore)
+            yield from project_files.iter_read_files(code_file_paths, read_file=Pipeline._get_file_code)
         else:
             code = conf.TEST_SNIPPET
             logging.info("Using default snippet because no code provided")
@@ -110,94 +130,313 @@ class Pipeline:
             yield code, code_file_path
 
     @staticmethod
-    def get_code_items_dets(code_items: Generator, *, output_settings: OutputSettings) -> Generator:
+    def _get_system_messages_dets(code: str) -> tuple[list[messages.MessageSpec], list[messages.MessageSpec]] | None:
+        if code.strip() == 'import community':
+            messages_dets = messages.get_community_message(code)
+        elif all([word in code for word in conf.XKCD_WARNING_WORDS]):
+            messages_dets = messages.get_xkcd_warning(code)
+        else:
+            messages_dets = None
+        return messages_dets
+
+    @staticmethod
+    def get_analysis_cache(output_settings: OutputSettings) -> AnalysisCache | None:
+        """
+        :return: None unless caching. Never caching if executing code - the results can depend on more than the code
+         (e.g. which modules are installed or what is in the files it reads) so aren't safe to reuse.
+        """
+        if not output_settings.use_cache or output_settings.execute_code:
+            return None
+        return get_analysis_cache(output_settings.cache_path)
+
+    @staticmethod
+    def _get_cached_isolated_res(code: str, *, analysis_cache: AnalysisCache | None,
+            output_settings: OutputSettings) -> tuple[str | None, messages.IsolatedSnippetDets | None]:
+        """
+        :return: cache key (None if not caching) and cached isolated snippet details (None if not cached)
+        """
+        if not analysis_cache:
+            return None, None
+        cache_key = analysis_cache.get_key(code, warnings_only=output_settings.warnings_only)
+        return cache_key, analysis_cache.get(cache_key)
+
+    @staticmethod
+    def _store_isolated_res(isolated_res, *, analysis_cache: AnalysisCache | None, cache_key: str | None):
+        if analysis_cache and isinstance(isolated_res, messages.IsolatedSnippetDets):  ## not caching system messages
+            analysis_cache.store(cache_key, isolated_res)
+
+    @staticmethod
+    def _get_batch_prepared_inputs(cached_code_items: list[tuple], *, output_settings: OutputSettings,
+            jobs: int, profile: profiling.Profile | None = None) -> list[dict[str, object] | None]:
+        """
+        Prepare the inputs of snippet string helpers (e.g. linting) for every code item in a chunk needing analysis
+        in one go rather than one code item at a time e.g. one linter run over up to conf.BATCH_PREPARE_MAX_ITEMS modules
+        (spread across jobs processes).
+
+        :return: prepared inputs for each code item (None if not batch prepared)
+        """
+        batch_prepared_inputs = [None] * len(cached_code_items)
+        uncached_idxs = [n for n, (code, _code_file_path, _cache_key, cached_isolated_res)
+            in enumerate(cached_code_items)
+            if not cached_isolated_res and not Pipeline._get_system_messages_dets(code)]
+        if len(uncached_idxs) < 2:  ## nothing to gain from batching
+            return batch_prepared_inputs
+        snippets = [cached_code_items[n][0] for n in uncached_idxs]
+        with profiling.timed_stage(profile, profiling.PREPARE):
+            snippets_prepared_inputs = messages.get_batch_prepared_inputs(snippets,
+                warnings_only=output_settings.warnings_only, jobs=jobs)
+        for n, prepared_inputs in zip(uncached_idxs, snippets_prepared_inputs):
+            batch_prepared_inputs[n] = prepared_inputs
+        return batch_prepared_inputs
+
+    @staticmethod
+    def _iter_cached_code_items_chunks(code_items: Generator, *, analysis_cache: AnalysisCache | None,
+            output_settings: OutputSettings) -> Generator:
+        """
+        Yield lists of (code, code_file_path, cache_key, cached_isolated_res) of no more than
+        conf.BATCH_PREPARE_MAX_ITEMS items. Only one chunk of code is read into memory at a time
+        so results can be yielded (e.g. streamed as JSON Lines) before the rest of a project has even been read.
+        """
+        code_items = iter(code_items)
+        while True:
+            cached_code_items = [
+                (code, code_file_path, *Pipeline._get_cached_isolated_res(
+                    code, analysis_cache=analysis_cache, output_settings=output_settings))
+                for code, code_file_path in islice(code_items, conf.BATCH_PREPARE_MAX_ITEMS)]
+            if not cached_code_items:
+                return
+            yield cached_code_items
+
+    @staticmethod
+    def _get_isolated_results(code_items: Generator, *, output_settings: OutputSettings,
+            profile: profiling.Profile | None = None) -> Generator:
+        """
+        Yield code, code_file_path, and isolated result in the same order as the code items.
+
+        Code items are handled in chunks of no more than conf.BATCH_PREPARE_MAX_ITEMS.
+        Within each chunk, cached results are used where available.
+        The snippet string helper inputs (e.g. linting) for the rest are prepared as a batch.
+        Then the rest are worked out in worker processes if there is more than one job; otherwise one by one.
+        Every result of a chunk is yielded before the next chunk is read.
+
+        :param profile: if supplied, everything is worked out afresh in-process so every stage and helper call is timed
+        """
+        if profile:
+            analysis_cache, jobs = None, 1
+        else:
+            analysis_cache, jobs = Pipeline.get_analysis_cache(output_settings), output_settings.jobs
+        analysis_args = (output_settings.warnings_only, output_settings.execute_code)
+        cached_code_items_chunks = Pipeline._iter_cached_code_items_chunks(code_items,
+            analysis_cache=analysis_cache, output_settings=output_settings)
+        if jobs > 1:
+            from concurrent.futures import ProcessPoolExecutor  ## only needed (and only worth importing) for jobs > 1
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                for cached_code_items in cached_code_items_chunks:
+                    batch_prepared_inputs = Pipeline._get_batch_prepared_inputs(cached_code_items,
+                        output_settings=output_settings, jobs=jobs)
+                    futures = [
+                        None if cached_isolated_res
+                        else executor.submit(_get_isolated_code_item_dets, code, *analysis_args, prepared_inputs)
+                        for (code, _code_file_path, _cache_key, cached_isolated_res), prepared_inputs
+                        in zip(cached_code_items, batch_prepared_inputs)]
+                    for (code, code_file_path, cache_key, cached_isolated_res), future in zip(
+                            cached_code_items, futures):
+                        if cached_isolated_res:
+                            isolated_res = cached_isolated_res
+                        else:
+                            isolated_res = future.result()
+                            Pipeline._store_isolated_res(isolated_res,
+                                analysis_cache=analysis_cache, cache_key=cache_key)
+                        yield code, code_file_path, isolated_res
+        else:
+            for cached_code_items in cached_code_items_chunks:
+                batch_prepared_inputs = Pipeline._get_batch_prepared_inputs(cached_code_items,
+                    output_settings=output_settings, jobs=jobs, profile=profile)
+                for (code, code_file_path, cache_key, cached_isolated_res), prepared_inputs in zip(
+                        cached_code_items, batch_prepared_inputs):
+                    if cached_isolated_res:
+                        isolated_res = cached_isolated_res
+                    else:
+                        isolated_res = _get_isolated_code_item_dets(code, *analysis_args, prepared_inputs, profile)
+                        Pipeline._store_isolated_res(isolated_res, analysis_cache=analysis_cache, cache_key=cache_key)
+                    yield code, code_file_path, isolated_res
+
+    @staticmethod
+    def _reconcile_isolated_res(isolated_res, *, output_settings: OutputSettings, session: AnalysisSession
+            ) -> tuple[tuple[list[messages.MessageSpec], list[messages.MessageSpec]], bool]:
+        if not isinstance(isolated_res, messages.IsolatedSnippetDets):  ## system messages are already final
+            return isolated_res
+        return messages.reconcile_isolated_snippet_dets(isolated_res,
+            warnings_only=output_settings.warnings_only, execute_code=output_settings.execute_code,
+            session=session)
+
+    @staticmethod
+    def new_session(output_settings: OutputSettings) -> AnalysisSession:
+        profile = profiling.Profile() if output_settings.profile else None
+        return AnalysisSession(theme_name=output_settings.theme_name, profile=profile)
+
+    @staticmethod
+    def get_code_items_dets(code_items: Generator, *, output_settings: OutputSettings,
+            session: AnalysisSession | None = None) -> Generator:
         """
         Second part of pipeline - code items to code item details.
+
+        Every code item is analysed in isolation (in worker processes and / or retrieved from the analysis cache
+        if configured) so the session can't be shared. Instead, isolated results are reconciled here
+        in the original order so the first occurrence of a message gets the full message
+        exactly as it would if the session had been handed from one code item to the next.
+        The snippet string helpers (e.g. linting) are run as part of reconciliation
+        because the linter keeps a record in the session of which lint messages have been supplemented.
+
+        :param session: mutated as we hand it around to keep track of repeats etc.
+         If not supplied, a fresh session (so e.g. lint messages are explained in full again).
         """
-        repeat_set = set()  ## mutates as we hand it around to keep track of repeats
-        for code, code_file_path in code_items:
-            if code.strip() == 'import community':
-                messages_dets = messages.get_community_message(code)
-                multi_block = False
-            elif all([word in code for word in conf.XKCD_WARNING_WORDS]):
-                messages_dets = messages.get_xkcd_warning(code)
-                multi_block = False
-            else:
-                try:
-                    messages_dets, multi_block = messages.get_snippet_dets(code,
-                        warnings_only=output_settings.warnings_only,
-                        execute_code=output_settings.execute_code,
-                        repeat_set=repeat_set)
-                except Exception as e:
-                    messages_dets = messages.get_error_message_specs(e, code)
-                    multi_block = False
+        if session is None:
+            session = Pipeline.new_session(output_settings)
+        isolated_results = Pipeline._get_isolated_results(code_items,
+            output_settings=output_settings, profile=session.profile)
+        for code, code_file_path, isolated_res in isolated_results:
+            messages_dets, multi_block = Pipeline._reconcile_isolated_res(isolated_res,
+                output_settings=output_settings, session=session)
             yield code, code_file_path, messages_dets, multi_block
 
+    @staticmethod
+    def _get_code_item_dets(code: str, *, output_settings: OutputSettings, session: AnalysisSession
+            ) -> tuple[tuple[list[messages.MessageSpec], list[messages.MessageSpec]], bool]:
+        """
+        Analyse one code item - as get_code_items_dets does for many (but without batch preparing or worker processes).
+
+        :param session: mutated - e.g. the helpers which have already given their message in this run
+        :return: messages_dets and multi_block
+        """
+        profile = session.profile
+        analysis_cache = None if profile else Pipeline.get_analysis_cache(output_settings)
+        cache_key, isolated_res = Pipeline._get_cached_isolated_res(code,
+            analysis_cache=analysis_cache, output_settings=output_settings)
+        if not isolated_res:
+            isolated_res = _get_isolated_code_item_dets(code,
+                output_settings.warnings_only, output_settings.execute_code, profile=profile)
+            Pipeline._store_isolated_res(isolated_res, analysis_cache=analysis_cache, cache_key=cache_key)
+        return Pipeline._reconcile_isolated_res(isolated_res, output_settings=output_settings, session=session)
+
     @staticmethod
     def _get_formatter_module(format_name: Format) -> ModuleType:
         try:
-            formatter_module = Pipeline.FORMAT2FORMATTER_MODULE[format_name]
+            formatter_module_name = Pipeline.FORMAT2FORMATTER_MODULE[format_name]
         except KeyError:
             raise ValueError(f"A format was supplied that lacks a formatter module")
         else:
-            return formatter_module
+            return import_module(formatter_module_name)
 
     @staticmethod
     def _get_displayer_module(format_name: Format) -> ModuleType:
         try:
-            displayer_module = Pipeline.FORMAT2DISPLAYER_MODULE[format_name]
+            displayer_module_name = Pipeline.FORMAT2DISPLAYER_MODULE[format_name]
         except KeyError:
             raise ValueError(f"A format ({format_name}) was supplied that lacks a displayer module")
         else:
-            return displayer_module
+            return import_module(displayer_module_name)
+
+    @staticmethod
+    def _get_formatter_kwargs(code: str, code_file_path: Path | None, messages_dets, multi_block: bool, *,
+            output_settings: OutputSettings, in_notebook=False, session: AnalysisSession | None = None) -> dict:
+        kwargs = {
+            'code': code, 'code_file_path': code_file_path,
+            'messages_dets': messages_dets,
+            'detail_level': output_settings.detail_level,
+            'warnings_only': output_settings.warnings_only,
+            'multi_block': multi_block,
+        }
+        format_name = output_settings.format_name
+        if format_name == Format.HTML:
+            kwargs['in_notebook'] = in_notebook
+        elif format_name == Format.CLI:
+            kwargs['theme_name'] = output_settings.theme_name
+            kwargs['session'] = session
+        elif format_name in (Format.MD, Format.JSON):
+            pass  ## nothing to add
+        else:
+            raise ValueError(f"Unexpected format_name {format_name} when setting formatter args")
+        return kwargs
 
     @staticmethod
-    def get_formatted_help_dets(code_items_dets: Generator,
-            output_settings: OutputSettings, in_notebook=False) -> Generator:
+    def get_formatted_help_dets(code_items_dets: Generator, output_settings: OutputSettings, in_notebook=False, *,
+            session: AnalysisSession | None = None) -> Generator:
         """
         Third part of pipeline - from code item details to formatted content.
+
+        :param session: the run's session (e.g. for its terminal colours). If not supplied, a fresh session.
         """
+        if session is None:
+            session = Pipeline.new_session(output_settings)
         formatter_module = Pipeline._get_formatter_module(output_settings.format_name)
         for code, code_file_path, messages_dets, multi_block in code_items_dets:
-            kwargs = {
-                'code': code, 'code_file_path': code_file_path,
-                'messages_dets': messages_dets,
-                'detail_level': output_settings.detail_level,
-                'warnings_only': output_settings.warnings_only,
-                'multi_block': multi_block,
-            }
-            format_name = output_settings.format_name
-            if format_name == Format.HTML:
-                kwargs['in_notebook'] = in_notebook
-            elif format_name == Format.CLI:
-                kwargs['theme_name'] = output_settings.theme_name
-            elif format_name == Format.MD:
-                pass  ## nothing to add
-            else:
-                raise ValueError(f"Unexpected format_name {format_name} when setting formatter args")
-            formatted_help = formatter_module.get_formatted_help(**kwargs)
+            kwargs = Pipeline._get_formatter_kwargs(code, code_file_path, messages_dets, multi_block,
+                output_settings=output_settings, in_notebook=in_notebook, session=session)
+            with profiling.timed_stage(session.profile, profiling.FORMAT):
+                formatted_help = formatter_module.get_formatted_help(**kwargs)
             yield formatted_help, code_file_path
 
     @staticmethod
-    def display_help(formatted_help_dets: Generator, output_settings: OutputSettings, *, single_script=True):
+    def display_help(formatted_help_dets: Generator, output_settings: OutputSettings, *, single_script=True,
+            session: AnalysisSession | None = None):
         """
         Final stage of the pipeline.
 
         If HTML will open a tab per script.
         If interactive, will open one after the other with a user-controlled pause in between.
+
+        :param session: only needed if profiling (to record display timings)
         """
+        profile = session.profile if session else None
         displayer_module = Pipeline._get_displayer_module(output_settings.format_name)
         for formatted_help, code_file_path in formatted_help_dets:
-            displayer_module.display(formatted_help,
-                code_file_path=code_file_path, tmp_html_path=output_settings.tmp_html_path)  ## some args are displayer-specific so capture them in **_kwargs as required
+            with profiling.timed_stage(profile, profiling.DISPLAY):
+                displayer_module.display(formatted_help,
+                    code_file_path=code_file_path, tmp_html_path=output_settings.tmp_html_path)  ## some args are displayer-specific so capture them in **_kwargs as required
             if not single_script and output_settings.format_name in FORMAT_INTERACTIVE_FORMATS:
                 input("Press any key to continue ...")
 
 
+    @staticmethod
+    def display_project_report(code_items_dets: Generator, output_settings: OutputSettings, *, project_path: Path,
+            session: AnalysisSession | None = None):
+        """
+        Alternative final stages of the pipeline for HTML help on a project -
+        one static report (an index page plus a page per module) rather than a browser tab per module.
+
+        Each module page is formatted and written as soon as its details arrive.
+        The index (with warning counts by source) is written once every module has been seen and is the only page opened.
+
+        :param session: only needed if profiling (to record format and display timings)
+        """
+        profile = session.profile if session else None
+        html_formatter = Pipeline._get_formatter_module(Format.HTML)
+        html_displayer = Pipeline._get_displayer_module(Format.HTML)
+        report_path = html_displayer.make_report_folder(tmp_html_path=output_settings.tmp_html_path)
+        module_summaries = []
+        for page_n, (code, code_file_path, messages_dets, multi_block) in enumerate(code_items_dets, 1):
+            kwargs = Pipeline._get_formatter_kwargs(code, code_file_path, messages_dets, multi_block,
+                output_settings=output_settings)
+            with profiling.timed_stage(profile, profiling.FORMAT):
+                formatted_help = html_formatter.get_formatted_help(**kwargs)
+            with profiling.timed_stage(profile, profiling.DISPLAY):
+                page_url = html_displayer.write_report_module_page(formatted_help,
+                    report_path=report_path, code_file_path=code_file_path, page_n=page_n)
+            module_summaries.append(html_formatter.get_module_summary(code_file_path, messages_dets, page_url=page_url))
+        with profiling.timed_stage(profile, profiling.FORMAT):
+            formatted_index = html_formatter.get_project_index(module_summaries, project_desc=str(project_path))
+        with profiling.timed_stage(profile, profiling.DISPLAY):
+            html_displayer.display_report(formatted_index, report_path=report_path)
+        return report_path
+
+
 def get_formatted_help_dets(code: str | None = None, *,
         file_path: Path | str | None = None, project_path: Path | str | None = None,
         exclude_folders: Sequence[Path] | Sequence[str] | None = None,
-        output_settings: OutputSettings | None = None, in_notebook=False):
+        include_patterns: Sequence[str] | None = None, exclude_patterns: Sequence[str] | None = None,
+        use_gitignore=False, output_settings: OutputSettings | None = None, in_notebook=False,
+        session: AnalysisSession | None = None):
     """
     Get formatted help text. Not displayed by SuperHELP.
     Any display is the responsibility of the calling code.
@@ -211,22 +450,51 @@ def get_formatted_help_dets(code: str | None = None, *,
     :param project_path: (optional) path to project containing Python code
     :param exclude_folders: may be crucial if setting project_path
      e.g. to avoid processing all python scripts in a virtual environment folder
+    :param include_patterns: (optional) glob patterns modules in project_path must match e.g. 'src/**/*.py'
+     (default '*.py')
+    :param exclude_patterns: (optional) glob patterns for modules and folders in project_path to skip
+     e.g. '*_pb2.py', 'tests/fixtures'
+    :param use_gitignore: if True skip anything in project_path the project's .gitignore files ignore
     :param OutputSettings output_settings:
     :param bool in_notebook: if True changes the formatting to make it Jupyter notebook friendly (default False)
+    :param session: (optional) the run's session e.g. to read its profile afterwards. A fresh session if not supplied.
     """
     if not output_settings:
         output_settings = OutputSettings()
     code_items = Pipeline.get_code_items(
-        code=code, file_path=file_path, project_path=project_path, exclude_folders=exclude_folders)
-    code_items_dets = Pipeline.get_code_items_dets(code_items, output_settings=output_settings)
+        code=code, file_path=file_path, project_path=project_path, exclude_folders=exclude_folders,
+        include_patterns=include_patterns, exclude_patterns=exclude_patterns, use_gitignore=use_gitignore)
+    if session is None:
+        session = Pipeline.new_session(output_settings)  ## one run - shared by every stage
+    code_items_dets = Pipeline.get_code_items_dets(code_items, output_settings=output_settings, session=session)
     formatted_help_dets = Pipeline.get_formatted_help_dets(
-        code_items_dets, output_settings=output_settings, in_notebook=in_notebook)
+        code_items_dets, output_settings=output_settings, in_notebook=in_notebook, session=session)
     return formatted_help_dets
 
+def get_help_profile(code: str | None = None, *,
+        file_path: Path | str | None = None, project_path: Path | str | None = None,
+        exclude_folders: Sequence[Path] | Sequence[str] | None = None,
+        include_patterns: Sequence[str] | None = None, exclude_patterns: Sequence[str] | None = None,
+        use_gitignore=False, output_settings: OutputSettings | None = None) -> dict:
+    """
+    Get the formatted help (see get_formatted_help_dets for the parameters) but only to find out where the time goes.
+    Nothing is displayed.
+
+    :return: stage timings and timings for every helper (see profiling.Profile.to_dict)
+    """
+    output_settings = replace(output_settings or OutputSettings(), profile=True)
+    session = Pipeline.new_session(output_settings)
+    for _formatted_help_dets in get_formatted_help_dets(code=code, file_path=file_path, project_path=project_path,
+            exclude_folders=exclude_folders, include_patterns=include_patterns, exclude_patterns=exclude_patterns,
+            use_gitignore=use_gitignore, output_settings=output_settings, session=session):
+        pass
+    return session.profile.to_dict()
+
 def show_help(code: str | None = None, *,
         file_path: Path | str | None = None, project_path: Path | str | None = None,
         exclude_folders: Sequence[Path] | Sequence[str] | None = None,
-        output_settings: OutputSettings | None = None, in_notebook=False):
+        include_patterns: Sequence[str] | None = None, exclude_patterns: Sequence[str] | None = None,
+        use_gitignore=False, output_settings: OutputSettings | None = None, in_notebook=False):
     """
     If a snippet of code supplied, get help for that.
     If not, try file_path and use that instead.
@@ -245,20 +513,36 @@ def show_help(code: str | None = None, *,
     :param project_path: (optional) path to project containing Python code
     :param exclude_folders: may be crucial if setting project_path
      e.g. to avoid processing all python scripts in a virtual environment folder
+    :param include_patterns: (optional) glob patterns modules in project_path must match e.g. 'src/**/*.py'
+     (default '*.py')
+    :param exclude_patterns: (optional) glob patterns for modules and folders in project_path to skip
+     e.g. '*_pb2.py', 'tests/fixtures'
+    :param use_gitignore: if True skip anything in project_path the project's .gitignore files ignore
     :param output_settings:
     :param in_notebook: if True changes the formatting to make it Jupyter notebook friendly (default False)
+    :return: if output_settings.profile, stage and helper timings (see profiling.Profile.to_dict) otherwise None
     """
     if not output_settings:
         output_settings = OutputSettings(format_name=Format.HTML)
-    formatted_help_dets = get_formatted_help_dets(code=code, file_path=file_path,
-        project_path=project_path, exclude_folders=exclude_folders,
-        output_settings=output_settings, in_notebook=in_notebook)
-    if conf.SHOW_OUTPUT:
-        single_script = project_path is None
-        Pipeline.display_help(formatted_help_dets, output_settings, single_script=single_script)
+    session = Pipeline.new_session(output_settings)
+    single_script = project_path is None
+    project_report = (not (code or file_path) and not single_script
+        and output_settings.format_name == Format.HTML and output_settings.project_report)
+    if conf.SHOW_OUTPUT and project_report:
+        code_items = Pipeline.get_code_items(project_path=project_path, exclude_folders=exclude_folders,
+            include_patterns=include_patterns, exclude_patterns=exclude_patterns, use_gitignore=use_gitignore)
+        code_items_dets = Pipeline.get_code_items_dets(code_items, output_settings=output_settings, session=session)
+        Pipeline.display_project_report(code_items_dets, output_settings, project_path=project_path, session=session)
+    elif conf.SHOW_OUTPUT:
+        formatted_help_dets = get_formatted_help_dets(code=code, file_path=file_path,
+            project_path=project_path, exclude_folders=exclude_folders,
+            include_patterns=include_patterns, exclude_patterns=exclude_patterns, use_gitignore=use_gitignore,
+            output_settings=output_settings, in_notebook=in_notebook, session=session)
+        Pipeline.display_help(formatted_help_dets, output_settings, single_script=single_script, session=session)
     else:
         logging.info("NOT showing output because conf.SHOW_OUTPUT is False - presumably running tests "
             "and not wanting lots of HTML windows opening ;-)")
+    return session.profile.to_dict() if session.profile else None
 
 def this(*, file_path: Path | str | None = None,
         output: Format = Format.HTML, theme_name: Theme = Theme.DARK, detail_level: Level = Level.EXTRA,
@@ -312,6 +596,15 @@ def shelp():
         nargs='*', help=("If using -p / --project-path you probably need to "
             "exclude modules in storage folders or a virtual env folder "
             "e.g. --exclude store env back_ups misc"))
+    parser.add_argument('--include-patterns', type=str,
+        nargs='*', help=("If using -p / --project-path, glob patterns (relative to the project folder) "
+            "modules must match e.g. --include-patterns 'src/**/*.py' (default '*.py')"))
+    parser.add_argument('--omit-patterns', type=str,
+        nargs='*', help=("If using -p / --project-path, glob patterns (relative to the project folder) "
+            "for modules and folders to skip e.g. --omit-patterns '*_pb2.py' 'tests/fixtures'"))
+    parser.add_argument('--gitignore', action='store_true',
+        default=False,
+        help="If using -p / --project-path, skip anything the project's .gitignore files ignore")
     parser.add_argument('-d', '--detail-level', type=str,
         required=False,
         choices=LEVEL_OPTIONS, default=Level.EXTRA,
@@ -319,7 +612,7 @@ def shelp():
     parser.add_argument('-o', '--output', type=str,
         required=False,
         choices=FORMAT_OPTIONS, default=default_output,
-        help="How do you want your help shown? html, cli, md, etc")
+        help="How do you want your help shown? html, cli, md, json (JSON Lines for projects) etc")
     ## https://docs.python.org/3.10/library/argparse.html#action-classes 'store_true' and 'store_false' - These are special cases of 'store_const' used for storing the values True and False respectively. In addition, they create default values of False and True respectively.
     parser.add_argument('-w', '--warnings-only', action='store_true',
         default=False,
@@ -332,14 +625,46 @@ def shelp():
         choices=THEME_OPTIONS, default=Theme.DARK,
         help=("Select an output theme - currently only affects cli output "
             f"option. '{conf.Theme.DARK}' or '{conf.Theme.LIGHT}'"))
-    parser.add_argument('-h', '--tmp-html-path', type=str,
+    parser.add_argument('--tmp-html-path', type=str,
         required=False,
         help=("Select a path that SuperHELP can make temporary HTML files into - presumably this is necessary "
             "because your web browser can't access the standard temporary file folder (snap packaged web browser?)"))
+    parser.add_argument('-j', '--jobs', type=int,
+        required=False, default=1,
+        help=("Number of worker processes to analyse modules with when using -p / --project-path "
+            "e.g. --jobs 4 (default 1 i.e. no worker processes)"))
+    parser.add_argument('--tab-per-module', action='store_true',
+        default=False,
+        help=("If using -p / --project-path with html output, open a browser tab per module "
+            "rather than one project report"))
+    parser.add_argument('--no-cache', action='store_true',
+        default=False,
+        help="Analyse everything afresh rather than reusing the analysis of unchanged code from earlier runs")
+    parser.add_argument('--cache-dir', type=str,
+        required=False,
+        help="Folder for the analysis cache - only ever used if it belongs to you (default ~/.cache/superhelp/analysis_cache)")
     parser.add_argument('-a', '--advice-list', action='store_true',
         default=False,
         help="List available advice")
+    parser.add_argument('--serve', action='store_true',
+        default=False,
+        help=("Run as a long-running local daemon which keeps everything loaded and ready. "
+            "Later shelp calls on code or a file get their help from it (much faster)"))
+    parser.add_argument('--port', type=int,
+        required=False,
+        help="If using --serve, the localhost port to listen on (default any free port)")
+    parser.add_argument('--no-daemon', action='store_true',
+        default=False,
+        help="Don't get help from a running SuperHELP daemon (see --serve) even if there is one")
+    parser.add_argument('--profile', action='store_true',
+        default=False,
+        help=("Report where the time went - pipeline stages and every helper sorted by cost. "
+            "Code is analysed afresh (no cache or daemon) so every helper is timed"))
     args = parser.parse_args()
+    if args.serve:
+        from superhelp import daemon
+        daemon.serve(port=args.port)
+        return
     if args.advice_list:
         print("\n======================================")
         print("Specific help available from SuperHELP")
@@ -365,13 +690,24 @@ def shelp():
     logging.debug(args)
     output = args.output if conf.SHOW_OUTPUT else None
     tmp_html_path = None if args.tmp_html_path is None else Path(args.tmp_html_path)
+    cache_path = None if args.cache_dir is None else Path(args.cache_dir)
     output_settings = OutputSettings(format_name=output,
         theme_name=args.theme, detail_level=args.detail_level,
-        warnings_only=args.warnings_only, execute_code=args.execute_code, tmp_html_path=tmp_html_path)
-    show_help(args.code,
+        warnings_only=args.warnings_only, execute_code=args.execute_code, jobs=args.jobs,
+        use_cache=not args.no_cache, cache_path=cache_path, project_report=not args.tab_per_module,
+        tmp_html_path=tmp_html_path, profile=args.profile)
+    use_daemon = conf.SHOW_OUTPUT and not (args.no_daemon or args.project_path or args.profile)
+    if use_daemon:
+        from superhelp import daemon
+        if daemon.show_help(args.code, file_path=args.file_path, output_settings=output_settings):
+            return
+    profile_dict = show_help(args.code,
         file_path=args.file_path,
         project_path=args.project_path, exclude_folders=args.exclude_folders,
+        include_patterns=args.include_patterns, exclude_patterns=args.omit_patterns, use_gitignore=args.gitignore,
         output_settings=output_settings, in_notebook=False)
+    if profile_dict:
+        print(profiling.get_report(profile_dict))
 
 def experiments_only():
     return  ## uncomment to neutralise experiments
@@ -0,0 +1,171 @@
+"""
+A static record of every registered helper - name, module, xpath (and tags), warning, input type etc.
+
+Importing every helper module up front is a large part of SuperHELP's start-up cost
+(and some pull in heavy dependencies e.g. lint_help and flake8).
+With the manifest, helpers are registered without importing their modules (see helpers.LazyHelperFunc).
+A module is only imported when one of its helpers actually runs e.g. when a block has a node type
+the helper is interested in, or when the helper is still in scope with warnings only.
+
+The manifest is made by importing every helper module on first run and is only used while it matches the helper
+source it was made from. It lives in the user's own cache folder (see gen_utils.get_user_cache_dir) and is only read
+if that folder and the manifest belong to the current user. Even then, only functions in SuperHELP's own helper
+modules are ever imported from it.
+"""
+from functools import cache
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import tempfile
+
+from superhelp import conf, gen_utils, helpers
+from superhelp.helpers import (INDIV_BLOCK_HELPERS, MULTI_BLOCK_HELPERS, SNIPPET_STR_HELPERS,
+    AstBlockHelperSpec, IndivBlockHelperSpec, LazyHelperFunc, OverallCodeHelperSpec, register_helper)
+
+MANIFEST_FNAME = 'helper_manifest.json'
+HELPER_MODULE_PREFIX = f"{helpers.__name__}."  ## only functions in modules under here are imported from a manifest
+
+INDIV_BLOCK_KIND = 'indiv_block'
+MULTI_BLOCK_KIND = 'multi_block'
+SNIPPET_STR_KIND = 'snippet_str'
+
+KIND2HELPER_SPECS = {
+    INDIV_BLOCK_KIND: INDIV_BLOCK_HELPERS,
+    MULTI_BLOCK_KIND: MULTI_BLOCK_HELPERS,
+    SNIPPET_STR_KIND: SNIPPET_STR_HELPERS,
+}
+
+@cache
+def get_helpers_fingerprint() -> str:
+    """
+    Hash of the helper source - the manifest is only trusted if made from exactly the same source.
+    """
+    hasher = hashlib.sha256()
+    helpers_path = Path(helpers.__file__).parent
+    for source_path in sorted(helpers_path.glob('*.py')):
+        hasher.update(source_path.name.encode('utf-8'))
+        hasher.update(source_path.read_bytes())
+    return hasher.hexdigest()
+
+def get_manifest_path() -> Path:
+    return gen_utils.get_user_cache_dir() / MANIFEST_FNAME
+
+def _func_ref(func) -> str | None:
+    if func is None:
+        return None
+    return f"{func.__module__}:{func.__name__}"
+
+def _func_from_ref(func_ref: str | None) -> LazyHelperFunc | None:
+    if func_ref is None:
+        return None
+    module_name, func_name = func_ref.split(':')
+    return LazyHelperFunc(module_name, func_name)
+
+def get_helper_manifest() -> dict:
+    """
+    Record of the currently registered helpers (in the order they were registered).
+    """
+    manifest_helpers = []
+    for kind, helper_specs in KIND2HELPER_SPECS.items():
+        for helper_spec in helper_specs:
+            helper_dets = {
+                'kind': kind,
+                'helper_name': helper_spec.helper_name,
+                'module': helper_spec.helper.__module__,
+                'func_name': helper_spec.helper.__name__,
+                'doc': helper_spec.helper.__doc__,
+                'warning': helper_spec.warning,
+            }
+            if isinstance(helper_spec, AstBlockHelperSpec):
+                helper_dets['node_types'] = None if helper_spec.node_types is None else sorted(helper_spec.node_types)
+            elif isinstance(helper_spec, IndivBlockHelperSpec):
+                helper_dets['xpath'] = helper_spec.xpath
+                helper_dets['tags'] = None if helper_spec.tags is None else sorted(helper_spec.tags)
+                helper_dets['tags_suffice'] = helper_spec.tags_suffice
+            else:
+                helper_dets['input_type'] = helper_spec.input_type.value
+                helper_dets['prepare'] = _func_ref(helper_spec.prepare)
+                helper_dets['batch_prepare'] = _func_ref(helper_spec.batch_prepare)
+                helper_dets['whole_tree'] = helper_spec.whole_tree
+            manifest_helpers.append(helper_dets)
+    return {'fingerprint': get_helpers_fingerprint(), 'helpers': manifest_helpers}
+
+def store_helper_manifest():
+    """
+    Written to a temporary file first (in a folder private to the user) and then moved into place
+    so other processes never see a partly written manifest.
+    """
+    manifest_path = get_manifest_path()
+    try:
+        gen_utils.make_private_dir(manifest_path.parent)
+        with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', dir=manifest_path.parent,
+                delete=False) as tmp_fh:
+            tmp_fh.write(json.dumps(get_helper_manifest()))
+        os.replace(tmp_fh.name, manifest_path)
+    except OSError as e:
+        logging.debug(f"Unable to store helper manifest in '{manifest_path}' - {e}")
+
+def _is_helper_ref(module_name) -> bool:
+    return isinstance(module_name, str) and module_name.startswith(HELPER_MODULE_PREFIX)
+
+def _has_only_helper_refs(manifest: dict) -> bool:
+    """
+    Every function the manifest would have us import must live in one of SuperHELP's own helper modules.
+    """
+    for helper_dets in manifest['helpers']:
+        if not _is_helper_ref(helper_dets['module']):
+            return False
+        for func_ref in (helper_dets.get('prepare'), helper_dets.get('batch_prepare')):
+            if func_ref is not None and not _is_helper_ref(func_ref.split(':')[0]):
+                return False
+    return True
+
+def _read_helper_manifest() -> dict | None:
+    """
+    :return: an up-to-date manifest if there is one (and it can be trusted)
+    """
+    manifest_path = get_manifest_path()
+    try:
+        gen_utils.make_private_dir(manifest_path.parent)
+        with open(manifest_path, encoding='utf-8') as f:
+            if not gen_utils.is_owned_by_user(os.fstat(f.fileno())):
+                raise ValueError("not written by the current user")
+            manifest = json.loads(f.read())
+        if manifest.get('fingerprint') != get_helpers_fingerprint():
+            return None
+        if not _has_only_helper_refs(manifest):
+            raise ValueError("refers to functions outside the SuperHELP helper modules")
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.debug(f"Ignoring helper manifest '{manifest_path}' - {e}")
+        return None
+    return manifest
+
+def _get_helper_spec(helper_dets: dict) -> IndivBlockHelperSpec | AstBlockHelperSpec | OverallCodeHelperSpec:
+    helper = LazyHelperFunc(helper_dets['module'], helper_dets['func_name'], doc=helper_dets['doc'])
+    if helper_dets['kind'] == INDIV_BLOCK_KIND and 'node_types' in helper_dets:  ## works on the AST
+        node_types = helper_dets['node_types']
+        return AstBlockHelperSpec(helper_dets['helper_name'], helper, helper_dets['warning'],
+            None if node_types is None else frozenset(node_types))
+    if helper_dets['kind'] == INDIV_BLOCK_KIND:
+        xpath = helper_dets['xpath']
+        tags = helper_dets['tags']
+        return IndivBlockHelperSpec(helper_dets['helper_name'], helper, xpath, helper_dets['warning'],
+            tags=None if tags is None else frozenset(tags), tags_suffice=helper_dets['tags_suffice'])
+    return OverallCodeHelperSpec(helper_dets['helper_name'], helper, conf.InputType(helper_dets['input_type']),
+        helper_dets['warning'], prepare=_func_from_ref(helper_dets['prepare']),
+        batch_prepare=_func_from_ref(helper_dets['batch_prepare']), whole_tree=helper_dets['whole_tree'])
+
+def register_helpers_from_manifest() -> bool:
+    """
+    :return: True if registered from an up-to-date manifest; False if none available
+    """
+    manifest = _read_helper_manifest()
+    if manifest is None:
+        return False
+    for helper_dets in manifest['helpers']:
+        register_helper(KIND2HELPER_SPECS[helper_dets['kind']], _get_helper_spec(helper_dets))
+    return True
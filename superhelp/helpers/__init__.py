@@ -6,7 +6,8 @@ with the @..._help decorators :-).
 
 To identify xpath signatures for target language constructs use ast_funcs.general.ast_detective.
 
-The load_helpers function below will import each of the helpers.
+The load_helpers function below will import each of the helpers
+(or, if lazy, register them from the helper manifest and leave importing their modules until needed).
 Doing so will trigger the decorators which will add the functions to some constants
 ready to be applied to blocks (e.g. a class definition) or snippets (e.g. the entire content of a script).
 
@@ -25,6 +26,8 @@ General comments will appear before the block-by-block comments.
     if processing XML use multi_block_help.
 
 If looking at individual code blocks and wanting to comment on each block individually use indiv_block_help.
+If the helper only needs to find nodes of some types and look at their fields (and parents)
+use ast_block_help instead - it works on the AST directly so no XML or xpath is needed (see ast_index).
 For example:
 Comments on block 1:
 It is a list with four items namely ....
@@ -68,17 +71,21 @@ The basic pattern within a help function is:
 
 * Add to the appropriate test module. Only test helpers within the module.
 """
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from importlib import import_module
 from pkgutil import iter_modules
+import re
 import sys
-from typing import Callable
+from typing import TYPE_CHECKING, Callable, Sequence
 
 from superhelp import conf
-from superhelp.gen_utils import get_docstring_start, layout_comment as layout
+from superhelp.gen_utils import get_compiled_xpath, get_docstring_start, layout_comment as layout
 
+if TYPE_CHECKING:
+    from lxml import etree
 
-def load_helpers():
+
+def load_helpers(*, lazy=False):
     """
     Looking under this module package folder (i.e. helper) finds, for example:
         [ModuleInfo(module_finder=FileFinder('.../helpers'), name='superhelp.helpers.class_help', ispkg=False),
@@ -86,7 +93,15 @@ def load_helpers():
         ModuleInfo(module_finder=FileFinder('.../helpers'), name='superhelp.helpers.dataclass_help', ispkg=False), ...
     and then loads them which then runs all the decorators which store the helper functions in the lists like
     INDIV_BLOCK_HELPERS and MULTI_BLOCK_HELPERS.
+
+    :param lazy: if True, register the helpers from the helper manifest (see helper_manifest) instead
+     so helper modules are only imported when one of their helpers is actually run.
+     If there is no up-to-date manifest, the helper modules are all imported and a manifest made for next time.
     """
+    if lazy:
+        from superhelp import helper_manifest
+        if helper_manifest.register_helpers_from_manifest():
+            return
     this_module = sys.modules[__name__]
     submodules = iter_modules(
         this_module.__path__,  ## e.g. ['/home/g/projects/superhelp/superhelp/helpers', ]
@@ -95,7 +110,32 @@ def load_helpers():
     for submodule in submodules:
         if not submodule.name.endswith('shared_messages'):
             import_module(submodule.name)  ## e.g. superhelp.helpers.class_help
+    if lazy:
+        helper_manifest.store_helper_manifest()
+
+class LazyHelperFunc:
+    """
+    Stands in for a helper function (or a function it relies on e.g. a prepare function) registered from the
+    helper manifest. The module it lives in is only imported when it is first called.
+    Has the same __module__, __name__, and __doc__ as the real function so nothing needs importing to describe it.
+    """
 
+    def __init__(self, module_name: str, func_name: str, doc: str | None = None):
+        self.__module__ = module_name
+        self.__name__ = func_name
+        self.__doc__ = doc
+        self._func = None
+
+    def resolve(self) -> Callable:
+        if self._func is None:
+            self._func = getattr(import_module(self.__module__), self.__name__)
+        return self._func
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __repr__(self):
+        return f"<LazyHelperFunc {self.__module__}.{self.__name__}>"
 
 class HelperSpec:
     pass
@@ -109,32 +149,133 @@ class IndivBlockHelperSpec(HelperSpec):
     xpath: xpath filtering to get specified elements e.g. body/Assign/value/Str
     warning: tags messages as warning or not - up to displayer, e.g. HTML,
      to decide what to do with that information, if anything.
+    compiled_xpath: xpath compiled once when the helper is registered
+     (unless registered from the helper manifest - then compiled when first needed)
+    tags: node tags (e.g. For) at least one of which must be in a block for the helper to be interested in it.
+     Blocks are dispatched to the helper by looking up the tags in an index built once per snippet.
+    tags_suffice: if True, having one of the tags is all the xpath requires so the xpath never needs running
     """
     helper_name: str
     helper: Callable
     xpath: str | None = None
     warning: bool = False
+    compiled_xpath: 'etree.XPath | None' = field(default=None, compare=False)
+    tags: frozenset[str] | None = None
+    tags_suffice: bool = False
+
+@dataclass(frozen=True)
+class AstBlockHelperSpec(HelperSpec):
+    """
+    Block-based helper functions working on AST nodes rather than XML elements.
+    The block_spec they are given has the block's AST node and its nodes by type (see BlockSpec.get_nodes).
+
+    node_types: node type names (e.g. Compare) at least one of which must be in a block for the helper
+     to be interested in it. If None, every block is handed to the helper.
+    """
+    helper_name: str
+    helper: Callable
+    warning: bool = False
+    node_types: frozenset[str] | None = None
 
 @dataclass(frozen=True)
 class OverallCodeHelperSpec(HelperSpec):
     """
     Helper functions which deal with the entire code snippet at once.
     Whether the input is a list of BlockSpec's or a snippet.
+
+    prepare: optional function doing the expensive work on the snippet string in advance e.g. running the linter.
+     It must not depend on anything but the snippet so it can be run in a worker process (or cached)
+     with the helper itself run later. The helper receives the result as its prepared argument.
+     Results are cached as JSON so the helper may receive tuples back as lists.
+    batch_prepare: optional function doing the same as prepare but for many snippets at once
+     e.g. linting every module in a project in one linter run.
+    whole_tree: multi-block helper needing the XML of the whole snippet (the xml argument,
+     or block elements being part of one tree e.g. to look at their siblings).
+     Very large snippets are otherwise only converted into XML a block at a time (see messages.SnippetContext).
     """
     helper_name: str
     helper: Callable
     input_type: conf.InputType
     warning: bool = False
+    prepare: Callable | None = None
+    batch_prepare: Callable | None = None
+    whole_tree: bool = False
 
-INDIV_BLOCK_HELPERS = []  ## block-based helpers
+INDIV_BLOCK_HELPERS = []  ## block-based helpers (XML and AST) in one list so messages stay in registration order
 MULTI_BLOCK_HELPERS = []  ## looks at multiple blocks, possibly looking for first that meets a condition
 SNIPPET_STR_HELPERS = []  ## works on entire code snippet as a single string
 
-def indiv_block_help(*, xpath: str | None = None, warning=False):
+def register_helper(helper_specs: list[HelperSpec], helper_spec: HelperSpec):
+    """
+    Helpers registered from the helper manifest are swapped for the real thing (keeping their position)
+    if their module is imported later.
+    """
+    for n, registered_helper_spec in enumerate(helper_specs):
+        if registered_helper_spec.helper_name == helper_spec.helper_name:
+            helper_specs[n] = helper_spec
+            return
+    helper_specs.append(helper_spec)
+
+XPATH_TAG_STEP = re.compile(r'^\s*descendant-or-self::([A-Za-z_]\w*)(.*?)\s*$', re.DOTALL)
+
+def get_xpath_tags(xpath: str) -> tuple[frozenset[str] | None, bool]:
+    """
+    Work out which node tags a block must have to possibly match the xpath.
+    Only possible when every alternative in the xpath starts from a named descendant-or-self step
+    e.g. descendant-or-self::Assign/value/List | descendant-or-self::Assign/value/Call
+    (which covers every xpath the helpers currently use).
+    Anything else is left to the xpath alone.
+
+    :return: tags (None if unable to work them out), and whether having one of the tags is all the xpath requires
+     e.g. True for descendant-or-self::For | descendant-or-self::While
+    """
+    tags = set()
+    tags_suffice = True
+    for alternative in xpath.split('|'):  ## a | inside a predicate leaves fragments which won't match so we just give up
+        match = XPATH_TAG_STEP.match(alternative)
+        if not match:
+            return None, False
+        tag, rest = match.groups()
+        tags.add(tag)
+        if rest:
+            tags_suffice = False
+    return frozenset(tags), tags_suffice
+
+def indiv_block_help(*, xpath: str | None = None, tags: Sequence[str] | None = None, warning=False):
     """
     Simple decorator that registers a helper function in the list of INDIV_BLOCK_HELPERS.
 
     :param xpath: Used by xpath on the block element being examined. Can only use XPath 1.0 syntax.
+     Should start from descendant-or-self so it can be run on each block element separately.
+    :param tags: node tags (e.g. ['For', 'While']) at least one of which must be in a block for the helper to be
+     interested in it. Only needed if they can't be worked out from the xpath (see get_xpath_tags).
+     If there is no xpath, every block with one of the tags is handed to the helper.
+    :param warning: tags messages as warning or not - up to displayer, e.g. HTML,
+     to decide what to do with that information, if anything.
+    """
+    def decorator(func: Callable):
+        """
+        :param func func: func expecting block_spec
+        """
+        compiled_xpath = get_compiled_xpath(xpath) if xpath else None  ## invalid xpaths fail on import not mid-run
+        if tags is not None:
+            helper_tags, tags_suffice = frozenset(tags), not xpath
+        elif xpath:
+            helper_tags, tags_suffice = get_xpath_tags(xpath)
+        else:
+            helper_tags, tags_suffice = None, False
+        register_helper(INDIV_BLOCK_HELPERS, IndivBlockHelperSpec(
+            f"{func.__module__}.{func.__name__}", func, xpath, warning, compiled_xpath, helper_tags, tags_suffice))
+        return func
+    return decorator
+
+def ast_block_help(*, node_types: Sequence[str] | None = None, warning=False):
+    """
+    Simple decorator that registers a helper function working on AST nodes in the list of INDIV_BLOCK_HELPERS.
+    When no active helper needs XML, the snippet is never converted into XML at all.
+
+    :param node_types: node type names (e.g. ['Call']) at least one of which must be in a block for the helper to be
+     interested in it. Blocks are dispatched to the helper by looking up the node types in the snippet's AstIndex.
     :param warning: tags messages as warning or not - up to displayer, e.g. HTML,
      to decide what to do with that information, if anything.
     """
@@ -142,27 +283,31 @@ def indiv_block_help(*, xpath: str | None = None, warning=False):
         """
         :param func func: func expecting block_spec
         """
-        INDIV_BLOCK_HELPERS.append(IndivBlockHelperSpec(f"{func.__module__}.{func.__name__}", func, xpath, warning))
+        register_helper(INDIV_BLOCK_HELPERS, AstBlockHelperSpec(f"{func.__module__}.{func.__name__}", func, warning,
+            None if node_types is None else frozenset(node_types)))
         return func
     return decorator
 
-def multi_block_help(*, warning=False):
+def multi_block_help(*, warning=False, whole_tree=False):
     """
     Simple decorator that registers a helper function in the list of MULTI_BLOCK_HELPERS.
 
     :param warning: tags messages as warning or not - up to displayer, e.g. HTML,
      to decide what to do with that information, if anything.
+    :param whole_tree: if True, the helper is always given the XML of the whole snippet (as xml)
+     and block elements all belonging to it. Otherwise, the blocks of very large snippets are converted into XML
+     one at a time as the helper gets to them and xml is None (see messages.SnippetContext).
     """
     def decorator(func: Callable):
         """
         :param func: func expecting block_specs
         """
-        MULTI_BLOCK_HELPERS.append(OverallCodeHelperSpec(
-            f"{func.__module__}.{func.__name__}", func, conf.InputType.BLOCKS_SPECS, warning))
+        register_helper(MULTI_BLOCK_HELPERS, OverallCodeHelperSpec(
+            f"{func.__module__}.{func.__name__}", func, conf.InputType.BLOCKS_SPECS, warning, whole_tree=whole_tree))
         return func
     return decorator
 
-def snippet_str_help(*, warning=False):
+def snippet_str_help(*, warning=False, prepare: Callable | None = None, batch_prepare: Callable | None = None):
     """
     Use when processing the snippet string e.g. passing into flake8 linter.
 
@@ -170,13 +315,17 @@ def snippet_str_help(*, warning=False):
 
     :param bool warning: tags messages as warning or not - up to displayer, e.g. HTML,
      to decide what to do with that information, if anything.
+    :param prepare: optional function expecting the snippet string and returning whatever the helper needs
+     from the expensive part of its work e.g. raw linter feedback. The helper is then given it as prepared.
+    :param batch_prepare: optional function expecting a list of snippet strings (and jobs - the number of processes
+     it may use) and returning a list of what prepare would return for each of them.
     """
     def decorator(func: Callable):
         """
         :param func func: func expecting a single code string for the entire snippet as input
         """
-        SNIPPET_STR_HELPERS.append(OverallCodeHelperSpec(
-            f"{func.__module__}.{func.__name__}", func, conf.InputType.SNIPPET_STR, warning))
+        register_helper(SNIPPET_STR_HELPERS, OverallCodeHelperSpec(
+            f"{func.__module__}.{func.__name__}", func, conf.InputType.SNIPPET_STR, warning, prepare, batch_prepare))
         return func
     return decorator
 
@@ -2,12 +2,12 @@ from superhelp.helpers import indiv_block_help, shared_messages
 from superhelp.gen_utils import get_nice_str_list, layout_comment as layout
 from superhelp.messages import MessageLevelStrs
 
-DECORATOR_XPATH = (  ## excluding dataclass decorators
-    "descendant-or-self::decorator_list[not(parent::ClassDef and //Name[@id='dataclass'])]/Name[@id!='dataclass'] "
+DECORATOR_XPATH = (  ## excluding the decorators of dataclasses (looking in the class's own decorator list only)
+    "descendant-or-self::decorator_list[not(parent::ClassDef and .//Name[@id='dataclass'])]/Name[@id!='dataclass'] "
     '| '
-    "descendant-or-self::decorator_list[not(parent::ClassDef and //Name[@id='dataclass'])]/Call/func/Name "
+    "descendant-or-self::decorator_list[not(parent::ClassDef and .//Name[@id='dataclass'])]/Call/func/Name "
     '| '
-    "descendant-or-self::decorator_list[not(parent::ClassDef and //Name[@id='dataclass'])]/Call/func/Attribute/value/Name"
+    "descendant-or-self::decorator_list[not(parent::ClassDef and .//Name[@id='dataclass'])]/Call/func/Attribute/value/Name"
 )
 
 @indiv_block_help(xpath=DECORATOR_XPATH)
@@ -81,15 +81,18 @@ def get_init_vars(for_el):
             init_vars.append(var_initialised)
     return init_vars
 
-def get_manual_incrementing_var(for_el):
+def get_manual_incrementing_var(for_el, prev_block_init_vars=()):
     """
     Get first manual incrementing var.
 
     Look at previous siblings for common patterns of variable incrementer
     initialisation. Then look at children for incrementation. If we find both,
     we have found likely manual incrementation.
+
+    :param prev_block_init_vars: vars initialised in earlier top-level blocks
+     - the previous siblings of a top-level for loop (its block might not be in the same XML as theirs)
     """
-    init_vars = get_init_vars(for_el)
+    init_vars = get_init_vars(for_el) + list(prev_block_init_vars)
     if not init_vars:
         return None
     incrementing_vars = get_incrementing_vars(for_el)
@@ -107,16 +110,20 @@ def manual_incrementing(block_specs, *, repeat=False, **_kwargs) -> MessageLevel
     """
     Look for manual handling of incrementing inside for loops.
     """
-    for_els = []
-    for block_spec in block_specs:
-        for_els.extend(block_spec.element.xpath('descendant-or-self::For'))
-    if not for_els:
-        return None
     incrementing_var = None
-    for for_el in for_els:
-        incrementing_var = get_manual_incrementing_var(for_el)
+    prev_block_init_vars = []
+    for block_spec in block_specs:  ## one block at a time so only one block need be in XML at once
+        block_el = block_spec.element
+        for for_el in block_el.xpath('descendant-or-self::For'):
+            incrementing_var = get_manual_incrementing_var(for_el,
+                prev_block_init_vars if for_el is block_el else ())
+            if incrementing_var:
+                break
         if incrementing_var:
             break
+        var_initialised = get_var_initialised(block_el)
+        if var_initialised:
+            prev_block_init_vars.append(var_initialised)
     if not incrementing_var:
         return None
 
@@ -5,7 +5,7 @@ from superhelp.helpers import indiv_block_help
 from superhelp.ast_funcs.general import get_el_lines_dets
 from superhelp.ast_funcs import get_danger_status, get_docstring_from_value
 from superhelp import conf, gen_utils
-from superhelp.gen_utils import get_nice_pairs, layout_comment as layout
+from superhelp.gen_utils import get_nice_pairs, layout_comment as layout, run_xpath
 from superhelp.messages import MessageLevelStrs
 
 FUNC_DEFN_XPATH = 'descendant-or-self::FunctionDef'
@@ -22,12 +22,12 @@ def get_mutable_status(default_el):
     return mutable_status
 
 def get_is_method(func_el):
-    class_els = func_el.xpath('ancestor::ClassDef')
+    class_els = run_xpath(func_el, 'ancestor::ClassDef')
     if not class_els:
         return False
     class_el = class_els[-1]
     ## check is a direct member of a class and not just a function defined somewhere internally
-    method_els = class_el.xpath('body/FunctionDef')
+    method_els = run_xpath(class_el, 'body/FunctionDef')
     return func_el in method_els
 
 def get_func_type_lbl(func_el):
@@ -54,9 +54,9 @@ def count_args(func_el):
     Have to handle positional-only, keyword-only, and standard arguments. Not
     counting any unpacked args (vararg and kwarg).
     """
-    posonlyargs = func_el.xpath('args/arguments/posonlyargs/arg')  ## python 3.8+
-    args = func_el.xpath('args/arguments/args/arg')
-    kwonlyargs = func_el.xpath('args/arguments/kwonlyargs/arg')
+    posonlyargs = run_xpath(func_el, 'args/arguments/posonlyargs/arg')  ## python 3.8+
+    args = run_xpath(func_el, 'args/arguments/args/arg')
+    kwonlyargs = run_xpath(func_el, 'args/arguments/kwonlyargs/arg')
     all_args_n = len(posonlyargs + args + kwonlyargs)
     return all_args_n
 
@@ -69,8 +69,8 @@ def _get_arg_comment(func_el, *, repeat=False):
     Comment should end without a full stop because calling code adds that to
     make the sentence structure more explicit.
     """
-    vararg = func_el.xpath('args/arguments/vararg/arg')
-    kwarg = func_el.xpath('args/arguments/kwarg/arg')
+    vararg = run_xpath(func_el, 'args/arguments/vararg/arg')
+    kwarg = run_xpath(func_el, 'args/arguments/kwarg/arg')
     has_packing = (vararg or kwarg)
     if has_packing:
         arg_comment = 'receives a variable number of arguments'
@@ -112,7 +112,7 @@ def _get_return_comment(func_type_lbl, return_elements, *,
         if not return_element.getchildren()]
     implicit_returns_n = len(implicit_return_els)
     explicit_return_els = [return_element for return_element in return_elements
-        if return_element.xpath('value')]
+        if run_xpath(return_element, 'value')]
     none_returns_n = 0
     val_returns_n = 0
     for el in explicit_return_els:
@@ -150,8 +150,8 @@ def _get_exit_comment(func_el, func_type_lbl, *, repeat=False):
     """
     Look for 'return' and 'yield'.
     """
-    return_elements = func_el.xpath('descendant-or-self::Return')
-    yield_elements = func_el.xpath('descendant-or-self::Yield')
+    return_elements = run_xpath(func_el, 'descendant-or-self::Return')
+    yield_elements = run_xpath(func_el, 'descendant-or-self::Yield')
     if yield_elements:
         if return_elements:
             exit_comment = ("It has both `return` and `yield`. "
@@ -169,7 +169,7 @@ def func_overview(block_spec, *, repeat=False, **_kwargs) -> MessageLevelStrs |
     Advise on function (or method) definition statements.
     e.g. def greeting(): ...
     """
-    func_els = block_spec.element.xpath(FUNC_DEFN_XPATH)
+    func_els = run_xpath(block_spec.element, FUNC_DEFN_XPATH)
     if not func_els:
         return None
     overall_func_type_lbl = get_overall_func_type_lbl(func_els)
@@ -224,7 +224,7 @@ def func_len_check(block_spec, *, repeat=False, **_kwargs) -> MessageLevelStrs |
     """
     Warn about functions that might be too long.
     """
-    func_els = block_spec.element.xpath(FUNC_DEFN_XPATH)
+    func_els = run_xpath(block_spec.element, FUNC_DEFN_XPATH)
     if not func_els:
         return None
     overall_func_type_lbl = get_overall_func_type_lbl(func_els)
@@ -268,9 +268,9 @@ def func_len_check(block_spec, *, repeat=False, **_kwargs) -> MessageLevelStrs |
     return message_level_strs
 
 def get_n_args(func_el):
-    arg_els = func_el.xpath('args/arguments/args/arg')
-    posonlyarg_els = func_el.xpath('args/arguments/posonlyargs/arg')
-    kwonlyarg_els = func_el.xpath('args/arguments/kwonlyargs/arg')
+    arg_els = run_xpath(func_el, 'args/arguments/args/arg')
+    posonlyarg_els = run_xpath(func_el, 'args/arguments/posonlyargs/arg')
+    kwonlyarg_els = run_xpath(func_el, 'args/arguments/kwonlyargs/arg')
     n_args = len(arg_els + posonlyarg_els + kwonlyarg_els)
     return n_args
 
@@ -279,7 +279,7 @@ def func_excess_parameters(block_spec, *, repeat=False, **_kwargs) -> MessageLev
     """
     Warn about functions that might have too many parameters.
     """
-    func_els = block_spec.element.xpath(FUNC_DEFN_XPATH)
+    func_els = run_xpath(block_spec.element, FUNC_DEFN_XPATH)
     if not func_els:
         return None
     overall_func_type_lbl = get_overall_func_type_lbl(func_els)
@@ -323,17 +323,17 @@ def get_arg_default_issues(func_el, *, get_issue_status_func, include_kw=True) -
     """
     Look at this function's arguments. Any issues?
     """
-    posonly_arg_els = func_el.xpath('args/arguments/posonlyargs/arg')
-    arg_els = func_el.xpath('args/arguments/args/arg')
+    posonly_arg_els = run_xpath(func_el, 'args/arguments/posonlyargs/arg')
+    arg_els = run_xpath(func_el, 'args/arguments/args/arg')
     all_arg_els = posonly_arg_els + arg_els  ## order matters
     if include_kw:
-        kwonly_arg_els = func_el.xpath('args/arguments/kwonlyargs/arg')
+        kwonly_arg_els = run_xpath(func_el, 'args/arguments/kwonlyargs/arg')
         all_arg_els +=  kwonly_arg_els
     arg_names = [arg_el.get('arg') for arg_el in all_arg_els]
-    arg_default_els = func_el.xpath('args/arguments/defaults')
+    arg_default_els = run_xpath(func_el, 'args/arguments/defaults')
     default_els = arg_default_els  ## order matters
     if include_kw:
-        kw_default_els = func_el.xpath('args/arguments/kw_defaults')
+        kw_default_els = run_xpath(func_el, 'args/arguments/kw_defaults')
         default_els += kw_default_els
     issue_statuses = []
     for default_el in default_els:
@@ -363,7 +363,7 @@ def mutable_default(block_spec, *, repeat=False, **_kwargs) -> MessageLevelStrs
     """
     Look for use of mutable defaults and warn against use except in rare cases.
     """
-    func_els = block_spec.element.xpath(FUNC_DEFN_XPATH)
+    func_els = run_xpath(block_spec.element, FUNC_DEFN_XPATH)
     if not func_els:
         return None
     overall_func_type_lbl = get_overall_func_type_lbl(func_els)
@@ -479,7 +479,7 @@ def positional_boolean(block_spec, *, repeat=False, **_kwargs) -> MessageLevelSt
     Defaults apply from the rightmost backwards (within their group - either
     defaults or kw_defaults (related to kwonlyargs)).
     """
-    func_els = block_spec.element.xpath(FUNC_DEFN_XPATH)
+    func_els = run_xpath(block_spec.element, FUNC_DEFN_XPATH)
     if not func_els:
         return None
     overall_func_type_lbl = get_overall_func_type_lbl(func_els)
@@ -552,7 +552,7 @@ def positional_boolean(block_spec, *, repeat=False, **_kwargs) -> MessageLevelSt
     return message_level_strs
 
 def get_func_name_docstring(func_el):
-    func_body_el = func_el.xpath('body')[0]
+    func_body_el = run_xpath(func_el, 'body')[0]
     func_name = func_el.get('name')
     ## first item in body MUST be Expr and the first value must be a Str
     body_els = func_body_el.getchildren()
@@ -596,7 +596,7 @@ def docstring_issues(block_spec, *, repeat=False, **_kwargs) -> MessageLevelStrs
     WRAPPING_NEWLINE_N = 2
     MISSING_DOCSTRING = 'missing_docstring'
     DOCSTRING_TOO_SHORT = 'docstring_too_short'
-    func_els = block_spec.element.xpath(FUNC_DEFN_XPATH)
+    func_els = run_xpath(block_spec.element, FUNC_DEFN_XPATH)
     if not func_els:
         return None
     funcs_dets_and_docstring = get_funcs_dets_and_docstring(func_els)
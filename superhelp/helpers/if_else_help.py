@@ -2,7 +2,7 @@ from collections import defaultdict, namedtuple, Counter
 
 from superhelp.helpers import indiv_block_help
 from superhelp import ast_funcs, conf
-from superhelp.gen_utils import int2nice, layout_comment as layout
+from superhelp.gen_utils import int2nice, layout_comment as layout, run_xpath
 from superhelp.messages import MessageLevelStrs
 
 IfDets = namedtuple('IfDetails', 'multiple_conditions, missing_else, if_clauses')
@@ -25,7 +25,7 @@ def add_if_details(if_element, if_clauses):
     <If>s have <orelse>s which either have sole <If>s or not. When there is not
     then we have reached else.
     """
-    orelse_el = if_element.xpath('orelse')[0]  ## always has one
+    orelse_el = run_xpath(if_element, 'orelse')[0]  ## always has one
     orelse_children = orelse_el.getchildren()
     if not orelse_children:
         return  ## merely an If on its own without clauses
@@ -69,7 +69,7 @@ def get_ifs_details(block_spec):
     ## skip when if __name__ == '__main__'
     if block_spec.block_code_str.startswith("if __name__ == "):
         return []
-    raw_if_els = block_spec.element.xpath(IF_XPATH)
+    raw_if_els = run_xpath(block_spec.element, IF_XPATH)
     if_elements = []
     for raw_if_el in raw_if_els:
         ## ignore if really an elif
@@ -270,19 +270,19 @@ def get_split_membership_dets(if_el):
     Only provide message using content if all items are of the same type and are
     either numbers or strings.
     """
-    compare_els = if_el.xpath('test/BoolOp/values/Compare')
+    compare_els = run_xpath(if_el, 'test/BoolOp/values/Compare')
     if not compare_els:
         return None
     left_name_comp_vals = defaultdict(list)
     basic_types = set()
     for compare_el in compare_els:
-        left_name_els = compare_el.xpath('left/Name')
+        left_name_els = run_xpath(compare_el, 'left/Name')
         if not left_name_els:
             continue
         left_name = left_name_els[0].get('id')
         if not left_name:
             continue
-        comparators_els = compare_el.xpath('comparators')
+        comparators_els = run_xpath(compare_el, 'comparators')
         if not comparators_els:
             continue
         comparators_el = comparators_els[0]
@@ -332,7 +332,7 @@ def split_group_membership(block_spec, *, repeat=False, **_kwargs) -> MessageLev
     if x in ['a', 'b', 'c']:
         print(x)
     """
-    if_els = block_spec.element.xpath(IF_XPATH)
+    if_els = run_xpath(block_spec.element, IF_XPATH)
     has_split = False
     for if_el in if_els:
         try:
@@ -381,17 +381,17 @@ def split_group_membership(block_spec, *, repeat=False, **_kwargs) -> MessageLev
     return message_level_strs
 
 def get_has_explicit_count(if_el):
-    compare_els = if_el.xpath('test/Compare')
+    compare_els = run_xpath(if_el, 'test/Compare')
     if not compare_els:
         return False
     compare_el = compare_els[0]
-    func_name_els = compare_el.xpath('left/Call/func/Name')
+    func_name_els = run_xpath(compare_el, 'left/Call/func/Name')
     if not func_name_els:
         return False
     len_func = (func_name_els[0].get('id') == 'len')
     if not len_func:
         return False
-    ops_els = compare_el.xpath('ops')
+    ops_els = run_xpath(compare_el, 'ops')
     if not ops_els:
         return False
     ops_el = ops_els[0]
@@ -399,7 +399,7 @@ def get_has_explicit_count(if_el):
     if not operator_els:
         return False
     operator_type = operator_els[0].tag  ## e.g. Gt
-    comparators_els = compare_el.xpath('comparators')
+    comparators_els = run_xpath(compare_el, 'comparators')
     if not comparators_els:
         return False
     comparator_el = comparators_els[0]
@@ -427,7 +427,7 @@ def implicit_boolean_enough(block_spec, *, repeat=False, **_kwargs) -> MessageLe
     """
     if repeat:
         return None
-    if_els = block_spec.element.xpath(IF_XPATH)
+    if_els = run_xpath(block_spec.element, IF_XPATH)
     implicit_boolean_possible = False
     for if_el in if_els:
         has_explicit_count = get_has_explicit_count(if_el)
@@ -489,7 +489,7 @@ def could_short_circuit(if_el):
     :return: True if the If has the potential to be short-circuited
     :rtype: bool
     """
-    body_els = if_el.xpath('body')
+    body_els = run_xpath(if_el, 'body')
     has_one_body = len(body_els) == 1
     if not has_one_body:
         return False
@@ -503,7 +503,7 @@ def could_short_circuit(if_el):
     if not sole_child_is_if:
         return False
     nested_if_el = body_child_el
-    nested_if_orelse_els = nested_if_el.xpath('orelse')
+    nested_if_orelse_els = run_xpath(nested_if_el, 'orelse')
     one_orelse = len(nested_if_orelse_els) == 1
     if not one_orelse:
         return False
@@ -519,7 +519,7 @@ def short_circuit(block_spec, *, repeat=False, **_kwargs) -> MessageLevelStrs |
     """
     Look for cases where short-circuiting is possible.
     """
-    if_els = block_spec.element.xpath(IF_XPATH)
+    if_els = run_xpath(block_spec.element, IF_XPATH)
     could_short_circuit_something = False
     for if_el in if_els:
         if could_short_circuit(if_el):
@@ -580,13 +580,13 @@ def short_circuit(block_spec, *, repeat=False, **_kwargs) -> MessageLevelStrs |
 def could_any_or_all(if_el):
     could_any = False
     could_all = False
-    boolop_val_els = if_el.xpath('descendant::BoolOp/values')
+    boolop_val_els = run_xpath(if_el, 'descendant::BoolOp/values')
     for boolop_val_el in boolop_val_els:
         n_items = len(boolop_val_el.getchildren())
         if n_items < conf.MIN4ANY_OR_ALL:  ## worth doing any or all
             continue
         boolop_el = boolop_val_el.getparent()
-        op_els = boolop_el.xpath('op')
+        op_els = run_xpath(boolop_el, 'op')
         op_el = op_els[0]
         op_type_el = op_el.getchildren()[0]
         if op_type_el.tag == 'Or':
@@ -602,7 +602,7 @@ def any_all(block_spec, *, repeat=False, **_kwargs) -> MessageLevelStrs | None:
     """
     Look for cases where using built-in any or all functions makes sense.
     """
-    if_els = block_spec.element.xpath(IF_XPATH)
+    if_els = run_xpath(block_spec.element, IF_XPATH)
     could_any_something = False
     could_all_something = False
     for if_el in if_els:
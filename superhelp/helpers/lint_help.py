@@ -1,82 +1,18 @@
 from collections import defaultdict, namedtuple
-from pathlib import Path
-import re
-import sys
-
-from flake8.main import application
 
 from superhelp.helpers import snippet_str_help
 from superhelp import conf, lint_conf
-from superhelp.gen_utils import get_nice_str_list, get_os_platform, layout_comment as layout, make_open_tmp_file
+from superhelp.analysis_session import AnalysisSession
+from superhelp.gen_utils import get_nice_str_list, layout_comment as layout
+from superhelp.lint_engine import LintResult, get_lint_engine
 from superhelp.messages import MessageLevelStrs
 
-prog = re.compile(lint_conf.LINT_PATTERN, flags=re.VERBOSE)  # @UndefinedVariable
-
 MsgDets = namedtuple('MsgDets', 'msg, line_no')
 
-already_supplemented = set()
-
 MISC_ISSUES_TITLE = layout("""\
     #### Misc lint issues
     """)
 
-class Buffer:
-
-    def __init__(self):
-        self.saved_content = []
-
-    def write(self, content: str):
-        self.saved_content.append(str(content, encoding='utf-8'))
-
-class GatheredOut:
-    """
-    Monkey Patch sys.stdout using an object which has everything used from sys.stdout by flake8
-    """
-
-    def __init__(self):
-        self.buffer = Buffer()
-
-    def isatty(self):
-        pass
-
-    def flush(self):
-        pass
-
-def _store_snippet(snippet):
-    """
-    At least one test (E501 line too long) only triggered if a trailing newline.
-    Note - if more than one newline we trigger W391 (blank line at end of file)
-    so an rstrip('\n') needed.
-    Having done this need to deactivate W292 (blank line at end of file) LOL
-    """
-    with make_open_tmp_file(conf.SNIPPET_FNAME, mode='w') as tmp_dets:
-        _superhelp_tmpdir, tmp_fh, fpath = tmp_dets
-        tmp_fh.write(snippet.rstrip('\n') + '\n')
-    return fpath
-
-def _get_flake8_results(fpath: Path, *, debug=False) -> str | None:
-    app = application.Application()
-    args = [str(fpath), f'--max-line-length={lint_conf.MAX_LINE_LENGTH}']
-    if lint_conf.IGNORED_LINT_RULES:
-        ignored = ','.join(lint_conf.IGNORED_LINT_RULES)
-        args.append(f"--ignore={ignored}")
-    old_stdout = sys.stdout
-    try:
-        new_stdout = GatheredOut()
-        sys.stdout = new_stdout
-        app.run(args)
-    finally:
-        sys.stdout = old_stdout
-    msgs = new_stdout.buffer.saved_content
-    if debug:
-        for n, msg in enumerate(msgs, 1):
-            print(f"{n:>03} {msg}", end='')
-    if msgs:
-        res = '\n'.join(msgs)
-    else:
-        res = None
-    return res
-
 def _msg_type_to_placeholder_key(msg_type):
     return f"{msg_type}_placeholder"
 
@@ -85,7 +21,7 @@ def _msg_type_to_placeholder(msg_type):
     placeholder = '{' + placeholder_key + '}'  ## ready for .format()
     return placeholder
 
-def _get_msg_type_and_dets(lint_regex_dicts):
+def _get_msg_type_and_dets(lint_results: list[LintResult]):
     """
     Gather MsgDets named tuples by message type e.g. all the E123s together.
     Some lint message types are consolidated as per
@@ -110,18 +46,16 @@ def _get_msg_type_and_dets(lint_regex_dicts):
     Note: just because a message type is consolidated doesn't mean its messages
     will be consolidated or vice versa. They are independent transformations.
 
-    :param list lint_regex_dicts: list of dicts - one per regex.
-     Basically a list of pulled apart lint messages.
+    :param lint_results: structured lint messages e.g. from the lint engine
     :return: dict of message types as keys (possibly consolidated e.g.
      E123-9 -> line continuation message type) and MsgDets tuples as values.
     :rtype: dict
     """
     msg_type_and_dets = defaultdict(list)
-    for lint_regex_dict in lint_regex_dicts:
-        raw_msg_type = lint_regex_dict[conf.LINT_MSG_TYPE]
-        msg_type = lint_conf.consolidated_msg_type(raw_msg_type)
-        msg = layout(lint_regex_dict[conf.LINT_MSG])
-        line_no = int(lint_regex_dict[conf.LINT_LINE_NO])
+    for lint_result in lint_results:
+        msg_type = lint_conf.consolidated_msg_type(lint_result.code)
+        msg = layout(lint_result.msg)
+        line_no = lint_result.line_no
         msg_dets = MsgDets(msg, line_no)
         msg_type_and_dets[msg_type].append(msg_dets)
     return msg_type_and_dets
@@ -147,7 +81,7 @@ def _get_msg_line(msgs_dets):
     msg_line = layout('; '.join(msg_type_details))
     return msg_line
 
-def _get_unfinished_messages(msg_type_and_dets):
+def _get_unfinished_messages(msg_type_and_dets, *, already_supplemented: set[str]):
     """
     Get list of unfinished messages. May contain placeholders that need to be
     replaced.
@@ -155,11 +89,12 @@ def _get_unfinished_messages(msg_type_and_dets):
     Messages are possibly unfinished in the sense that placeholders need to be
     replaced with actual message content.
 
+    :param already_supplemented: msg_types already supplemented in this run (mutated) -
+     persists over a run (e.g. lint help on every script in a project)
     :return: list of strings. Individual strings may contain placeholders.
     :rtype: list
     """
     unfinished_msgs = []
-    global already_supplemented  ## needs to persist over multiple calls (e.g. running lint help every script in a project)
     for msg_type, msgs_dets in msg_type_and_dets.items():
         unfinished_msg = _get_msg_line(msgs_dets)
         generic_msg_type = msg_type not in lint_conf.CUSTOM_LINT_MSGS
@@ -213,7 +148,7 @@ def _get_final_msgs_for_level(msgs_for_msg_level):
         final_msgs_for_level.extend(msgs2extend)
     return final_msgs_for_level
 
-def get_lint_messages_by_level(raw_lint_feedback_str):
+def get_lint_messages_by_level(lint_results: list[LintResult], *, already_supplemented: set[str]):
     """
     Gets lists of lint messages grouped by message level (brief, main, extra).
 
@@ -223,22 +158,13 @@ def get_lint_messages_by_level(raw_lint_feedback_str):
     a composite message (e.g. various have prob). It might be followed by
     supplementary content.
 
-    :param str raw_lint_feedback_str: feedback as received from the linter as
-     stdout (told you it was raw ;-))
+    :param lint_results: feedback as received from the linter (see lint_engine)
+    :param already_supplemented: see _get_unfinished_messages
     :return: brief_msg, main_msg, extra_msg
     :rtype list
     """
-    ## split into lines
-    raw_lint_lines = raw_lint_feedback_str.strip().split('\n')
-    lint_lines = [line.strip() for line in raw_lint_lines if line.strip()]
-    ## REGEX the lines
-    lint_regex_dicts = []
-    for lint_line in lint_lines:
-        result = prog.match(lint_line)
-        lint_regex_dicts.append(result.groupdict())
-    ## misc
-    msg_type_and_dets = _get_msg_type_and_dets(lint_regex_dicts)
-    unfinished_messages = _get_unfinished_messages(msg_type_and_dets)
+    msg_type_and_dets = _get_msg_type_and_dets(lint_results)
+    unfinished_messages = _get_unfinished_messages(msg_type_and_dets, already_supplemented=already_supplemented)
     ## replace placeholders with level-appropriate messages
     ## we can finally sort messages within a brief / main message level!
     lint_msgs = []
@@ -261,21 +187,39 @@ def get_lint_messages_by_level(raw_lint_feedback_str):
     lint_msgs.append(extra_msg)
     return lint_msgs
 
-@snippet_str_help(warning=True)
-def lint_snippet(snippet, *, repeat=False, **_kwargs) -> MessageLevelStrs | None:
+def get_lint_feedback(snippet) -> list[LintResult] | None:
+    """
+    The expensive part of linting - independent of what has been reported for any other snippet
+    so it can be run in a worker process or cached.
+    """
+    if not conf.INCLUDE_LINTING:  ## disabled when testing for speed reasons
+        return None
+    return get_lint_engine().check_source(snippet)
+
+def get_batch_lint_feedback(snippets: list[str], *, jobs=1) -> list[list[LintResult] | None]:
+    """
+    As for get_lint_feedback but for many snippets (e.g. every module in a project) in one linter run.
+    """
+    if not conf.INCLUDE_LINTING:
+        return [None] * len(snippets)
+    return get_lint_engine().check_sources(snippets, jobs=jobs)
+
+@snippet_str_help(warning=True, prepare=get_lint_feedback, batch_prepare=get_batch_lint_feedback)
+def lint_snippet(snippet, *, prepared: list[LintResult] | None, session: AnalysisSession, repeat=False,
+        **_kwargs) -> MessageLevelStrs | None:
     """
     Look for "lint" as defined by flake8 linter and share the results.
 
     The repeat argument is used to avoid repeating all the generic linter information.
     But we also need to know if specific linter msg_types have been repeated or not.
-    We track those with module-level set `already_supplemented`.
+    We track those in the session (see analysis_session).
+
+    prepared is the linter feedback from get_lint_feedback
+    (lists rather than LintResults if read back from the analysis cache).
     """
-    if not conf.INCLUDE_LINTING:  ## disabled when testing for speed reasons
-        return None
-    fpath = _store_snippet(snippet)
-    res = _get_flake8_results(fpath)
-    if not res:
+    if not prepared:
         return None
+    lint_results = [LintResult(*lint_result) for lint_result in prepared]
 
     title = layout("""\
     ### Python code issues (found by flake8 linter)
@@ -318,7 +262,8 @@ def lint_snippet(snippet, *, repeat=False, **_kwargs) -> MessageLevelStrs | None
     findings = layout("""\
     Here is what the linter reported about your snippet.
     """)
-    brief_msg, main_msg, extra_msg = get_lint_messages_by_level(raw_lint_feedback_str=res)
+    brief_msg, main_msg, extra_msg = get_lint_messages_by_level(lint_results,
+        already_supplemented=session.lint_supplemented)
     brief = title + findings + brief_msg
     main = title + linting + findings + main_msg
     extra = obviousness + extra_msg
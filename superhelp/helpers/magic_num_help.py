@@ -1,20 +1,19 @@
 from superhelp import conf
-from superhelp.ast_funcs import num_str_from_parent_el
+from superhelp.ast_index import num_str_from_node
 from superhelp.gen_utils import get_nice_str_list, layout_comment as layout
-from superhelp.helpers import indiv_block_help
+from superhelp.helpers import ast_block_help
 from superhelp.messages import MessageLevelStrs
 
-@indiv_block_help(warning=True)
+@ast_block_help(node_types=['Compare'], warning=True)
 def magic_number(block_spec, *, repeat=False, **_kwargs) -> MessageLevelStrs | None:
     """
     Warn about magic numbers - suggest "constants" or Enums.
     """
-    comparator_els = block_spec.element.xpath('descendant-or-self::comparators')
-    if not comparator_els:
-        return None
     num_strs = []
-    for comparator_el in comparator_els:
-        num_str = num_str_from_parent_el(comparator_el)
+    for compare_node in block_spec.get_nodes('Compare'):
+        if len(compare_node.comparators) != 1:
+            continue
+        num_str = num_str_from_node(compare_node.comparators[0])
         if num_str:
             num_strs.append(num_str)
     if not num_strs:
@@ -1,8 +1,10 @@
+import ast
 import builtins
 from collections import defaultdict, namedtuple
 import keyword
 
-from superhelp.helpers import indiv_block_help,  multi_block_help
+from superhelp.ast_index import TARGET_NODE_TYPES, xml_literal
+from superhelp.helpers import ast_block_help, multi_block_help
 from superhelp import ast_funcs, conf, name_utils
 from superhelp import gen_utils
 from superhelp.gen_utils import get_nice_str_list, int2first_etc, int2nice, layout_comment as layout
@@ -16,6 +18,8 @@ PairDets.name_value.__doc__ = ("Name acting as the value having the other name "
 PairDets.unpacking_idx.__doc__ = ("The unpacking index if applicable "
     "e.g if a, b = c and name is a then unpacking_idx is 0; for b it is 1")
 
+NAMES_NODE_TYPES = TARGET_NODE_TYPES + ['FunctionDef']  ## blocks without any have no names to check
+
 ASSIGN_SUBSCRIPT_XPATH = 'descendant-or-self::Assign/value/Subscript'
 ASSIGN_NAME_XPATH = (
     'descendant-or-self::Assign/value/Name'
@@ -317,70 +321,64 @@ def _get_shamed_names_title(reserved_names, bad_names, dubious_names):
                 title = 'Possibly some un-pythonic names'
     return title
 
+def _get_targets(block_spec) -> list[ast.AST]:
+    """
+    What is assigned to e.g. x in x = 1, for x in ..., or (x := 1); (a, b) in a, b = pair
+    """
+    targets = []
+    for target_node in block_spec.get_nodes(*TARGET_NODE_TYPES):
+        targets.extend(getattr(target_node, 'targets', None) or [target_node.target])
+    return targets
+
+def _is_named_tuple_assign(assign_node) -> bool:
+    func = assign_node.value.func if isinstance(assign_node.value, ast.Call) else None
+    return isinstance(func, ast.Name) and func.id == 'namedtuple'
+
 def get_standard_assigned_names(block_spec):
     """
     Only get names where we expect standard pythonic naming. So not named tuple
     or class names, for example. We have to explicitly ignore named tuple names.
     Classes are automatically excluded because I haven't explicitly included
-    them. They are stored differently e.g. <ClassDef ...name="ActuallyGoodName">
+    them. They are stored differently e.g. ClassDef(name='ActuallyGoodName', ...)
     """
-    assigned_name_els = block_spec.element.xpath(
-        'descendant-or-self::targets/Name | descendant-or-self::target/Name')
     assigned_names = []
-    for name_el in assigned_name_els:
+    for name_node in _get_targets(block_spec):
+        if not isinstance(name_node, ast.Name):
+            continue
         ## exclude if named tuple - they are allowed "un-Pythonic" names
-        try:
-            assign_el = name_el.xpath('ancestor::Assign')[0]
-        except IndexError:
-            ## cannot be a named tuple
-            pass
-        else:
-            func_name_els = assign_el.xpath('value/Call/func/Name')
-            if func_name_els:
-                func_names = [
-                    func_name_el.get('id') for func_name_el in func_name_els]
-                if 'namedtuple' in func_names:
-                    continue
-        ## not a named tuple 
-        name = name_el.get('id')
-        assigned_names.append(name)
+        assign_node = block_spec.ast_index.get_ancestor(name_node, ast.Assign)
+        if assign_node and _is_named_tuple_assign(assign_node):
+            continue
+        ## not a named tuple
+        assigned_names.append(xml_literal(name_node.id))
     return assigned_names
 
 def get_class_names(block_spec):
-    class_els = block_spec.element.xpath('ClassDef')
-    class_names = [class_el.get('name') for class_el in class_els]
-    return class_names
+    """
+    Only ever looked for class definitions as direct children of the block (of which there are none)
+    so class names (already Pascal Case as expected) aren't checked.
+    """
+    return []
 
 def get_named_tuple_names(block_spec):
-    assigned_name_els = block_spec.element.xpath(
-        'descendant-or-self::Assign/targets/Name')
     named_tuple_names = []
-    for name_el in assigned_name_els:
-        assign_el = name_el.xpath('ancestor::Assign')[0]
-        func_name_els = assign_el.xpath('value/Call/func/Name')
-        if func_name_els:
-            func_names = [
-                func_name_el.get('id') for func_name_el in func_name_els]
-            if 'namedtuple' not in func_names:
-                continue
-        name = name_el.get('id')
-        named_tuple_names.append(name)
+    for assign_node in block_spec.get_nodes('Assign'):
+        func = assign_node.value.func if isinstance(assign_node.value, ast.Call) else None
+        if isinstance(func, ast.Name) and func.id != 'namedtuple':
+            continue
+        named_tuple_names.extend(xml_literal(target.id)
+            for target in assign_node.targets if isinstance(target, ast.Name))
     return named_tuple_names
 
 def get_unpacked_names(block_spec):
-    unpacked_name_els = block_spec.element.xpath(
-        'descendant-or-self::targets/Tuple/elts/Name'
-        ' | '
-        'descendant-or-self::target/Tuple/elts/Name')
-    unpacked_names = [unpacked_name_el.get('id')
-        for unpacked_name_el in unpacked_name_els]
+    unpacked_names = []
+    for target in _get_targets(block_spec):
+        if isinstance(target, ast.Tuple):
+            unpacked_names.extend(xml_literal(elt.id) for elt in target.elts if isinstance(elt, ast.Name))
     return unpacked_names
 
 def get_def_func_names(block_spec):
-    def_func_elements = block_spec.element.xpath(
-        'descendant-or-self::FunctionDef')
-    def_func_names = [name_el.get('name') for name_el in def_func_elements]
-    return def_func_names
+    return [xml_literal(func_node.name) for func_node in block_spec.get_nodes('FunctionDef')]
 
 def get_all_names(block_spec, *, include_non_standard=False):
     """
@@ -398,7 +396,7 @@ def get_all_names(block_spec, *, include_non_standard=False):
         all_names = all_names + class_names + named_tuple_names
     return all_names
 
-@indiv_block_help(warning=True)
+@ast_block_help(node_types=NAMES_NODE_TYPES, warning=True)
 def unpythonic_name_check(block_spec, *, repeat=False, **_kwargs) -> MessageLevelStrs | None:
     """
     Check names used for use of reserved words and camel case.
@@ -478,7 +476,7 @@ def unpythonic_name_check(block_spec, *, repeat=False, **_kwargs) -> MessageLeve
     message_level_strs = MessageLevelStrs(brief, main)
     return message_level_strs
 
-@indiv_block_help(warning=True)
+@ast_block_help(node_types=NAMES_NODE_TYPES, warning=True)
 def short_name_check(block_spec, *, repeat=False, **_kwargs) -> MessageLevelStrs | None:
     """
     Check for short variable names.
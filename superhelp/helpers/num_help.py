@@ -34,8 +34,7 @@ def num_overview(block_spec, *, execute_code=True, repeat=False, **_kwargs) -> M
         name_dets = name_utils.get_assigned_name(num_el)
         if execute_code:
             try:
-                val = code_execution.get_val(
-                    block_spec.pre_block_code_str, block_spec.block_code_str,
+                val = code_execution.get_val(block_spec,
                     name_dets.name_type, name_dets.name_details,
                     name_dets.name_str)
                 val_type = type(val).__name__
@@ -1,6 +1,9 @@
-from superhelp import ast_funcs, conf
+import ast
+
+from superhelp import conf
+from superhelp.ast_index import val_dets, xml_literal
 from superhelp.gen_utils import layout_comment as layout
-from superhelp.helpers import indiv_block_help
+from superhelp.helpers import ast_block_help
 from superhelp.messages import MessageLevelStrs
 
 op_name2symbol = {
@@ -18,50 +21,31 @@ op_name2symbol = {
     'LShift': '<<',
 }
 
-@indiv_block_help()
+@ast_block_help(node_types=['Assign'])
 def compound_operator_possible(block_spec, *, repeat=False, **_kwargs) -> MessageLevelStrs | None:
     """
     Look for code like x = x + 1 and suggest the compound operator option.
     """
-    block_el = block_spec.element
-    assign_els = block_el.xpath('descendant-or-self::Assign')
-    if not assign_els:
-        return None
     missing_compound = False
-    for assign_el in assign_els:
-        target_name_els = assign_el.xpath('targets/Name')
-        if len(target_name_els) != 1:
+    for assign_node in block_spec.get_nodes('Assign'):
+        target_name_nodes = [target for target in assign_node.targets if isinstance(target, ast.Name)]
+        if len(target_name_nodes) != 1:
             continue
-        target_name_el = target_name_els[0]
-        target_name = target_name_el.get('id')
-        next_name_els = assign_el.xpath('value/BinOp/left/Name')
-        if len(next_name_els) != 1:
+        target_name = xml_literal(target_name_nodes[0].id)
+        binop_node = assign_node.value
+        if not (isinstance(binop_node, ast.BinOp) and isinstance(binop_node.left, ast.Name)):
             continue
-        next_name = next_name_els[0].get('id')
+        next_name = xml_literal(binop_node.left.id)
         same_name = (target_name == next_name)
         if not same_name:
             continue
         else:
-            op_els = assign_el.xpath('value/BinOp/op')
-            if len(op_els) != 1:
-                raise Exception("Binop didn't have exactly one op")
-            op_el = op_els[0]
-            op_name = op_el.getchildren()[0].tag
+            op_name = binop_node.op.__class__.__name__
             try:
                 op_symbol = op_name2symbol[op_name]
             except KeyError:
                 continue
-            right_els = assign_el.xpath('value/BinOp/right')
-            if len(right_els) != 1:
-                raise Exception("BinOp didn't have exactly one value  "
-                    "even though a BinOp")
-            right_el = right_els[0]
-            value_els = right_el.getchildren()  ## might be Constant
-            if len(value_els) != 1:
-                raise Exception("right didn't have exactly one value even "
-                    "though a BinOp")
-            val_el = value_els[0]
-            result = ast_funcs.val_dets(val_el)
+            result = val_dets(binop_node.right)
             if result is None:
                 raise Exception("Unable to get value from right side of BinOp")
             val, needs_quoting = result
@@ -1,7 +1,7 @@
 from superhelp.helpers import indiv_block_help
 from superhelp.ast_funcs import general as ast_gen
 from superhelp import conf, gen_utils
-from superhelp.gen_utils import layout_comment as layout
+from superhelp.gen_utils import layout_comment as layout, run_xpath
 from superhelp.messages import MessageLevelStrs
 
 def truncate_set(items):
@@ -12,7 +12,7 @@ ASSIGN_SET_XPATH = (
     '| descendant-or-self::Assign/value/Set')
 
 def get_set_els(block_el):
-    set_els = [el for el in block_el.xpath(ASSIGN_SET_XPATH)
+    set_els = [el for el in run_xpath(block_el, ASSIGN_SET_XPATH)
         if el.tag == 'Set' or el.get('id') == 'set']
     return set_els
 
@@ -31,7 +31,7 @@ def set_overview(block_spec, *, repeat=False, execute_code=True, **_kwargs) -> M
     E.g. {dt, dt, dt, 4} -> {conf.UNKNOWN_ITEM, 4} i.e. 2 items when it should
     be 4.
     """
-    set_els = [el for el in block_spec.element.xpath(ASSIGN_SET_XPATH)
+    set_els = [el for el in run_xpath(block_spec.element, ASSIGN_SET_XPATH)
         if el.tag == 'Set' or el.get('id') == 'set']
     if not set_els:
         return None
@@ -174,7 +174,7 @@ def _checking_non_membership(compare_el):
     """
     See if checking membership status (specifically non-membership status).
     """
-    ops_els = compare_el.xpath('ops')
+    ops_els = run_xpath(compare_el, 'ops')
     if len(ops_els) != 1:
         raise Exception("Should only be one ops item in a Compare")
     ops_el = ops_els[0]
@@ -186,7 +186,7 @@ def _checking_non_membership(compare_el):
     return checking_non_membership
 
 def _append_after_check(call_el):
-    func_attribute_els = call_el.xpath('func/Attribute')
+    func_attribute_els = run_xpath(call_el, 'func/Attribute')
     if len(func_attribute_els) != 1:
         return False
     func_attribute_el = func_attribute_els[0]
@@ -195,7 +195,7 @@ def _append_after_check(call_el):
     return True
 
 def _get_test_item_dict(compare_el):
-    left_els = compare_el.xpath('left')
+    left_els = run_xpath(compare_el, 'left')
     if len(left_els) != 1:
         raise Exception("Should only be one left item in a Compare")
     left_el = left_els[0]
@@ -207,7 +207,7 @@ def _get_test_item_dict(compare_el):
     return test_item_dict
 
 def _get_append_item_dict(call_el):
-    args_els = call_el.xpath('args')
+    args_els = run_xpath(call_el, 'args')
     if len(args_els) != 1:
         return None
     args_el = args_els[0]
@@ -219,7 +219,7 @@ def _get_append_item_dict(call_el):
     return append_item_dict
 
 def _get_test_collection_dict(compare_el):
-    comparator_name_els = compare_el.xpath('comparators/Name')
+    comparator_name_els = run_xpath(compare_el, 'comparators/Name')
     if len(comparator_name_els) != 1:
         return None
     comparator_name_el = comparator_name_els[0]
@@ -227,7 +227,7 @@ def _get_test_collection_dict(compare_el):
     return test_collection_dict
 
 def _get_append_collection_dict(call_el):
-    appended_name_els = call_el.xpath('func/Attribute/value/Name')
+    appended_name_els = run_xpath(call_el, 'func/Attribute/value/Name')
     if len(appended_name_els) != 1:
         return None
     appended_name_el = appended_name_els[0]
@@ -239,9 +239,9 @@ def _get_inappropriate_list(if_el):
     Look for a test item being identified as not being in a collection and then
     being appended to that collection.
     """
-    test_el = if_el.xpath('test')[0]
+    test_el = run_xpath(if_el, 'test')[0]
 
-    compare_els = test_el.xpath('Compare')
+    compare_els = run_xpath(test_el, 'Compare')
     if len(compare_els) != 1:
         return None
     compare_el = compare_els[0]
@@ -250,8 +250,8 @@ def _get_inappropriate_list(if_el):
     if not checking_non_membership:
         return None
 
-    body_el = if_el.xpath('body')[0]
-    call_els = body_el.xpath('Expr/value/Call')
+    body_el = run_xpath(if_el, 'body')[0]
+    call_els = run_xpath(body_el, 'Expr/value/Call')
     if len(call_els) != 1:
         return None
     call_el = call_els[0]
@@ -289,7 +289,7 @@ def set_better_than_list(block_spec, *, repeat=False, **_kwargs) -> MessageLevel
     Look for cases where the code checks list membership before adding.
     Candidate for a set?
     """
-    if_els = block_spec.element.xpath('descendant-or-self::If')
+    if_els = run_xpath(block_spec.element, 'descendant-or-self::If')
     if not if_els:
         return None
     inappropriate_lists = []
@@ -1,4 +1,6 @@
-from superhelp.helpers import indiv_block_help
+import ast
+
+from superhelp.helpers import ast_block_help, indiv_block_help
 from superhelp import conf, name_utils
 from superhelp.gen_utils import get_nice_str_list, layout_comment as layout
 from superhelp.messages import MessageLevelStrs
@@ -10,29 +12,25 @@ def _get_sorting_or_reversing_comment(block_spec):
     :return: string describing type of reversing/sorting or None
     :rtype: str
     """
-    element = block_spec.element
     comment = None
-    func_attr_els = element.xpath('descendant-or-self::Call/func/Attribute')
-    sort_els = [func_attr_el for func_attr_el in func_attr_els
-        if func_attr_el.get('attr') == 'sort']
-    func_name_els = element.xpath('descendant-or-self::Call/func/Name')
-    sorted_els = [func_name_el for func_name_el in func_name_els
-        if func_name_el.get('id') == 'sorted']
-    reversed_els = [func_name_el for func_name_el in func_name_els
-        if func_name_el.get('id') == 'reversed']
-    if sort_els:
+    func_nodes = [call_node.func for call_node in block_spec.get_nodes('Call')]
+    has_sort = any(isinstance(func_node, ast.Attribute) and func_node.attr == 'sort' for func_node in func_nodes)
+    func_names = {func_node.id for func_node in func_nodes if isinstance(func_node, ast.Name)}
+    has_sorted = 'sorted' in func_names
+    has_reversed = 'reversed' in func_names
+    if has_sort:
         comment = "has list sorting (`.sort()`)"
-    if comment and (sorted_els or reversed_els):
+    if comment and (has_sorted or has_reversed):
         comment = ' and ' + comment
-    if sorted_els and reversed_els:
+    if has_sorted and has_reversed:
         comment = "uses both the `sorted` and `reversed` functions"
-    elif sorted_els:
+    elif has_sorted:
         comment = "uses the `sorted` function"
-    elif reversed_els:
+    elif has_reversed:
         comment = "uses the `reversed` function"
     return comment
 
-@indiv_block_help()
+@ast_block_help(node_types=['Call'])
 def sorting_reversing_overview(block_spec, *, repeat=False, **_kwargs) -> MessageLevelStrs | None:
     """
     Provide an overview of sorting and/or reversing. Advise on common
@@ -1,6 +1,7 @@
 from superhelp.helpers import indiv_block_help
 from superhelp import ast_funcs
 from superhelp import code_execution, conf, name_utils
+from superhelp.analysis_session import AnalysisSession
 from superhelp.gen_utils import get_nice_str_list, layout_comment as layout
 from superhelp.messages import MessageLevelStrs
 
@@ -23,7 +24,6 @@ def get_str_from_ast(str_el):
         val, _needs_quoting = res
     return val
 
-F_STR_REMINDER = False
 
 @indiv_block_help(xpath=ASSIGN_VALUE_XPATH)
 def assigned_str_overview(block_spec, *, execute_code=True, repeat=False, **_kwargs) -> MessageLevelStrs | None:
@@ -59,8 +59,7 @@ def assigned_str_overview(block_spec, *, execute_code=True, repeat=False, **_kwa
         first_name_dets = names[0]
         if execute_code:
             try:
-                first_val = code_execution.get_val(
-                    block_spec.pre_block_code_str, block_spec.block_code_str,
+                first_val = code_execution.get_val(block_spec,
                     first_name_dets.name_type,
                     first_name_dets.name_details, first_name_dets.name_str)
             except KeyError:
@@ -132,8 +131,7 @@ def assigned_str_overview(block_spec, *, execute_code=True, repeat=False, **_kwa
     message_level_strs = MessageLevelStrs(brief, main, extra)
     return message_level_strs
 
-def str_combination(combination_type, str_els, *, repeat=False) -> MessageLevelStrs | None:
-    global F_STR_REMINDER
+def str_combination(combination_type, str_els, *, session: AnalysisSession, repeat=False) -> MessageLevelStrs | None:
     combination_type2comment = {
         F_STR: "f-string interpolation",
         STR_FORMAT_FUNC: "the format function",
@@ -159,8 +157,8 @@ def str_combination(combination_type, str_els, *, repeat=False) -> MessageLevelS
         """))
     how_combined = ''.join(how_combined_bits)
     if not repeat:
-        if combination_type != F_STR and not F_STR_REMINDER:
-            F_STR_REMINDER = True
+        if combination_type != F_STR and not session.f_str_reminded:
+            session.f_str_reminded = True
             brief_fstring_msg = layout("""\
 
             Your snippet uses a non-f-string approach to constructing a string.
@@ -218,15 +216,15 @@ def str_combination(combination_type, str_els, *, repeat=False) -> MessageLevelS
     return message_level_strs
 
 @indiv_block_help(xpath=JOINED_STR_XPATH)
-def f_str_interpolation(block_spec, *, repeat=False, **_kwargs) -> MessageLevelStrs | None:
+def f_str_interpolation(block_spec, *, session: AnalysisSession, repeat=False, **_kwargs) -> MessageLevelStrs | None:
     """
     Examine f-string interpolation.
     """
     joined_els = block_spec.element.xpath(JOINED_STR_XPATH)
-    return str_combination(F_STR, joined_els, repeat=repeat)
+    return str_combination(F_STR, joined_els, session=session, repeat=repeat)
 
 @indiv_block_help(xpath=FUNC_ATTR_XPATH)
-def format_str_interpolation(block_spec, *, repeat=False, **_kwargs) -> MessageLevelStrs | None:
+def format_str_interpolation(block_spec, *, session: AnalysisSession, repeat=False, **_kwargs) -> MessageLevelStrs | None:
     """
     Look at use of .format() to interpolate into strings.
     """
@@ -240,10 +238,10 @@ def format_str_interpolation(block_spec, *, repeat=False, **_kwargs) -> MessageL
             format_funcs.append(func_attr_el)
     if not format_funcs:
         return None
-    return str_combination(STR_FORMAT_FUNC, format_funcs, repeat=repeat)
+    return str_combination(STR_FORMAT_FUNC, format_funcs, session=session, repeat=repeat)
 
 @indiv_block_help()
-def sprintf(block_spec, *, repeat=False, **_kwargs) -> MessageLevelStrs | None:
+def sprintf(block_spec, *, session: AnalysisSession, repeat=False, **_kwargs) -> MessageLevelStrs | None:
     """
     Look at use of sprintf for string interpolation
     e.g. greeting = "Hi %s" % name
@@ -251,10 +249,10 @@ def sprintf(block_spec, *, repeat=False, **_kwargs) -> MessageLevelStrs | None:
     sprintf_els = block_spec.element.xpath(SPRINTF_XPATH)
     if not sprintf_els:
         return None
-    return str_combination(SPRINTF, sprintf_els, repeat=repeat)
+    return str_combination(SPRINTF, sprintf_els, session=session, repeat=repeat)
 
 @indiv_block_help()
-def string_addition(block_spec, *, repeat=False, **_kwargs) -> MessageLevelStrs | None:
+def string_addition(block_spec, *, session: AnalysisSession, repeat=False, **_kwargs) -> MessageLevelStrs | None:
     """
     Advise on string combination using +.
     Explain how f-string alternative works.
@@ -276,5 +274,5 @@ def string_addition(block_spec, *, repeat=False, **_kwargs) -> MessageLevelStrs
             has_string_addition = True
     if not has_string_addition:
         return None
-    addition_message = str_combination(STR_ADDITION, str_addition_els, repeat=repeat)
+    addition_message = str_combination(STR_ADDITION, str_addition_els, session=session, repeat=repeat)
     return addition_message
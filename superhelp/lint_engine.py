@@ -0,0 +1,138 @@
+"""
+Linting source code in-process and from memory.
+
+Building a flake8 Application (plugin discovery, option parsing, style guide etc) is the largest fixed cost
+in linting so one configured style guide is kept alive and reused for every snippet.
+Snippets are checked straight from the string - no temporary file - and results come back as structured
+LintResult tuples rather than formatted text captured from stdout and parsed back again.
+
+Many sources (e.g. every module in a project) can be checked in one flake8 run instead
+so flake8 can spread the work across processes itself (its --jobs option).
+"""
+from functools import cache
+from operator import attrgetter
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import NamedTuple, Sequence
+
+from flake8.checker import FileChecker, Manager
+from flake8.main import application
+from flake8.options.parse_args import parse_args
+from flake8.processor import FileProcessor
+from flake8.style_guide import Decision, Violation
+
+from superhelp import conf, lint_conf
+from superhelp.gen_utils import get_superhelp_tmpdir
+
+class LintResult(NamedTuple):
+    code: str  ## e.g. E501
+    line_no: int
+    col: int  ## counting from 1 as flake8 reports it
+    msg: str  ## e.g. line too long (125 > 120 characters)
+
+class _SourceFileChecker(FileChecker):
+    """
+    A flake8 FileChecker which takes its lines from memory rather than reading them from a file.
+    """
+
+    def __init__(self, *, lines: list[str], **kwargs):
+        self.lines = lines  ## needed by _make_processor which runs inside the parent __init__
+        super().__init__(**kwargs)
+
+    def _make_processor(self) -> FileProcessor:
+        return FileProcessor(self.filename, self.options, lines=self.lines)
+
+def source_to_lines(source: str) -> list[str]:
+    """
+    At least one test (E501 line too long) only triggered if a trailing newline.
+    Note - if more than one newline we trigger W391 (blank line at end of file)
+    so an rstrip('\n') needed.
+    Having done this need to deactivate W292 (blank line at end of file) LOL
+    """
+    return (source.rstrip('\n') + '\n').splitlines(keepends=True)
+
+class LintEngine:
+    """
+    One configured flake8 style guide (plugins and options, including SuperHELP's settings in lint_conf)
+    able to check any number of sources.
+    """
+
+    def __init__(self):
+        self.args = [f'--max-line-length={lint_conf.MAX_LINE_LENGTH}']  ## also used to configure any worker processes
+        if lint_conf.IGNORED_LINT_RULES:
+            ignored = ','.join(lint_conf.IGNORED_LINT_RULES)
+            self.args.append(f"--ignore={ignored}")
+        app = application.Application()
+        app.plugins, app.options = parse_args(self.args)
+        app.make_formatter()  ## the style guide needs one even though we never report through it
+        app.make_guide()
+        self.options = app.options
+        self.checker_plugins = app.plugins.checkers
+        self.style_guide_manager = app.guide
+
+    def get_reportable_results(self, filename: str, results) -> list[LintResult]:
+        """
+        Apply the style guide to raw checker results (as reported by a flake8 FileChecker) - as flake8 does
+        when reporting - so ignored codes and lines with noqa comments are left out.
+        """
+        style_guide = self.style_guide_manager.style_guide_for(filename)
+        lint_results = []
+        for code, line_no, col, msg, physical_line in results:
+            violation = Violation(code, filename, line_no, (col or 0) + 1, msg, physical_line)
+            if style_guide.should_report_error(code) is not Decision.Selected:
+                continue
+            if violation.is_inline_ignored(self.options.disable_noqa):
+                continue
+            lint_results.append(LintResult(code, line_no, violation.column_number, msg))
+        lint_results.sort(key=attrgetter('line_no', 'col'))
+        return lint_results
+
+    def check_source(self, source: str, *, filename: str = conf.SNIPPET_FNAME) -> list[LintResult]:
+        """
+        :param filename: only used in messages and for any per-file settings - nothing is read from disk
+        :return: lint results sorted by line and column
+        """
+        checker = _SourceFileChecker(filename=filename, plugins=self.checker_plugins, options=self.options,
+            lines=source_to_lines(source))
+        _display_name, results, _statistics = checker.run_checks()
+        return self.get_reportable_results(filename, results)
+
+    def check_paths(self, paths: Sequence[Path], *, jobs: int = 1) -> dict[Path, list[LintResult]]:
+        """
+        Check files in a single flake8 run.
+
+        :param jobs: number of processes flake8 spreads the files across
+        :return: lint results for each path
+        """
+        manager = Manager(style_guide=self.style_guide_manager, plugins=self.checker_plugins, argv=self.args)
+        manager.filenames = tuple(str(path) for path in paths)
+        manager.jobs = min(jobs, len(manager.filenames))
+        manager.run()
+        return {Path(filename): self.get_reportable_results(filename, results)
+            for filename, results, _statistics in manager.results}
+
+    def check_sources(self, sources: Sequence[str], *, jobs: int = 1) -> list[list[LintResult]]:
+        """
+        Check many sources in a single flake8 run (see check_paths).
+        flake8 only works on files when spreading work across processes so each source is written out to a file
+        in a temporary folder first - exactly as check_source would see it so results are identical.
+
+        :return: lint results for each source in the same order as the sources
+        """
+        superhelp_tmpdir = get_superhelp_tmpdir()
+        superhelp_tmpdir.mkdir(exist_ok=True)
+        with TemporaryDirectory(dir=superhelp_tmpdir) as batch_dir:
+            paths = []
+            for n, source in enumerate(sources):
+                path = Path(batch_dir) / f"{n}_{conf.SNIPPET_FNAME}"
+                path.write_text(''.join(source_to_lines(source)))
+                paths.append(path)
+            path2lint_results = self.check_paths(paths, jobs=jobs)
+        return [path2lint_results[path] for path in paths]
+
+@cache
+def get_lint_engine() -> LintEngine:
+    """
+    Shared engine - made on first use (each worker process gets its own).
+    """
+    return LintEngine()
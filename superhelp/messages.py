@@ -1,24 +1,256 @@
-from dataclasses import dataclass
+import ast
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field, replace
+from functools import cached_property, partial
 import logging
+import re
+from time import perf_counter
+from typing import TYPE_CHECKING, Callable
 
-from lxml.etree import _Element
-
+from superhelp.analysis_session import AnalysisSession
+from superhelp.ast_index import AstIndex
 from superhelp.ast_funcs import general as ast_gen
-from superhelp import conf, helpers
-from superhelp.gen_utils import get_docstring_start, get_tree, layout_comment as layout, xml_from_tree
-from superhelp.helpers import HelperSpec
+from superhelp import conf, helpers, profiling
+from superhelp.code_execution import SnippetExecution
+from superhelp.execution_sandbox import SandboxedSnippetExecution, get_snippet_execution
+from superhelp.gen_utils import (get_compiled_xpath, get_docstring_start, get_tree, layout_comment as layout,
+    xml_from_tree)
+from superhelp.helpers import AstBlockHelperSpec, HelperSpec
+
+if TYPE_CHECKING:
+    from lxml.etree import _Element
 
 @dataclass
+class SnippetContext:
+    """
+    A snippet parsed once and shared by every stage of the messages pipeline
+    (individual block helpers, multi-block helpers, and snippet string helpers).
+
+    Converting the AST into XML is the most expensive part of getting ready to run the helpers
+    so it should only ever happen once per snippet - and only if a helper needing XML is actually run
+    (helpers working on the AST use ast_index instead).
+
+    Very large snippets (see conf.BLOCK_BY_BLOCK_MIN_LINES) are converted into XML a block at a time instead.
+    Only one block is held in XML at once (see get_block_el) so memory is bounded by the largest block
+    rather than the whole snippet. Only multi-block helpers declaring they need the whole tree
+    get the XML of the whole snippet (see whole_tree_xml) and only while they run.
+
+    The snippet is the one copy of the code - anything needing some of its lines slices them out (see get_code_str).
+    """
+    snippet: str
+    line_offsets: list[int]  ## see get_line_offsets
+    tree: ast.Module
+    profile: profiling.Profile | None = field(default=None, repr=False)  ## so converting into XML is timed as parsing
+    block_by_block: bool = False  ## convert into XML a block at a time (see get_block_el)
+    _block_el_dets: tuple[int, '_Element'] | None = field(default=None, init=False, repr=False)  ## the block currently in XML (if block by block)
+    _whole_tree_block_els: list['_Element'] | None = field(default=None, init=False, repr=False)
+
+    @cached_property
+    def xml(self) -> '_Element':
+        with profiling.timed_stage(self.profile, profiling.PARSE):
+            return xml_from_tree(self.tree)
+
+    @cached_property
+    def block_els(self) -> list['_Element']:
+        """
+        The top-level blocks i.e. the children of the Module body
+        """
+        return self.xml.xpath('body')[0].getchildren()  ## [0] because there is only one body under root
+
+    def get_block_el(self, block_idx: int) -> '_Element':
+        """
+        The block's XML element. If block by block, the block is converted into XML on its own
+        (freeing the XML of the block before it) with the line the next block starts on recorded in its Module
+        (so ast_funcs.get_el_lines_dets works as usual).
+        """
+        if not self.block_by_block:
+            return self.block_els[block_idx]
+        if self._whole_tree_block_els is not None:
+            return self._whole_tree_block_els[block_idx]
+        if self._block_el_dets and self._block_el_dets[0] == block_idx:
+            return self._block_el_dets[1]
+        self._block_el_dets = None  ## so the previous block can be freed before the next is made
+        with profiling.timed_stage(self.profile, profiling.PARSE):
+            xml = xml_from_tree(ast.Module(body=[self.tree.body[block_idx]], type_ignores=[]))
+        following_line_no = self._get_following_line_no(block_idx)
+        if following_line_no:
+            xml.set('following_lineno', str(following_line_no))
+        block_el = xml[0][0]  ## Module/body/block
+        self._block_el_dets = (block_idx, block_el)
+        return block_el
+
+    def _get_following_line_no(self, block_idx: int) -> int | None:
+        """
+        The line the first block starting after the block ends starts on (if any) e.g. not b in a = 1; b = 2
+        """
+        end_line_no = self.tree.body[block_idx].end_lineno
+        for next_idx in range(block_idx + 1, len(self.blocks_lines_dets)):
+            first_line_no, _last_line_no, _el_lines_n = self.blocks_lines_dets[next_idx]
+            if first_line_no > end_line_no:
+                return first_line_no
+        return None
+
+    @contextmanager
+    def whole_tree_xml(self) -> Iterator['_Element']:
+        """
+        The XML of the whole snippet. If block by block, made for the duration of the with block only
+        (block elements come from it meanwhile so they are part of the whole tree too).
+        """
+        if not self.block_by_block:
+            yield self.xml
+            return
+        with profiling.timed_stage(self.profile, profiling.PARSE):
+            xml = xml_from_tree(self.tree)
+        self._whole_tree_block_els = xml.xpath('body')[0].getchildren()
+        try:
+            yield xml
+        finally:
+            self._whole_tree_block_els = None
+
+    @cached_property
+    def tag2block_idxs(self) -> dict[str, list[int]]:
+        """
+        E.g. {'For': [0, 3], ...} - see get_tag2block_idxs.
+        Worked out from the AST if block by block so the whole snippet is never in XML at once.
+        """
+        if self.block_by_block:
+            return get_tag2block_idxs_from_tree(self.tree.body)
+        return get_tag2block_idxs(self.block_els)
+
+    @cached_property
+    def blocks_lines_dets(self) -> list[tuple[int, int, int]]:
+        """
+        See ast_funcs.get_blocks_lines_dets
+        """
+        return ast_gen.get_blocks_lines_dets(self.tree.body)
+
+    @cached_property
+    def ast_index(self) -> AstIndex:
+        return AstIndex(self.tree)
+
+    @property
+    def multi_block(self) -> bool:
+        return len(self.tree.body) > 1
+
+    @property
+    def n_lines(self) -> int:
+        return len(self.line_offsets) - 1
+
+    def get_code_str(self, first_line_no: int, last_line_no: int) -> str:
+        """
+        The code on the lines (stripped) - a single slice of the snippet however many lines there are.
+        Lines beyond the end of the snippet are ignored (see ast_funcs.get_blocks_lines_dets).
+        """
+        start = self.line_offsets[first_line_no - 1]
+        end = self.line_offsets[min(last_line_no, self.n_lines)]
+        return self.snippet[start: end].strip()
+
+    def get_pre_code_str(self, line_no: int) -> str:
+        """
+        All the code before the line (stripped, with a trailing new line)
+        """
+        return self.snippet[:self.line_offsets[line_no - 1]].strip() + '\n'
+
+def _get_tag2block_idxs(blocks_tags: Iterable[set[str]]) -> dict[str, list[int]]:
+    tag2block_idxs = defaultdict(list)
+    for block_idx, block_tags in enumerate(blocks_tags):
+        for tag in block_tags:
+            tag2block_idxs[tag].append(block_idx)
+    return dict(tag2block_idxs)
+
+def get_tag2block_idxs(block_els: list['_Element']) -> dict[str, list[int]]:
+    """
+    Index every node tag to the (positions of the) blocks containing it in a single walk of the tree.
+    Dispatching blocks to helpers is then a dictionary lookup rather than running every helper's xpath
+    over the whole snippet and climbing back up to the block for each match.
+    """
+    return _get_tag2block_idxs({el.tag for el in block_el.iter()} for block_el in block_els)
+
+def get_tag2block_idxs_from_tree(block_nodes: list[ast.stmt]) -> dict[str, list[int]]:
+    """
+    The same index as get_tag2block_idxs but worked out from the AST without making any XML
+    """
+    from superhelp.ast_xml import get_xml_tags  ## imports lxml so only once there is code to analyse
+    return _get_tag2block_idxs(get_xml_tags(block_node) for block_node in block_nodes)
+
+def get_line_offsets(snippet: str) -> list[int]:
+    """
+    Where each line starts in the snippet (plus where the line after the last would start)
+    so any lines can be sliced straight out of the snippet e.g. [0, 6, 12] for 'a = 1\nb = 2'
+    """
+    line_offsets = [0]
+    line_offsets.extend(match.end() for match in re.finditer('\n', snippet))
+    line_offsets.append(len(snippet) + 1)
+    return line_offsets
+
+def get_snippet_context(snippet: str, *, profile: profiling.Profile | None = None,
+        block_by_block: bool | None = None) -> SnippetContext:
+    """
+    :param profile: if supplied, parsing (and converting into XML if it happens) is timed in it
+    :param block_by_block: if None, only snippets of at least conf.BLOCK_BY_BLOCK_MIN_LINES lines
+     are converted into XML a block at a time
+    """
+    with profiling.timed_stage(profile, profiling.PARSE):
+        tree = get_tree(snippet)
+    line_offsets = get_line_offsets(snippet)
+    if block_by_block is None:
+        block_by_block = len(line_offsets) - 1 >= conf.BLOCK_BY_BLOCK_MIN_LINES
+    return SnippetContext(snippet, line_offsets, tree, profile, block_by_block)
+
+@dataclass(slots=True)
 class BlockSpec:
     """
-    Top-level code block with details
+    Top-level code block with details.
+
+    Only the lines the block is on are kept - its code is sliced out of the snippet when first needed.
+    (Keeping all the code before every block made block specs quadratic in the size of the snippet.)
     """
-    element: _Element
-    pre_block_code_str: str  ## The code up until the line we are interested in needs to be run - it may depend on names from earlier
-    block_code_str: str
+    node: ast.stmt
     first_line_no: int
+    last_line_no: int  ## including any trailing lines (see ast_funcs.get_blocks_lines_dets)
+    block_idx: int = 0  ## position among the top-level blocks
+    snippet_execution: SnippetExecution | SandboxedSnippetExecution | None = None  ## shared by every block in the snippet so code is only run once
+    snippet_context: SnippetContext | None = field(default=None, repr=False)
+    _block_code_str: str | None = field(default=None, init=False, repr=False, compare=False)
 
-@dataclass
+    @property
+    def block_code_str(self) -> str:
+        """
+        The block's code - made once and shared by every message about the block
+        """
+        if self._block_code_str is None:
+            self._block_code_str = self.snippet_context.get_code_str(self.first_line_no, self.last_line_no)
+        return self._block_code_str
+
+    @property
+    def pre_block_code_str(self) -> str:
+        """
+        The code up until the block - the block may depend on names from earlier.
+        Only needed to run the code up to and including the block just for this block (see code_execution.get_val)
+        so made fresh each time rather than kept.
+        """
+        return self.snippet_context.get_pre_code_str(self.first_line_no)
+
+    @property
+    def element(self) -> '_Element':
+        """
+        The block's XML element (the snippet is only converted into XML when first needed - see SnippetContext)
+        """
+        return self.snippet_context.get_block_el(self.block_idx)
+
+    def get_nodes(self, *type_names: str) -> list[ast.AST]:
+        """
+        AST nodes of the types (e.g. 'Compare') in the block - see AstIndex.get_nodes
+        """
+        return self.snippet_context.ast_index.get_nodes(self.block_idx, *type_names)
+
+    @property
+    def ast_index(self) -> AstIndex:
+        return self.snippet_context.ast_index
+
+@dataclass(slots=True)
 class MessageLevelStrs:
     """
     The actual text per level (brief, main, extra)
@@ -27,46 +259,91 @@ class MessageLevelStrs:
     main: str
     extra: str = ''
 
-@dataclass
+@dataclass(slots=True)
 class MessageSpec:
     """
     All the bits and pieces that might be needed to craft a message
     """
-    code_str: str  ## The block of code the message relates to
+    code_str: str  ## The block of code the message relates to (the same string for every message about the block)
     message_level_strs: MessageLevelStrs
     first_line_no: int
     warning: bool
     source: str  ## A unique identifier of the source of message - useful for auditing / testing
 
-def get_block_specs(snippet: str, snippet_block_els) -> list[BlockSpec]:
+@dataclass
+class RepeatVariant:
+    """
+    What a helper says if it has already given its full message in an earlier snippet.
+    None if it has nothing to add on a repeat.
+
+    Also what the full message becomes if it includes the one-off f-string reminder (see str_help)
+    and an earlier snippet already had the reminder (None if the full message doesn't include it).
+    """
+    helper_name: str
+    message_spec: MessageSpec | None
+    reminded_message_spec: MessageSpec | None = None
+
+@dataclass
+class IsolatedSnippetDets:
+    """
+    Snippet details worked out without knowing what was said about any other snippets
+    e.g. in a worker process when a project is analysed in parallel.
+    Everything needed so reconcile_isolated_snippet_dets can make the results identical to a serial run.
+    """
+    snippet: str
+    overall_message_specs: list[MessageSpec]  ## multi-block helpers only - snippet string helpers are run on reconciliation
+    block_message_specs: list[MessageSpec]
+    overall_repeat_variants: dict[int, RepeatVariant]  ## keyed by position in overall_message_specs
+    block_repeat_variants: dict[int, RepeatVariant]  ## keyed by position in block_message_specs
+    fired_helper_names: set[str]  ## helpers which had something to say so count as repeats from now on
+    f_str_reminded: bool  ## gave the one-off f-string reminder so no later snippet should
+    multi_block: bool
+    prepared_inputs: dict[str, object]  ## snippet string helper prepare results (e.g. linter feedback) by helper name
+
+def get_block_specs(snippet_context: SnippetContext) -> list[BlockSpec]:
     """
     Returning a list of all the details needed to process a line
     (namely BlockSpec dataclasses)
 
-    Note - lines in the XML sit immediately under body.
+    Note - lines are the statements in the Module body (in the XML they sit immediately under body).
     """
-    snippet_lines = snippet.split('\n')
+    blocks_lines_dets = snippet_context.blocks_lines_dets
+    snippet_execution = get_snippet_execution(snippet_context.snippet, snippet_context.tree.body)  ## nothing is run unless a helper asks for a value
     block_specs = []
-    for snippet_block_el in snippet_block_els:
-        first_line_no, last_line_no, _el_lines_n = ast_gen.get_el_lines_dets(snippet_block_el)
-        block_code_str = '\n'.join(snippet_lines[first_line_no - 1: last_line_no]).strip()
-        pre_block_code_str = '\n'.join(snippet_lines[0: first_line_no - 1]).strip() + '\n'
-        block_specs.append(BlockSpec(snippet_block_el, pre_block_code_str, block_code_str, first_line_no))
+    for block_idx, (block_node, (first_line_no, last_line_no, _el_lines_n)) in enumerate(zip(
+            snippet_context.tree.body, blocks_lines_dets, strict=True)):
+        block_specs.append(BlockSpec(block_node, first_line_no, last_line_no,
+            block_idx, snippet_execution, snippet_context))
     return block_specs
 
 def get_message_spec_from_input(helper_spec: HelperSpec, *, helper_input, code_str: str, xml: str, first_line_no,
-        execute_code=True, repeat=False) -> MessageSpec | None:  ## TODO:
+        execute_code=True, repeat=False, prepare: Callable | None = None,
+        session: AnalysisSession | None = None) -> MessageSpec | None:  ## TODO:
     """
     :param helper_spec: details of the helper e.g. name, function,
      etc depending on type of HelperSpec (e.g. IndivBlockHelperSpec)
     :param helper_input: the main input to the helper function e.g. block_spec, block_specs, or snippet_str.
+    :param session: for helpers which keep track of what they have already said in this run
+    :param prepare: for helpers with a prepare function - called without arguments to get what the helper is given
+     as prepared. Called here so any problems are reported like any other problem with running the helper.
     """
     name = helper_spec.helper_name
     docstring = helper_spec.helper.__doc__
     if not docstring:
         raise Exception(f'Helper "{name}" lacks a docstring - add one!')
+    profile = session.profile if session else None
     try:
-        message_level_strs = helper_spec.helper(helper_input, xml=xml, execute_code=execute_code, repeat=repeat)  ## some helpers respond to execute_code or xml and some don't so need to mop up **_kwargs
+        helper_kwargs = {'xml': xml, 'execute_code': execute_code, 'repeat': repeat,
+            'session': session or AnalysisSession()}
+        if prepare:
+            with profiling.timed_stage(profile, profiling.PREPARE):
+                helper_kwargs['prepared'] = prepare()
+        start = perf_counter()
+        try:
+            message_level_strs = helper_spec.helper(helper_input, **helper_kwargs)  ## some helpers respond to execute_code or xml and some don't so need to mop up **_kwargs
+        finally:
+            if profile:
+                profile.add_helper_call(name, perf_counter() - start)
     except Exception as e:
         brief_name = '.'.join(name.split('.')[-2:])  ## last two parts only
         brief = (
@@ -88,128 +365,306 @@ def get_message_spec_from_input(helper_spec: HelperSpec, *, helper_input, code_s
         warning = helper_spec.warning
         if message_level_strs is None:
             return None
+    if profile:
+        profile.add_helper_message(name)
     message_spec = MessageSpec(code_str, message_level_strs, first_line_no, warning, source=source)
     return message_spec
 
-def _get_ancestor_block_element(element):
+def _needs_xpath(helper_spec: HelperSpec) -> bool:
     """
-    The item immediately under body that this element is under.
+    Whether the helper's xpath has to be run on a block to know if the helper is interested in it
+    (rather than the block having one of the helper's tags being enough)
     """
-    ancestor_elements = element.xpath('ancestor-or-self::*')
-    ancestor_block_element = ancestor_elements[2]  ## [0] will be Module, 1 is body, and blocks are the children of body
-    return ancestor_block_element
+    return (not isinstance(helper_spec, AstBlockHelperSpec)
+        and bool(helper_spec.xpath) and not helper_spec.tags_suffice)
 
-def _get_filtered_block_specs(helper_spec, xml, block_specs) -> list[BlockSpec]:
+def _get_filtered_block_specs(helper_spec, block_specs, tag2block_idxs, *,
+        profile: profiling.Profile | None = None, run_xpath=True) -> list[BlockSpec]:
     """
-    Identify source block elements according to xpath supplied. Then filter block_specs accordingly.
+    Identify the blocks the helper is interested in. Candidate blocks come from looking up the helper's tags
+    (if it has any) in the index. The xpath is then only run on the candidate blocks
+    unless having one of the tags is all it requires.
+
+    :param profile: if supplied, records how long filtering took and how many blocks matched
+    :param run_xpath: if False, only the candidate blocks - see _is_xpath_match for running the xpath later
     """
-    matching_elements = xml.xpath(helper_spec.xpath)
-    if matching_elements:
-        logging.debug(f"{helper_spec.helper_name} had at least one match")
+    start = perf_counter()
+    if helper_spec.tags is None:
+        candidate_block_specs = block_specs
     else:
-        logging.debug(f"{helper_spec.helper_name} had no matches")
-    filt_block_elements = set([_get_ancestor_block_element(element) for element in matching_elements])
-    filtered_block_specs = [block_spec for block_spec in block_specs
-        if block_spec.element in filt_block_elements]
+        block_idxs = set()
+        for tag in helper_spec.tags:
+            block_idxs.update(tag2block_idxs.get(tag, []))
+        candidate_block_specs = [block_specs[block_idx] for block_idx in sorted(block_idxs)]
+    if not (run_xpath and _needs_xpath(helper_spec)):
+        filtered_block_specs = candidate_block_specs
+    else:
+        ## not compiled yet if registered from the helper manifest
+        compiled_xpath = helper_spec.compiled_xpath or get_compiled_xpath(helper_spec.xpath)
+        filtered_block_specs = [block_spec for block_spec in candidate_block_specs
+            if compiled_xpath(block_spec.element)]
+    if profile:
+        profile.add_helper_filter(helper_spec.helper_name, perf_counter() - start, len(filtered_block_specs))
     if filtered_block_specs:
         logging.debug(f"{helper_spec.helper_name} had at least one block")
     else:
         logging.debug(f"{helper_spec.helper_name} had no blocks")
     return filtered_block_specs
 
-def get_block_level_message_specs(block_specs, xml: str, *,
-        warnings_only=False, execute_code=True, repeat_set=None) -> list[MessageSpec]:
+def _is_xpath_match(helper_spec: HelperSpec, block_spec: BlockSpec, *,
+        profile: profiling.Profile | None = None) -> bool:
+    """
+    Run the helper's xpath on one (candidate) block
+
+    :param profile: if supplied, records how long filtering took and whether the block matched
+    """
+    start = perf_counter()
+    compiled_xpath = helper_spec.compiled_xpath or get_compiled_xpath(helper_spec.xpath)
+    is_match = bool(compiled_xpath(block_spec.element))
+    if profile:
+        profile.add_helper_filter(helper_spec.helper_name, perf_counter() - start, int(is_match))
+    return is_match
+
+def _get_ast_filtered_block_specs(helper_spec: AstBlockHelperSpec, block_specs, ast_index: AstIndex, *,
+        profile: profiling.Profile | None = None) -> list[BlockSpec]:
+    """
+    Identify the blocks with at least one of the node types the helper is interested in (looked up in the AstIndex).
+
+    :param profile: if supplied, records how long filtering took and how many blocks matched
+    """
+    start = perf_counter()
+    filtered_block_specs = [block_spec for block_spec in block_specs
+        if ast_index.has_any(block_spec.block_idx, helper_spec.node_types)]
+    if profile:
+        profile.add_helper_filter(helper_spec.helper_name, perf_counter() - start, len(filtered_block_specs))
+    return filtered_block_specs
+
+def _get_helper_block_specs(helper_spec: HelperSpec, block_specs, snippet_context: SnippetContext, *,
+        profile: profiling.Profile | None = None, run_xpath=True) -> list[BlockSpec]:
+    """
+    The blocks the helper is interested in - by node type for helpers working on the AST
+    and by element (tags and xpath) for the rest (all blocks if no filtering).
+
+    :param run_xpath: see _get_filtered_block_specs
+    """
+    if isinstance(helper_spec, AstBlockHelperSpec):
+        if helper_spec.node_types is None:
+            return block_specs
+        return _get_ast_filtered_block_specs(helper_spec, block_specs, snippet_context.ast_index, profile=profile)
+    if helper_spec.xpath is None and helper_spec.tags is None:  ## no filtering by element type so process all blocks
+        return block_specs
+    return _get_filtered_block_specs(helper_spec, block_specs, snippet_context.tag2block_idxs,
+        profile=profile, run_xpath=run_xpath)
+
+def _get_repeat_variant(helper_spec: HelperSpec, message_spec_kwargs: dict, *,
+        f_str_reminded_before: bool) -> RepeatVariant:
+    """
+    :param message_spec_kwargs: as used for the full message (see get_message_spec_from_input)
+    :param f_str_reminded_before: whether the f-string reminder had been given before the full message was made
+    """
+    session = message_spec_kwargs['session']
+    unprofiled_session = replace(session, profile=None)  ## only the messages actually used count in a profile
+    if session.f_str_reminded and not f_str_reminded_before:  ## it was this message which gave the reminder
+        reminded_session = replace(unprofiled_session, f_str_reminded=True)
+        reminded_message_spec = get_message_spec_from_input(helper_spec, repeat=False,
+            **{**message_spec_kwargs, 'session': reminded_session})
+    else:
+        reminded_message_spec = None
+    repeat_message_spec = get_message_spec_from_input(helper_spec, repeat=True,
+        **{**message_spec_kwargs, 'session': unprofiled_session})
+    return RepeatVariant(helper_spec.helper_name, repeat_message_spec, reminded_message_spec)
+
+def _get_block_message_spec(helper_spec: HelperSpec, block_spec: BlockSpec, *, xml, execute_code=True,
+        session: AnalysisSession, repeat_variants: dict[int, RepeatVariant] | None = None,
+        n_message_specs=0) -> MessageSpec | None:
+    """
+    :param repeat_variants: if supplied, gets the repeat version of a full message added to it
+     (keyed by n_message_specs i.e. the position the message will have)
+    """
+    repeat_set = session.repeat_set
+    repeat = (helper_spec.helper_name in repeat_set)
+    message_spec_kwargs = {
+        'helper_input': block_spec, 'code_str': block_spec.block_code_str, 'xml': xml,
+        'first_line_no': block_spec.first_line_no, 'execute_code': execute_code, 'session': session}
+    f_str_reminded_before = session.f_str_reminded
+    message_spec = get_message_spec_from_input(helper_spec, repeat=repeat, **message_spec_kwargs)
+    if message_spec:
+        if repeat_variants is not None and not repeat:
+            repeat_variants[n_message_specs] = _get_repeat_variant(helper_spec, message_spec_kwargs,
+                f_str_reminded_before=f_str_reminded_before)
+        repeat_set.add(helper_spec.helper_name)
+    return message_spec
+
+def get_block_level_message_specs(snippet_context: SnippetContext, block_specs, *,
+        warnings_only=False, execute_code=True, session: AnalysisSession,
+        repeat_variants: dict[int, RepeatVariant] | None = None) -> list[MessageSpec]:
     """
     For each helper, get advice on every relevant block.
     Element type specific helpers process filtered block_specs;
     all block helpers process all blocks (as you'd expect ;-)).
 
     As we iterate through the blocks, only the first block under a helper should get the full message.
+
+    Helpers working on the AST are dispatched blocks by node type without the XML ever being needed.
+
+    :param repeat_variants: if supplied, gets the repeat version of every full message added to it
+     (keyed by position in the returned list) - see get_isolated_snippet_dets
     """
+    if snippet_context.block_by_block:
+        return _get_block_by_block_message_specs(snippet_context, block_specs,
+            warnings_only=warnings_only, execute_code=execute_code, session=session, repeat_variants=repeat_variants)
     message_specs = []
     for helper_spec in helpers.INDIV_BLOCK_HELPERS:
         logging.debug(f"About to process '{helper_spec.helper_name}'")
         if warnings_only and not helper_spec.warning:
             continue
-        element_filtering = helper_spec.xpath is not None
-        if element_filtering:
-            filtered_block_specs = _get_filtered_block_specs(helper_spec, xml, block_specs)
-            block_specs2use = filtered_block_specs
-            logging.debug(
-                f"'{helper_spec.helper_name}' has element filtering for {len(block_specs2use)} matching blocks")
-        else:  ## no filtering by element type so process all blocks
-            block_specs2use = block_specs
+        ## only helpers working on XML make the snippet be converted into XML
+        xml = None if isinstance(helper_spec, AstBlockHelperSpec) else snippet_context.xml
+        block_specs2use = _get_helper_block_specs(helper_spec, block_specs, snippet_context, profile=session.profile)
+        logging.debug(f"'{helper_spec.helper_name}' has {len(block_specs2use)} matching blocks")
         for block_spec in block_specs2use:
-            repeat = (helper_spec.helper_name in repeat_set)
-            message_spec = get_message_spec_from_input(helper_spec,
-                helper_input=block_spec, code_str=block_spec.block_code_str, xml=xml,
-                first_line_no=block_spec.first_line_no,
-                execute_code=execute_code, repeat=repeat)
+            message_spec = _get_block_message_spec(helper_spec, block_spec, xml=xml, execute_code=execute_code,
+                session=session, repeat_variants=repeat_variants, n_message_specs=len(message_specs))
             if message_spec:
-                repeat_set.add(helper_spec.helper_name)
                 message_specs.append(message_spec)
     return message_specs
 
-def get_overall_snippet_message_specs(snippet, block_specs, *,
-        warnings_only=False, execute_code=True, repeat_set=None) -> list[MessageSpec]:
+def _get_block_by_block_message_specs(snippet_context: SnippetContext, block_specs, *,
+        warnings_only=False, execute_code=True, session: AnalysisSession,
+        repeat_variants: dict[int, RepeatVariant] | None = None) -> list[MessageSpec]:
     """
-    Returns messages which apply to snippet as a whole, not just specific blocks.
-    E.g. looking at every block to look for opportunities to unpack. Or reporting on linting results.
+    As get_block_level_message_specs but running every helper on one block before moving on to the next
+    so each block only has to be converted into XML once and only one block is ever in XML at a time.
+    Messages are returned in the same order as get_block_level_message_specs (helper by helper)
+    and the full message still goes to the first block each helper has something to say about.
+    The only difference - helpers keeping track of what they have said across helpers
+    (e.g. the one-off f-string reminder) may say it on a different block.
+
+    No helper is given the XML of the whole snippet.
     """
-    tree = get_tree(snippet)
-    xml = xml_from_tree(tree)
+    helper_specs = [helper_spec for helper_spec in helpers.INDIV_BLOCK_HELPERS
+        if not (warnings_only and not helper_spec.warning)]
+    ## the candidate blocks for every helper can be worked out up front without any XML (node types and tags)
+    helpers_block_idxs = []
+    for helper_spec in helper_specs:
+        needs_xpath = _needs_xpath(helper_spec)  ## the xpath is timed (as filtering) block by block instead
+        candidate_block_specs = _get_helper_block_specs(helper_spec, block_specs, snippet_context,
+            profile=None if needs_xpath else session.profile, run_xpath=False)
+        helpers_block_idxs.append((needs_xpath, {block_spec.block_idx for block_spec in candidate_block_specs}))
+    helpers_message_specs = [[] for _helper_spec in helper_specs]
+    helpers_repeat_variants = [{} for _helper_spec in helper_specs]  ## keyed by position in the helper's own messages
+    for block_spec in block_specs:
+        for helper_spec, (needs_xpath, block_idxs), helper_message_specs, helper_repeat_variants in zip(
+                helper_specs, helpers_block_idxs, helpers_message_specs, helpers_repeat_variants):
+            if block_spec.block_idx not in block_idxs:
+                continue
+            if needs_xpath and not _is_xpath_match(helper_spec, block_spec, profile=session.profile):
+                continue
+            message_spec = _get_block_message_spec(helper_spec, block_spec, xml=None, execute_code=execute_code,
+                session=session, repeat_variants=None if repeat_variants is None else helper_repeat_variants,
+                n_message_specs=len(helper_message_specs))
+            if message_spec:
+                helper_message_specs.append(message_spec)
     message_specs = []
-    all_helpers_dets = helpers.MULTI_BLOCK_HELPERS + helpers.SNIPPET_STR_HELPERS
-    for helper_spec in all_helpers_dets:
+    for helper_message_specs, helper_repeat_variants in zip(helpers_message_specs, helpers_repeat_variants):
+        if repeat_variants is not None:
+            for n, repeat_variant in helper_repeat_variants.items():
+                repeat_variants[len(message_specs) + n] = repeat_variant
+        message_specs.extend(helper_message_specs)
+    return message_specs
+
+def _get_overall_message_specs(helper_specs, *, snippet: str, block_specs,
+        snippet_context: SnippetContext | None = None, warnings_only=False, execute_code=True, session: AnalysisSession,
+        repeat_variants: dict[int, RepeatVariant] | None = None,
+        prepared_inputs: dict[str, object] | None = None) -> list[MessageSpec]:
+    """
+    :param snippet_context: for the XML handed to multi-block helpers (snippet string helpers don't get any).
+     If converting into XML block by block, only multi-block helpers declaring they need the whole tree get it.
+    :param prepared_inputs: results of helper prepare functions already run (keyed by helper name).
+     Any helpers with prepare functions but no prepared input will be prepared here.
+    """
+    repeat_set = session.repeat_set
+    message_specs = []
+    for helper_spec in helper_specs:
         logging.debug(f"About to process '{helper_spec.helper_name}'")
         if warnings_only and not helper_spec.warning:
             continue
         if helper_spec.input_type == conf.InputType.BLOCKS_SPECS:
             helper_input = block_specs
+            if helper_spec.whole_tree or not snippet_context.block_by_block:
+                xml_context = snippet_context.whole_tree_xml()
+            else:
+                xml_context = nullcontext()
         elif helper_spec.input_type == conf.InputType.SNIPPET_STR:
             helper_input = snippet
+            xml_context = nullcontext()
         else:
             raise Exception(f"Unexpected input_type: '{helper_spec.input_type}'")
         repeat = (helper_spec.helper_name in repeat_set)
-        message_spec = get_message_spec_from_input(helper_spec,
-            helper_input=helper_input, code_str=snippet, xml=xml, first_line_no=None,
-            execute_code=execute_code, repeat=repeat)
-        if message_spec:
-            repeat_set.add(helper_spec.helper_name)
-            message_specs.append(message_spec)
+        if not helper_spec.prepare:
+            prepare = None
+        elif prepared_inputs and helper_spec.helper_name in prepared_inputs:
+            prepare = partial(prepared_inputs.get, helper_spec.helper_name)
+        else:
+            prepare = partial(helper_spec.prepare, helper_input)
+        with xml_context as xml:  ## if block by block, the whole tree (if made at all) is freed once the helper is done
+            message_spec_kwargs = {
+                'helper_input': helper_input, 'code_str': snippet, 'xml': xml,
+                'first_line_no': None, 'execute_code': execute_code, 'prepare': prepare, 'session': session}
+            f_str_reminded_before = session.f_str_reminded
+            message_spec = get_message_spec_from_input(helper_spec, repeat=repeat, **message_spec_kwargs)
+            if message_spec:
+                if repeat_variants is not None and not repeat:
+                    repeat_variants[len(message_specs)] = _get_repeat_variant(helper_spec, message_spec_kwargs,
+                        f_str_reminded_before=f_str_reminded_before)
+                repeat_set.add(helper_spec.helper_name)
+                message_specs.append(message_spec)
     return message_specs
 
-def get_separated_message_specs(snippet: str, snippet_block_els, xml, *,
-        warnings_only=False, execute_code=True, repeat_set=None) -> tuple[list[MessageSpec], list[MessageSpec]] | None:
+def get_overall_snippet_message_specs(snippet_context: SnippetContext, block_specs, *,
+        warnings_only=False, execute_code=True, session: AnalysisSession) -> list[MessageSpec]:
+    """
+    Returns messages which apply to snippet as a whole, not just specific blocks.
+    E.g. looking at every block to look for opportunities to unpack. Or reporting on linting results.
+    """
+    return _get_overall_message_specs(helpers.MULTI_BLOCK_HELPERS + helpers.SNIPPET_STR_HELPERS,
+        snippet=snippet_context.snippet, block_specs=block_specs, snippet_context=snippet_context,
+        warnings_only=warnings_only, execute_code=execute_code, session=session)
+
+def _get_no_advice_message_specs(snippet: str) -> list[MessageSpec]:
+    message_level_strs = MessageLevelStrs(conf.NO_ADVICE_MESSAGE, conf.NO_ADVICE_MESSAGE)
+    return [MessageSpec(snippet, message_level_strs, first_line_no=None, warning=False, source=conf.SYSTEM_MESSAGE)]
+
+def get_separated_message_specs(snippet_context: SnippetContext, *, warnings_only=False, execute_code=True,
+        session: AnalysisSession | None = None) -> tuple[list[MessageSpec], list[MessageSpec]] | None:
     """
     Break snippet up into syntactical parts and blocks of code.
     Apply helper functions and get message details.
     Split into overall messages and block-specific messages.
 
-    :param str snippet: code snippet
-    :param list snippet_block_els: list of block elements for snippet
-    :param xml xml: snippet code as xml object
+    :param snippet_context: the snippet already parsed ready for every stage to share
     :param bool warnings_only: if True, warnings only
     :param bool execute_code: if False, do not execute any code and rely exclusively on AST inspection
-    :param set repeat_set: we need to track if a help message is a repeat
-     especially across multiple scripts being processed.
-    """
-    block_specs = get_block_specs(snippet, snippet_block_els)
-    overall_snippet_message_specs = get_overall_snippet_message_specs(snippet, block_specs,
-        warnings_only=warnings_only, execute_code=execute_code, repeat_set=repeat_set)
-    block_level_message_specs = get_block_level_message_specs(block_specs, xml,
-        warnings_only=warnings_only, execute_code=execute_code, repeat_set=repeat_set)
+    :param session: what has been said so far in this run (mutated) - we need to track if a help message is a repeat
+     especially across multiple scripts being processed. A fresh session if not supplied.
+    """
+    if session is None:
+        session = AnalysisSession()
+    with profiling.timed_stage(session.profile, profiling.BLOCKS):
+        block_specs = get_block_specs(snippet_context)
+    overall_snippet_message_specs = get_overall_snippet_message_specs(snippet_context, block_specs,
+        warnings_only=warnings_only, execute_code=execute_code, session=session)
+    block_level_message_specs = get_block_level_message_specs(snippet_context, block_specs,
+        warnings_only=warnings_only, execute_code=execute_code, session=session)
     for messages_dets in [overall_snippet_message_specs, block_level_message_specs]:
         if None in messages_dets:
             raise Exception("messages_dets is meant to be a list of MessageDets dataclasses yet a None item was found")
     if not (overall_snippet_message_specs or block_level_message_specs):
-        message_level_strs = MessageLevelStrs(conf.NO_ADVICE_MESSAGE, conf.NO_ADVICE_MESSAGE)
-        overall_snippet_message_specs = [
-            MessageSpec(snippet, message_level_strs, first_line_no=None, warning=False, source=conf.SYSTEM_MESSAGE)]
+        overall_snippet_message_specs = _get_no_advice_message_specs(snippet_context.snippet)
     return overall_snippet_message_specs, block_level_message_specs
 
 def get_snippet_dets(snippet, *, warnings_only=False, execute_code=True,
-        repeat_set=None) -> tuple[tuple[list[MessageSpec], list[MessageSpec]], bool]:
+        session: AnalysisSession | None = None) -> tuple[tuple[list[MessageSpec], list[MessageSpec]], bool]:
     """
     Get details for snippet of code.
 
@@ -218,15 +673,128 @@ def get_snippet_dets(snippet, *, warnings_only=False, execute_code=True,
      multi_block_snippet (bool)
     :rtype: tuple
     """
-    tree = get_tree(snippet)
-    xml = xml_from_tree(tree)
+    snippet_context = get_snippet_context(snippet, profile=session and session.profile)  ## the only parse of the snippet - every stage shares it
     if conf.RECORD_AST:
-        ast_gen.store_ast_output(xml)
-    snippet_block_els = xml.xpath('body')[0].getchildren()  ## [0] because there is only one body under root
-    multi_block_snippet = len(snippet_block_els) > 1
+        ast_gen.store_ast_output(snippet_context.xml)
     snippet_message_specs = get_separated_message_specs(
-        snippet, snippet_block_els, xml, warnings_only=warnings_only, execute_code=execute_code, repeat_set=repeat_set)
-    return snippet_message_specs, multi_block_snippet
+        snippet_context, warnings_only=warnings_only, execute_code=execute_code, session=session)
+    return snippet_message_specs, snippet_context.multi_block
+
+def get_isolated_snippet_dets(snippet, *, warnings_only=False, execute_code=True,
+        prepared_inputs: dict[str, object] | None = None,
+        profile: profiling.Profile | None = None) -> IsolatedSnippetDets:
+    """
+    Get details for snippet of code as if no other snippets had been seen.
+    Every helper giving its full message also supplies its repeat message
+    so the full message can be swapped out if an earlier snippet turns out to have had it.
+
+    Snippet string helpers (e.g. the linter) are not run here -
+    they track run-wide state of their own so are left for reconcile_isolated_snippet_dets.
+    Their prepare functions (e.g. running flake8) are run here though because they are expensive
+    and only depend on the snippet.
+
+    :param prepared_inputs: prepare results already available e.g. from get_batch_prepared_inputs
+     (keyed by helper name). Helpers without one are prepared here.
+    :param profile: if supplied, the stages and helper calls are timed in it (repeat variants aren't)
+    """
+    snippet_context = get_snippet_context(snippet, profile=profile)
+    if conf.RECORD_AST:
+        ast_gen.store_ast_output(snippet_context.xml)
+    with profiling.timed_stage(profile, profiling.BLOCKS):
+        block_specs = get_block_specs(snippet_context)
+    session = AnalysisSession(profile=profile)  ## as if no other snippets had been seen
+    overall_repeat_variants = {}
+    block_repeat_variants = {}
+    overall_message_specs = _get_overall_message_specs(helpers.MULTI_BLOCK_HELPERS,
+        snippet=snippet, block_specs=block_specs, snippet_context=snippet_context,
+        warnings_only=warnings_only, execute_code=execute_code, session=session,
+        repeat_variants=overall_repeat_variants)
+    block_message_specs = get_block_level_message_specs(snippet_context, block_specs,
+        warnings_only=warnings_only, execute_code=execute_code, session=session,
+        repeat_variants=block_repeat_variants)
+    with profiling.timed_stage(profile, profiling.PREPARE):
+        prepared_inputs = _get_prepared_inputs(snippet, warnings_only=warnings_only,
+            already_prepared=prepared_inputs)
+    return IsolatedSnippetDets(snippet, overall_message_specs, block_message_specs,
+        overall_repeat_variants, block_repeat_variants, fired_helper_names=session.repeat_set,
+        f_str_reminded=session.f_str_reminded, multi_block=snippet_context.multi_block, prepared_inputs=prepared_inputs)
+
+def _get_prepared_inputs(snippet: str, *, warnings_only=False,
+        already_prepared: dict[str, object] | None = None) -> dict[str, object]:
+    prepared_inputs = dict(already_prepared or {})
+    for helper_spec in helpers.SNIPPET_STR_HELPERS:
+        if not helper_spec.prepare or (warnings_only and not helper_spec.warning):
+            continue
+        if helper_spec.helper_name in prepared_inputs:
+            continue
+        try:
+            prepared_inputs[helper_spec.helper_name] = helper_spec.prepare(snippet)
+        except Exception as e:  ## leave it to be prepared again when the helper runs so the problem is reported as usual
+            logging.debug(f"Unable to prepare input for '{helper_spec.helper_name}' - {e}")
+    return prepared_inputs
+
+def get_batch_prepared_inputs(snippets: list[str], *, warnings_only=False, jobs=1) -> list[dict[str, object]]:
+    """
+    Run the batch prepare functions of snippet string helpers (e.g. linting) over many snippets at once
+    rather than preparing one snippet at a time.
+
+    :param jobs: number of processes the batch prepare functions may use
+    :return: prepared inputs (keyed by helper name) for each snippet in the same order as the snippets.
+     Ready to hand to get_isolated_snippet_dets.
+    """
+    snippets_prepared_inputs = [{} for _snippet in snippets]
+    for helper_spec in helpers.SNIPPET_STR_HELPERS:
+        if not helper_spec.batch_prepare or (warnings_only and not helper_spec.warning):
+            continue
+        try:
+            batch_prepared = helper_spec.batch_prepare(snippets, jobs=jobs)
+        except Exception as e:  ## leave it to each snippet to be prepared in the usual way
+            logging.debug(f"Unable to batch prepare input for '{helper_spec.helper_name}' - {e}")
+            continue
+        for prepared_inputs, prepared in zip(snippets_prepared_inputs, batch_prepared, strict=True):
+            prepared_inputs[helper_spec.helper_name] = prepared
+    return snippets_prepared_inputs
+
+def _apply_repeat_variants(message_specs: list[MessageSpec], repeat_variants: dict[int, RepeatVariant],
+        repeat_set: set[str], *, f_str_reminded: bool) -> list[MessageSpec]:
+    """
+    :param f_str_reminded: whether an earlier snippet already had the one-off f-string reminder
+    """
+    reconciled_message_specs = []
+    for n, message_spec in enumerate(message_specs):
+        repeat_variant = repeat_variants.get(n)
+        if repeat_variant is not None and repeat_variant.helper_name in repeat_set:
+            message_spec = repeat_variant.message_spec
+        elif repeat_variant is not None and f_str_reminded and repeat_variant.reminded_message_spec is not None:
+            message_spec = repeat_variant.reminded_message_spec
+        if message_spec:
+            reconciled_message_specs.append(message_spec)
+    return reconciled_message_specs
+
+def reconcile_isolated_snippet_dets(isolated_snippet_dets: IsolatedSnippetDets, *,
+        warnings_only=False, execute_code=True,
+        session: AnalysisSession) -> tuple[tuple[list[MessageSpec], list[MessageSpec]], bool]:
+    """
+    Turn isolated snippet details into what get_snippet_dets would have returned
+    given the session as it stands (i.e. after all earlier snippets). Mutates the session as get_snippet_dets would.
+
+    Must be called in the same order as the snippets would have been processed serially.
+    """
+    snippet = isolated_snippet_dets.snippet
+    repeat_set = session.repeat_set
+    overall_message_specs = _apply_repeat_variants(isolated_snippet_dets.overall_message_specs,
+        isolated_snippet_dets.overall_repeat_variants, repeat_set, f_str_reminded=session.f_str_reminded)
+    block_message_specs = _apply_repeat_variants(isolated_snippet_dets.block_message_specs,
+        isolated_snippet_dets.block_repeat_variants, repeat_set, f_str_reminded=session.f_str_reminded)
+    repeat_set.update(isolated_snippet_dets.fired_helper_names)
+    session.f_str_reminded = session.f_str_reminded or isolated_snippet_dets.f_str_reminded
+    overall_message_specs.extend(_get_overall_message_specs(helpers.SNIPPET_STR_HELPERS,
+        snippet=snippet, block_specs=None,
+        warnings_only=warnings_only, execute_code=execute_code, session=session,
+        prepared_inputs=isolated_snippet_dets.prepared_inputs))
+    if not (overall_message_specs or block_message_specs):
+        overall_message_specs = _get_no_advice_message_specs(snippet)
+    return (overall_message_specs, block_message_specs), isolated_snippet_dets.multi_block
 
 def get_system_separated_message_specs(snippet, brief_message, *,
         warning=True) -> tuple[list[MessageSpec], list[MessageSpec]]:
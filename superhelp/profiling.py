@@ -0,0 +1,111 @@
+"""
+Where the time goes in a run (shelp --profile or OutputSettings(profile=True)).
+
+Every helper call is timed (calls, total and longest wall time, and how many messages it gave)
+as is every helper's element filtering (how long it took and how many blocks matched).
+So are the stages of the pipeline as a whole e.g. parsing, preparing helper inputs (linting), formatting, displaying.
+
+The profile is kept in the run's analysis session. When profiling, code items are always analysed afresh in-process
+(no analysis cache or worker processes) so every helper call is seen and timed.
+"""
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from time import perf_counter
+
+## stages in pipeline order
+PARSE = 'parse'  ## code to AST (and XML if any helper needing it is run)
+BLOCKS = 'blocks'  ## splitting into blocks
+PREPARE = 'prepare'  ## helper prepare functions e.g. linting
+FORMAT = 'format'
+DISPLAY = 'display'
+STAGES = [PARSE, BLOCKS, PREPARE, FORMAT, DISPLAY]
+
+@dataclass
+class HelperTiming:
+    calls: int = 0
+    total_secs: float = 0
+    max_secs: float = 0
+    messages: int = 0  ## calls which gave a message
+    filter_secs: float = 0  ## finding the blocks the helper is interested in (tags and xpath)
+    matches: int = 0  ## blocks which made it through the filter
+
+    @property
+    def cost_secs(self) -> float:
+        return self.total_secs + self.filter_secs
+
+class Profile:
+
+    def __init__(self):
+        self.stage2secs: dict[str, float] = defaultdict(float)
+        self.helper_name2timing: dict[str, HelperTiming] = defaultdict(HelperTiming)
+
+    @contextmanager
+    def stage(self, stage_name: str):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.stage2secs[stage_name] += perf_counter() - start
+
+    def add_helper_call(self, helper_name: str, secs: float):
+        timing = self.helper_name2timing[helper_name]
+        timing.calls += 1
+        timing.total_secs += secs
+        timing.max_secs = max(timing.max_secs, secs)
+
+    def add_helper_message(self, helper_name: str):
+        self.helper_name2timing[helper_name].messages += 1
+
+    def add_helper_filter(self, helper_name: str, secs: float, matches: int):
+        timing = self.helper_name2timing[helper_name]
+        timing.filter_secs += secs
+        timing.matches += matches
+
+    def get_sorted_helper_timings(self) -> list[tuple[str, HelperTiming]]:
+        """
+        Most costly first
+        """
+        return sorted(self.helper_name2timing.items(), key=lambda name_and_timing: -name_and_timing[1].cost_secs)
+
+    def to_dict(self) -> dict:
+        """
+        E.g.
+        {
+            'stages': {'parse': 0.0123, 'blocks': 0.0011, ...},
+            'helpers': {'superhelp.helpers.lint_help.lint_snippet': {'calls': 1, 'total_secs': 0.0234, ...}, ...},
+        }
+        with helpers most costly first.
+        """
+        stages = {stage_name: self.stage2secs[stage_name] for stage_name in STAGES if stage_name in self.stage2secs}
+        stages['helpers'] = sum(timing.total_secs for timing in self.helper_name2timing.values())
+        stages['filters'] = sum(timing.filter_secs for timing in self.helper_name2timing.values())
+        helpers = {helper_name: asdict(timing) for helper_name, timing in self.get_sorted_helper_timings()}
+        return {'stages': stages, 'helpers': helpers}
+
+def timed_stage(profile: Profile | None, stage_name: str):
+    """
+    Time the with block as a stage of the profile - if profiling (otherwise does nothing).
+    """
+    return profile.stage(stage_name) if profile else nullcontext()
+
+def get_report(profile_dict: dict) -> str:
+    """
+    Stage timings then a table of helpers sorted by cost (helper calls plus filtering).
+
+    :param profile_dict: see Profile.to_dict
+    """
+    lines = ['Stage timings (secs)']
+    for stage_name, secs in profile_dict['stages'].items():
+        lines.append(f"  {stage_name:<10} {secs:>9.4f}")
+    lines.append('')
+    helper_timings = profile_dict['helpers']
+    name_width = max([len('Helper')] + [len(helper_name) for helper_name in helper_timings])
+    header = (f"{'Helper':<{name_width}} {'calls':>7} {'total ms':>10} {'max ms':>9} {'filter ms':>10} "
+        f"{'matches':>8} {'messages':>9}")
+    lines.extend([header, '-' * len(header)])
+    for helper_name, timing in helper_timings.items():  ## already most costly first
+        lines.append(f"{helper_name:<{name_width}} {timing['calls']:>7,} {timing['total_secs'] * 1_000:>10.2f} "
+            f"{timing['max_secs'] * 1_000:>9.2f} {timing['filter_secs'] * 1_000:>10.2f} "
+            f"{timing['matches']:>8,} {timing['messages']:>9,}")
+    return '\n'.join(lines)
@@ -0,0 +1,207 @@
+"""
+Finding and reading the Python modules in a project folder.
+
+Modules are yielded as they are found rather than after walking the whole project first
+so analysis can start straight away, however large the project.
+Which files are included can be controlled by folder name (exclude_folders),
+by glob patterns (include and exclude), and optionally by the project's .gitignore files.
+Reading and decoding files is spread across a pool of threads so slow disks don't hold up analysis.
+"""
+from collections import deque
+from dataclasses import dataclass
+import logging
+import os
+from pathlib import Path
+import re
+import tokenize
+from typing import Callable, Generator, Iterable, Sequence
+
+from superhelp import conf
+
+DEFAULT_INCLUDE_PATTERNS = ('*.py', )
+GITIGNORE_FNAME = '.gitignore'
+ALWAYS_EXCLUDED_FOLDERS = ('.git', )
+
+def glob_to_regex(pattern: str) -> re.Pattern:
+    """
+    Glob pattern (as used in .gitignore files) matched against paths relative to the project folder
+    e.g. 'tests/*.py', '**/migrations/*.py', '*_pb2.py'.
+
+    * and ? never match across folders (/), ** matches any number of folders.
+    Patterns without a slash (other than a trailing one) can match at any depth
+    e.g. '*_pb2.py' matches 'proto/lib/a_pb2.py'.
+    """
+    anchored = '/' in pattern.rstrip('/')
+    pattern = pattern.strip('/')
+    regex_bits = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            regex_bits.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('**', i):
+            regex_bits.append('.*')
+            i += 2
+        elif pattern[i] == '*':
+            regex_bits.append('[^/]*')
+            i += 1
+        elif pattern[i] == '?':
+            regex_bits.append('[^/]')
+            i += 1
+        elif pattern[i] == '[':
+            end = pattern.find(']', i + 1)
+            if end == -1:
+                regex_bits.append(re.escape('['))
+                i += 1
+            else:
+                chars = pattern[i + 1: end]
+                if chars.startswith('!'):
+                    chars = '^' + chars[1:]
+                regex_bits.append(f"[{chars}]")
+                i = end + 1
+        else:
+            regex_bits.append(re.escape(pattern[i]))
+            i += 1
+    prefix = '' if anchored else '(?:.*/)?'
+    return re.compile(f"{prefix}{''.join(regex_bits)}")
+
+def matches_any(rel_path: str, regexes: Sequence[re.Pattern]) -> bool:
+    return any(regex.fullmatch(rel_path) for regex in regexes)
+
+@dataclass(frozen=True)
+class GitIgnoreRule:
+    regex: re.Pattern  ## matched against paths relative to the folder holding the .gitignore file
+    negated: bool  ## e.g. !keep_me.py
+    dir_only: bool  ## e.g. build/
+
+def get_gitignore_rules(gitignore_path: Path) -> list[GitIgnoreRule]:
+    rules = []
+    try:
+        lines = gitignore_path.read_text(encoding='utf-8', errors='replace').splitlines()
+    except OSError as e:
+        logging.debug(f"Unable to read '{gitignore_path}' - {e}")
+        return rules
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith('#'):
+            continue
+        negated = line.startswith('!')
+        if negated:
+            line = line[1:]
+        if line.startswith('\\'):  ## e.g. \#file_starting_with_hash
+            line = line[1:]
+        rules.append(GitIgnoreRule(glob_to_regex(line), negated=negated, dir_only=line.endswith('/')))
+    return rules
+
+def is_gitignored(rel_parts: tuple[str, ...], *, is_dir: bool,
+        folder_rules: Sequence[tuple[tuple[str, ...], list[GitIgnoreRule]]]) -> bool:
+    """
+    As git does it - the last matching rule wins, and rules in deeper .gitignore files come later.
+
+    :param rel_parts: parts of the path relative to the project folder
+    :param folder_rules: rules from each .gitignore file in force (folder parts relative to project, rules)
+    """
+    ignored = False
+    for folder_parts, rules in folder_rules:
+        rel_path = '/'.join(rel_parts[len(folder_parts):])
+        for rule in rules:
+            if rule.dir_only and not is_dir:
+                continue
+            if rule.regex.fullmatch(rel_path):
+                ignored = not rule.negated
+    return ignored
+
+def iter_project_file_paths(project_path: Path, *, exclude_folders: Sequence[str] | None = None,
+        include_patterns: Sequence[str] | None = None, exclude_patterns: Sequence[str] | None = None,
+        use_gitignore: bool = False) -> Generator[Path, None, None]:
+    """
+    Yield the paths of the files to analyse as they are found (in a stable order - sorted within each folder).
+
+    Very easy to end up with far too many modules to process
+    e.g. if inadvertently looking at every module inside the site packages in a virtual env ;-).
+    So a warning is logged once conf.MAX_PROJECT_MODULES is exceeded (but everything is still processed).
+
+    :param exclude_folders: names of folders to skip wherever they are e.g. env
+    :param include_patterns: glob patterns (relative to the project folder) files must match - default *.py
+    :param exclude_patterns: glob patterns (relative to the project folder) for files and folders to skip
+     e.g. 'tests/fixtures', '*_pb2.py'
+    :param use_gitignore: if True skip anything the project's .gitignore files say git would ignore
+    """
+    project_path = Path(project_path)
+    excluded_folder_names = set(ALWAYS_EXCLUDED_FOLDERS) | set(str(folder) for folder in (exclude_folders or []))
+    include_regexes = [glob_to_regex(pattern) for pattern in (include_patterns or DEFAULT_INCLUDE_PATTERNS)]
+    exclude_regexes = [glob_to_regex(pattern) for pattern in (exclude_patterns or [])]
+    n_file_paths = 0
+    ## folders still to walk - with the .gitignore rules in force in each
+    folders = deque([((), [])])
+    while folders:
+        folder_parts, folder_rules = folders.popleft()
+        folder_path = project_path.joinpath(*folder_parts)
+        if use_gitignore:
+            gitignore_rules = get_gitignore_rules(folder_path / GITIGNORE_FNAME)
+            if gitignore_rules:
+                folder_rules = [*folder_rules, (folder_parts, gitignore_rules)]
+        try:
+            with os.scandir(folder_path) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except OSError as e:
+            logging.warning(f"Unable to look inside '{folder_path}' - {e}")
+            continue
+        subfolders = []
+        for entry in entries:
+            rel_parts = (*folder_parts, entry.name)
+            rel_path = '/'.join(rel_parts)
+            is_dir = entry.is_dir()
+            if is_dir and (entry.is_symlink() or entry.name in excluded_folder_names):  ## not following links (as os.walk)
+                continue
+            if matches_any(rel_path, exclude_regexes):
+                continue
+            if use_gitignore and is_gitignored(rel_parts, is_dir=is_dir, folder_rules=folder_rules):
+                continue
+            if is_dir:
+                subfolders.append((rel_parts, folder_rules))
+            elif matches_any(rel_path, include_regexes):
+                n_file_paths += 1
+                if n_file_paths == conf.MAX_PROJECT_MODULES + 1:
+                    logging.warning(f"More than {conf.MAX_PROJECT_MODULES:,} modules to process under "
+                        f"'{project_path}' - perhaps exclude some folders (e.g. a virtual env) or patterns?")
+                yield Path(entry.path)
+        folders.extendleft(reversed(subfolders))  ## depth-first so modules in a folder stay together
+
+def read_code_file(file_path: Path) -> str:
+    """
+    Decoded as Python would decode it i.e. using any encoding declaration (PEP 263) - otherwise UTF-8.
+    """
+    with open(file_path, 'rb') as f:
+        encoding, _lines = tokenize.detect_encoding(f.readline)
+        f.seek(0)
+        code_bytes = f.read()
+    return code_bytes.decode(encoding)
+
+def iter_read_files(file_paths: Iterable[Path], *, read_file: Callable[[Path], str] = read_code_file,
+        n_threads: int | None = None) -> Generator[tuple[str, Path], None, None]:
+    """
+    Yield (contents, file_path) in the same order as the file paths with files read and decoded in threads.
+    Only a limited number of files are read ahead of what has been yielded so memory stays bounded
+    and the file paths can still be streamed in.
+
+    :param n_threads: default conf.FILE_READ_THREADS
+    """
+    if n_threads is None:
+        n_threads = conf.FILE_READ_THREADS
+    if n_threads <= 1:
+        for file_path in file_paths:
+            yield read_file(file_path), file_path
+        return
+    from concurrent.futures import ThreadPoolExecutor  ## not needed (so not imported) for snippets and single files
+    max_read_ahead = n_threads * 4
+    with ThreadPoolExecutor(max_workers=n_threads, thread_name_prefix='superhelp_read') as executor:
+        pending = deque()
+        for file_path in file_paths:
+            pending.append((executor.submit(read_file, file_path), file_path))
+            if len(pending) >= max_read_ahead:
+                future, pending_file_path = pending.popleft()
+                yield future.result(), pending_file_path
+        while pending:
+            future, pending_file_path = pending.popleft()
+            yield future.result(), pending_file_path
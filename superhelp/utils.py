@@ -1,4 +1,3 @@
-from lxml import etree
-
 def inspect_el(el):
+    from lxml import etree
     print(str(etree.tostring(el, pretty_print=True), encoding='utf-8'))
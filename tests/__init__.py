@@ -7,10 +7,8 @@ cd ~/projects/superhelp/tests && s && python3 -m pytest  ## if in surrounding fo
 means we expect to see the helper-decorated function named_tuple_overview() called 0 times.
 """
 
-import astpath
-
 from superhelp import ast_funcs, conf, helpers
-from superhelp.messages import MessageSpec, get_separated_message_specs
+from superhelp.messages import MessageSpec, get_separated_message_specs, get_snippet_context
 from superhelp.gen_utils import get_tree, xml_from_tree
 
 conf.INCLUDE_LINTING = False
@@ -48,12 +46,9 @@ def check_as_expected(test_conf: list, *, execute_code=True):
     :param test_conf: list of tuples: snippet, dict of expected message sources and their expected frequencies
     """
     for snippet, expected_source_freqs in test_conf:
-        tree = get_tree(snippet)
-        xml = astpath.asts.convert_to_xml(tree)
-        ast_funcs.general.store_ast_output(xml)
-        snippet_block_els = xml.xpath('body')[0].getchildren()  ## [0] because there is only one body under root
-        message_dets = get_separated_message_specs(snippet, snippet_block_els, xml,
-            execute_code=execute_code, repeat_set=set())
+        snippet_context = get_snippet_context(snippet)
+        ast_funcs.general.store_ast_output(snippet_context.xml)
+        message_dets = get_separated_message_specs(snippet_context, execute_code=execute_code)
         actual_source_freqs = get_actual_source_freqs(message_dets, expected_source_freqs)
         msg = (f"\n\nSnippet\n\n{snippet}\n\ndidn't get messages as expected from the sources"
             f"\n(execute_code={execute_code}):"
@@ -0,0 +1,11 @@
+import pytest
+
+@pytest.fixture(autouse=True)
+def private_user_dirs(monkeypatch, tmp_path_factory):
+    """
+    Keep whatever tests store in the user's own folders (e.g. the analysis cache, the helper manifest,
+    daemon state) out of the real ones.
+    """
+    user_dirs_path = tmp_path_factory.mktemp('user_dirs')
+    monkeypatch.setenv('XDG_CACHE_HOME', str(user_dirs_path / 'cache'))
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(user_dirs_path / 'runtime'))
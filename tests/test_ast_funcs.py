@@ -1,6 +1,12 @@
+import ast
+from pathlib import Path
 from textwrap import dedent
 
-from superhelp import ast_funcs, gen_utils
+from lxml import etree
+import pytest
+
+from superhelp import ast_funcs, conf, gen_utils, helpers, messages
+from superhelp.ast_xml import convert_to_xml
 
 from tests import get_actual_result
 
@@ -107,6 +113,40 @@ def test_get_el_list_lines_dets():
 
 # test_get_el_list_lines_dets()
 
+def test_get_blocks_lines_dets():
+    tests = [
+        (dedent("""\
+            import random
+
+            options = [
+                'apple',
+                'banana',
+            ]  # fruit
+            snack = random.choice(options)
+            """), [(1, 2, 2), (3, 6, 4), (7, 17, 11)]),
+        (dedent("""\
+            @decorator
+            @decorator2(
+                1)
+            def greet():
+                pass
+            a = 1; b = 2
+            c = 3
+            """), [(1, 5, 5), (6, 6, 1), (6, 6, 1), (7, 17, 11)]),
+        (dedent('''\
+            doc = """
+            Line 1
+            Line 2
+            """
+            '''), [(1, 14, 14)]),
+    ]
+    for snippet, expected_blocks_lines_dets in tests:
+        tree = gen_utils.get_tree(snippet, debug=True)
+        actual_blocks_lines_dets = ast_funcs.general.get_blocks_lines_dets(tree.body)
+        assert actual_blocks_lines_dets == expected_blocks_lines_dets
+
+# test_get_blocks_lines_dets()
+
 def test_num_str_from_parent_el():
     simple = "a = 10"
     neg = "a = -6"
@@ -137,3 +177,89 @@ def test_num_str_from_parent_el():
         assert actual_res == expected_res
 
 # test_num_str_from_parent_el()
+
+def test_xml_matches_astpath(monkeypatch):
+    """
+    Our converter must make exactly the tree astpath does (bar col_offset which nothing queries)
+    so every xpath finds exactly what it used to.
+    """
+    astpath = pytest.importorskip('astpath')  ## only as the reference
+    monkeypatch.setattr(conf, 'MAX_LITERAL_ITEMS_IN_XML', 10 ** 9)  ## astpath keeps huge literals whole
+    tricky = dedent("""\
+        x = {**a, "café": b"\\x00", "\\x01": ..., 'ok': None, 1.5j: True}
+        global g, h
+        def f(*, a=1): return f"{a!r:>{w}}"
+        match p:
+            case [1, *rest] if rest: pass
+            case None: pass
+        """)
+    package_path = Path(__file__).parent.parent
+    snippets = [tricky] + [file_path.read_text()
+        for file_path in sorted(package_path.glob('tests/*.py')) + sorted(package_path.glob('superhelp/*.py'))]
+    for snippet in snippets:
+        tree = ast.parse(snippet)
+        expected_xml = astpath.asts.convert_to_xml(tree)
+        for el in expected_xml.iter():
+            el.attrib.pop('col_offset', None)
+        assert etree.tostring(convert_to_xml(tree)) == etree.tostring(expected_xml)
+
+def test_collapsed_literals(monkeypatch):
+    """
+    Huge literals of constants only keep their first items in the XML - without changing what any helper says
+    (including how many items the collection helpers report and the lines the blocks span).
+    """
+    helpers.load_helpers()
+    names = [f"name{n}" for n in range(300)]
+    nums = ', '.join(str(n) for n in range(200))
+    snippet = dedent(f"""\
+        names = {names!r}
+        lookup = {dict(zip(names, range(300)))!r}
+        coords = {tuple(range(-150, 150))!r}
+        ids = set({list(range(300))!r})
+        pairs = dict({list(zip(names, range(300)))!r})
+        calls = [{nums}, len(names)]
+        def get_table():
+            table = [
+        """) + ''.join(f"        {n},\n" for n in range(300)) + dedent("""\
+            ]
+            return table
+        """)
+    def get_messages_and_xml():
+        snippet_context = messages.get_snippet_context(snippet)
+        message_specs = messages.get_separated_message_specs(snippet_context, execute_code=False)
+        return message_specs, snippet_context.xml
+    collapsed_message_specs, collapsed_xml = get_messages_and_xml()
+    monkeypatch.setattr(conf, 'MAX_LITERAL_ITEMS_IN_XML', 10 ** 9)
+    full_message_specs, full_xml = get_messages_and_xml()
+    assert collapsed_message_specs == full_message_specs
+    sources = {message_spec.source.split('.')[-1] for message_spec in full_message_specs[1]}
+    assert {'list_overview', 'set_overview', 'tuple_overview'} <= sources
+    ## all but calls (with a call at the end) collapsed - the dict twice (keys and values)
+    assert len(collapsed_xml.xpath(f'//{conf.COLLAPSED_ITEMS_TAG}')) == 7
+    assert len(list(collapsed_xml.iter())) * 5 < len(list(full_xml.iter()))
+    monkeypatch.undo()
+    block_els = collapsed_xml.xpath('body')[0].getchildren()
+    assert messages.get_tag2block_idxs_from_tree(ast.parse(snippet).body) == messages.get_tag2block_idxs(block_els)
+
+def test_literals_not_collapsed_below_items_evaluated(monkeypatch):
+    """
+    If MAX_LITERAL_ITEMS_IN_XML is below MAX_ITEMS_EVALUATED no items are left out so nothing is collapsed
+    (and nothing gets a line number of 0 to throw out the lines the blocks span).
+    """
+    helpers.load_helpers()
+    snippet = "nums = [\n" + ''.join(f"    {n},\n" for n in range(10)) + "]\nprint(nums)\n"
+    def get_dets():
+        snippet_context = messages.get_snippet_context(snippet)
+        message_specs = messages.get_separated_message_specs(snippet_context, execute_code=False)
+        block_lines = [(block_spec.first_line_no, block_spec.last_line_no)
+            for block_spec in messages.get_block_specs(snippet_context)]
+        return message_specs, block_lines, snippet_context.xml
+    monkeypatch.setattr(conf, 'MAX_ITEMS_EVALUATED', 25)
+    monkeypatch.setattr(conf, 'MAX_LITERAL_ITEMS_IN_XML', 3)
+    low_message_specs, low_block_lines, low_xml = get_dets()
+    monkeypatch.setattr(conf, 'MAX_LITERAL_ITEMS_IN_XML', 10 ** 9)
+    full_message_specs, full_block_lines, _full_xml = get_dets()
+    assert not low_xml.xpath(f'//{conf.COLLAPSED_ITEMS_TAG}')
+    assert '0' not in low_xml.xpath('//@lineno')
+    assert low_block_lines == full_block_lines
+    assert low_message_specs == full_message_specs
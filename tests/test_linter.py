@@ -4,6 +4,7 @@ from textwrap import dedent
 from tests import check_as_expected
 
 from superhelp import conf, lint_conf
+from superhelp.lint_engine import LintResult, get_lint_engine
 
 def test_linter_regex():
     tests = [
@@ -21,6 +22,20 @@ def test_linter_regex():
             lint_conf.LINT_PATTERN, lint_str, flags=re.VERBOSE).groupdict()  # @UndefinedVariable
         assert actual_dict == expected_dict
 
+def test_lint_engine():
+    tests = [
+        ("a=2", [LintResult('E225', 1, 2, 'missing whitespace around operator')]),
+        ("import os  # noqa\nb = 1 ", [LintResult('W291', 2, 6, 'trailing whitespace')]),
+        ("## ignored E266 comment\nc = 3\n\n\n", []),
+        ("def broken(:\n    pass",
+         [LintResult('E999', 1, 13, "SyntaxError: invalid syntax")]),
+    ]
+    lint_engine = get_lint_engine()
+    for snippet, expected_results in tests:
+        actual_results = lint_engine.check_source(snippet)
+        assert actual_results == expected_results
+    assert get_lint_engine() is lint_engine  ## one engine (and style guide) reused
+
 ROOT = 'superhelp.helpers.lint_help.'
 
 def test_misc():
@@ -115,3 +130,4 @@ def test_misc():
 
 # test_misc()
 # test_linter_regex()
+# test_lint_engine()
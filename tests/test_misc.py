@@ -1,11 +1,27 @@
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from itertools import product
+import json
 import logging
+import os
 from pathlib import Path
+import stat
+import subprocess
+import sys
 from textwrap import dedent
+from urllib.parse import unquote
 
-from superhelp import conf
+from superhelp import async_helper, conf, daemon, helper_manifest, helpers, messages, project_files
+from superhelp.analysis_cache import AnalysisCache, get_analysis_cache
+from superhelp.analysis_session import AnalysisSession
+from superhelp.displayers import html_displayer
 from superhelp.gen_utils import layout_comment as layout
-from superhelp.helper import this
+from superhelp import helper
+from superhelp.helper import OutputSettings, Pipeline, this
+from superhelp.helpers import get_xpath_tags
+from superhelp.lint_engine import get_lint_engine
 
 def test_this():
     conf.SHOW_OUTPUT = False
@@ -56,5 +72,625 @@ def test_layout():
         actual_res = layout(raw, is_code=is_code)
         assert actual_res == expected_res, f"'{actual_res}'"
 
+def test_single_parse_per_snippet(monkeypatch):
+    """
+    Every stage of the messages pipeline should share the one parse (AST and XML) of the snippet.
+    """
+    n_parses = {'tree': 0, 'xml': 0}
+    orig_get_tree = messages.get_tree
+    orig_xml_from_tree = messages.xml_from_tree
+    def counted_get_tree(snippet):
+        n_parses['tree'] += 1
+        return orig_get_tree(snippet)
+    def counted_xml_from_tree(tree):
+        n_parses['xml'] += 1
+        return orig_xml_from_tree(tree)
+    monkeypatch.setattr(messages, 'get_tree', counted_get_tree)
+    monkeypatch.setattr(messages, 'xml_from_tree', counted_xml_from_tree)
+    snippet = dedent("""\
+        pets = ['cat', 'dog']
+        for pet in pets:
+            print(pet)
+        """)
+    messages.get_snippet_dets(snippet)
+    assert n_parses == {'tree': 1, 'xml': 1}, n_parses
+
+CODE_ITEMS = [
+    ("pets = ['cat', 'dog']\nfor pet in pets:\n    print(pet)", Path('a.py')),
+    ("import community", Path('b.py')),
+    ("names = ['Noor', 'Grant']\nfor i in range(len(names)):\n    print(names[i])", Path('c.py')),
+    ("def broken(:", Path('d.py')),
+    ("a=2\nnums = [1, 2, 3]", Path('e.py')),
+    ("pass", Path('f.py')),
+    ('a = "x%s" % 1', Path('g.py')),  ## the f-string reminder is only given once per run
+    ('b = "y{}".format(2)', Path('h.py')),
+]
+
+def _get_code_items_dets(output_settings: OutputSettings):
+    return list(Pipeline.get_code_items_dets(iter(CODE_ITEMS), output_settings=output_settings))
+
+def _get_shared_session_code_items_dets():
+    """
+    The reference - one session handed from one code item to the next with nothing analysed in isolation
+    """
+    session = AnalysisSession()
+    code_items_dets = []
+    for code, code_file_path in CODE_ITEMS:
+        system_messages_dets = Pipeline._get_system_messages_dets(code)
+        if system_messages_dets:
+            messages_dets, multi_block = system_messages_dets, False
+        else:
+            try:
+                messages_dets, multi_block = messages.get_snippet_dets(code, execute_code=False, session=session)
+            except Exception as e:
+                messages_dets, multi_block = messages.get_error_message_specs(e, code), False
+        code_items_dets.append((code, code_file_path, messages_dets, multi_block))
+    return code_items_dets
+
+def test_parallel_matches_serial(monkeypatch):
+    """
+    Analysing code items in isolation (serially or in worker processes) should make no difference to the results -
+    not even to which code item gets the full message rather than the repeat version.
+    """
+    monkeypatch.setattr(conf, 'INCLUDE_LINTING', True)
+    reference_code_items_dets = _get_shared_session_code_items_dets()
+    serial_code_items_dets = _get_code_items_dets(OutputSettings(jobs=1, use_cache=False))
+    parallel_code_items_dets = _get_code_items_dets(OutputSettings(jobs=3, use_cache=False))
+    assert serial_code_items_dets == reference_code_items_dets
+    assert parallel_code_items_dets == reference_code_items_dets
+
+def test_batch_linting(monkeypatch, tmp_path):
+    """
+    Multiple code items should be linted in one linter run whether caching or not -
+    with the same results as linting one by one.
+    """
+    monkeypatch.setattr(conf, 'INCLUDE_LINTING', True)
+    serial_code_items_dets = _get_shared_session_code_items_dets()
+    lint_engine = get_lint_engine()
+    batches = []
+    orig_check_sources = lint_engine.check_sources
+    def recorded_check_sources(sources, **kwargs):
+        batches.append(list(sources))
+        return orig_check_sources(sources, **kwargs)
+    monkeypatch.setattr(lint_engine, 'check_sources', recorded_check_sources)
+    def unexpected_check_source(source, **_kwargs):
+        raise Exception(f"Linted on its own: {source}")
+    monkeypatch.setattr(lint_engine, 'check_source', unexpected_check_source)
+    for use_cache in (False, True):
+        batches.clear()
+        batch_code_items_dets = _get_code_items_dets(
+            OutputSettings(jobs=1, use_cache=use_cache, cache_path=tmp_path))
+        assert batch_code_items_dets == serial_code_items_dets, f"{use_cache=}"
+        assert batches == [[code for code, _code_file_path in CODE_ITEMS if code != 'import community']], (
+            f"{use_cache=}")
+
+def test_batch_chunks(monkeypatch, tmp_path):
+    """
+    Code items should be read, batch linted, and yielded a chunk at a time -
+    not all read (and linted) before the first result - with the same results as ever.
+    """
+    monkeypatch.setattr(conf, 'INCLUDE_LINTING', True)
+    serial_code_items_dets = _get_code_items_dets(OutputSettings(jobs=1, use_cache=False))
+    monkeypatch.setattr(conf, 'BATCH_PREPARE_MAX_ITEMS', 2)
+    n_read = 0
+    def read_code_items():
+        nonlocal n_read
+        for code_item in CODE_ITEMS:
+            n_read += 1
+            yield code_item
+    for jobs in (1, 3):
+        n_read = 0
+        code_items_dets = Pipeline.get_code_items_dets(read_code_items(),
+            output_settings=OutputSettings(jobs=jobs, use_cache=True, cache_path=tmp_path / str(jobs)))
+        first_code_item_dets = next(code_items_dets)
+        assert n_read == 2, f"{jobs=} {n_read=}"
+        assert [first_code_item_dets, *code_items_dets] == serial_code_items_dets, f"{jobs=}"
+
+def test_analysis_cache(monkeypatch, tmp_path):
+    """
+    Cached results should make no difference to the results.
+    And once cached, unchanged code shouldn't be analysed again at all
+    (code which can't be analysed e.g. because of syntax errors is never cached).
+    """
+    monkeypatch.setattr(conf, 'INCLUDE_LINTING', True)
+    serial_code_items_dets = _get_code_items_dets(OutputSettings(jobs=1, use_cache=False))
+    cold_code_items_dets = _get_code_items_dets(OutputSettings(jobs=1, use_cache=True, cache_path=tmp_path))
+    assert cold_code_items_dets == serial_code_items_dets
+    analysed_snippets = []
+    orig_get_isolated_snippet_dets = messages.get_isolated_snippet_dets
+    def recorded_get_isolated_snippet_dets(snippet, **kwargs):
+        analysed_snippets.append(snippet)
+        return orig_get_isolated_snippet_dets(snippet, **kwargs)
+    monkeypatch.setattr(messages, 'get_isolated_snippet_dets', recorded_get_isolated_snippet_dets)
+    for jobs in (1, 3):
+        warm_code_items_dets = _get_code_items_dets(OutputSettings(jobs=jobs, use_cache=True, cache_path=tmp_path))
+        assert warm_code_items_dets == serial_code_items_dets, f"{jobs=}"
+    assert analysed_snippets == ['def broken(:'], analysed_snippets  ## only the serial run analyses in this process
+    ## only if asked for - and never if executing code (the results depend on more than the code)
+    assert Pipeline.get_analysis_cache(OutputSettings(cache_path=tmp_path)) is None
+    assert Pipeline.get_analysis_cache(OutputSettings(use_cache=True, execute_code=True, cache_path=tmp_path)) is None
+
+def test_analysis_cache_eviction(tmp_path):
+    analysis_cache = AnalysisCache(tmp_path)
+    snippets = [f"num_{n} = {n}" for n in range(5)]
+    for snippet in snippets:
+        analysis_cache.store(analysis_cache.get_key(snippet), messages.get_isolated_snippet_dets(snippet))
+    entry_bytes = max(entry_path.stat().st_size for entry_path in tmp_path.iterdir())
+    analysis_cache.max_bytes = entry_bytes * 3
+    most_recently_used_key = analysis_cache.get_key(snippets[0])
+    os.utime(tmp_path / f"{most_recently_used_key}.json", (0, 0))  ## make it look the oldest
+    assert analysis_cache.get(most_recently_used_key) is not None  ## now the most recently used
+    analysis_cache.evict()
+    assert analysis_cache.get(most_recently_used_key) is not None
+    assert len(list(tmp_path.iterdir())) <= 2  ## evicted to comfortably under the limit
+
+def test_analysis_cache_is_private(monkeypatch, tmp_path):
+    """
+    The cache lives in a folder only the user can get at and holds plain JSON.
+    Nothing belonging to anyone else is ever used.
+    """
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    analysis_cache = AnalysisCache()
+    assert analysis_cache.cache_path == tmp_path / 'cache' / 'superhelp' / conf.SUPERHELP_ANALYSIS_CACHE
+    assert stat.S_IMODE(analysis_cache.cache_path.stat().st_mode) == 0o700
+    snippet = "pets = ['cat', 'dog']"
+    key = analysis_cache.get_key(snippet)
+    analysis_cache.store(key, messages.get_isolated_snippet_dets(snippet))
+    [entry_path] = analysis_cache.cache_path.iterdir()
+    assert json.loads(entry_path.read_text())['snippet'] == snippet
+    assert analysis_cache.get(key) == messages.get_isolated_snippet_dets(snippet)
+    uid = os.getuid()
+    monkeypatch.setattr(os, 'getuid', lambda: uid + 1)  ## as if someone else
+    assert analysis_cache.get(key) is None
+    assert get_analysis_cache(tmp_path / 'cache') is None
+
 # test_layout()
 # test_this()
+
+def test_xpath_tags():
+    assert get_xpath_tags('descendant-or-self::For | descendant-or-self::While') == (frozenset(['For', 'While']), True)
+    assert get_xpath_tags(
+        "descendant-or-self::Assign/value/List | descendant-or-self::If[test/Compare]") == (
+        frozenset(['Assign', 'If']), False)
+    assert get_xpath_tags('body/Assign') == (None, False)
+    assert get_xpath_tags("descendant-or-self::Name[@id='a' or ancestor::If | ancestor::For]") == (None, False)
+
+def test_tag_dispatch_matches_xpath():
+    """
+    Dispatching blocks to helpers via the tag index must pick exactly the blocks running the xpath
+    over the whole snippet would.
+    """
+    tests_folder = Path(__file__).parent
+    for file_path in sorted(tests_folder.glob('*.py')) + sorted((tests_folder.parent / 'superhelp').glob('*.py')):
+        snippet_context = messages.get_snippet_context(file_path.read_text())
+        block_specs = messages.get_block_specs(snippet_context)
+        for helper_spec in helpers.INDIV_BLOCK_HELPERS:
+            if not isinstance(helper_spec, helpers.IndivBlockHelperSpec) or not helper_spec.xpath:
+                continue
+            expected_block_els = {element.xpath('ancestor-or-self::*')[2]
+                for element in snippet_context.xml.xpath(helper_spec.xpath)}
+            filtered_block_specs = messages._get_filtered_block_specs(
+                helper_spec, block_specs, snippet_context.tag2block_idxs)
+            assert [block_spec.element for block_spec in filtered_block_specs] == [
+                block_spec.element for block_spec in block_specs if block_spec.element in expected_block_els], (
+                f"{helper_spec.helper_name} on {file_path.name}")
+
+def test_ast_helpers_skip_xml(monkeypatch):
+    """
+    Helpers working on the AST must say what they say in a full run - without the snippet ever being converted
+    into XML if no helper needing XML is active.
+    """
+    helpers.load_helpers()
+    snippet = dedent("""\
+        nums = [3, 1, 2]
+        counter = 0
+        if len(nums) > 7:
+            counter = counter + 1
+        totalValue = sorted(nums)
+        x = -1
+        """)
+    ast_helper_specs = [helper_spec for helper_spec in helpers.INDIV_BLOCK_HELPERS
+        if isinstance(helper_spec, helpers.AstBlockHelperSpec)]
+    ast_helper_names = {helper_spec.helper_name for helper_spec in ast_helper_specs}
+    _overall_message_specs, block_message_specs = messages.get_separated_message_specs(
+        messages.get_snippet_context(snippet), execute_code=False)
+    expected_message_specs = [message_spec for message_spec in block_message_specs
+        if message_spec.source in ast_helper_names]
+    assert {message_spec.source.split('.')[-1] for message_spec in expected_message_specs} == {
+        'magic_number', 'compound_operator_possible', 'unpythonic_name_check', 'short_name_check',
+        'sorting_reversing_overview'}
+    monkeypatch.setattr(helpers, 'INDIV_BLOCK_HELPERS', ast_helper_specs)
+    monkeypatch.setattr(helpers, 'MULTI_BLOCK_HELPERS', [])
+    monkeypatch.setattr(helpers, 'SNIPPET_STR_HELPERS', [])
+    snippet_context = messages.get_snippet_context(snippet)
+    _overall_message_specs, block_message_specs = messages.get_separated_message_specs(
+        snippet_context, execute_code=False)
+    assert block_message_specs == expected_message_specs
+    assert 'xml' not in vars(snippet_context)  ## cached_property only sets it when first used
+
+def test_block_by_block(monkeypatch):
+    """
+    Converting into XML a block at a time must say exactly what converting the whole snippet says
+    without the whole snippet ever being in XML - unless a multi-block helper declares it needs the whole tree.
+    """
+    helpers.load_helpers()
+    snippet = dedent("""\
+        from dataclasses import dataclass
+
+        counter = 0
+        for image in images:
+            counter += 1
+
+        @dataclass
+        class Point:
+            x: int
+
+        @total_ordering
+        class Fruit:
+            pass
+
+        def process(items):
+            for item in items:
+                for part in item:
+                    print(part)
+            return [
+                item for item in items
+            ]
+        """)
+    normal_message_specs = messages.get_separated_message_specs(
+        messages.get_snippet_context(snippet, block_by_block=False), execute_code=False)
+    snippet_context = messages.get_snippet_context(snippet, block_by_block=True)
+    assert snippet_context.tag2block_idxs == messages.get_tag2block_idxs(
+        messages.get_snippet_context(snippet).block_els)
+    assert messages.get_separated_message_specs(snippet_context, execute_code=False) == normal_message_specs
+    assert 'xml' not in vars(snippet_context)
+    whole_tree_dets = []
+    def whole_tree_helper(block_specs, xml, **_kwargs):
+        """
+        Needs the whole tree
+        """
+        whole_tree_dets.append((xml, {block_spec.element.getroottree().getroot() for block_spec in block_specs}))
+    monkeypatch.setattr(helpers, 'MULTI_BLOCK_HELPERS', [helpers.OverallCodeHelperSpec(
+        'whole_tree_helper', whole_tree_helper, conf.InputType.BLOCKS_SPECS, whole_tree=True)])
+    messages.get_separated_message_specs(snippet_context, execute_code=False)
+    [(xml, roots)] = whole_tree_dets
+    assert roots == {xml}
+    assert 'xml' not in vars(snippet_context)
+
+def test_block_specs_from_line_offsets():
+    """
+    Block specs only keep line numbers - the code of each block (and all the code before it)
+    must be exactly what joining the snippet's lines gives. Every message about a block shares its code.
+    """
+    snippet = dedent("""\
+        from dataclasses import dataclass
+
+        a = 1; b = {
+            'café': 2,
+        }
+        # comment
+        @dataclass
+        class Point:
+            x: int
+        for pet in ['cat', 'dog']:
+            print(pet)""")
+    snippet_lines = snippet.split('\n')
+    block_specs = messages.get_block_specs(messages.get_snippet_context(snippet))
+    for block_spec in block_specs:
+        assert block_spec.block_code_str == '\n'.join(
+            snippet_lines[block_spec.first_line_no - 1: block_spec.last_line_no]).strip()
+        assert block_spec.pre_block_code_str == '\n'.join(snippet_lines[:block_spec.first_line_no - 1]).strip() + '\n'
+    assert [block_spec.block_code_str for block_spec in block_specs] == [
+        'from dataclasses import dataclass', *["a = 1; b = {\n    'café': 2,\n}\n# comment"] * 2,
+        '@dataclass\nclass Point:\n    x: int', "for pet in ['cat', 'dog']:\n    print(pet)"]
+    assert not hasattr(block_specs[0], '__dict__')  ## slotted
+    snippet_context = messages.get_snippet_context(snippet)
+    block_specs = messages.get_block_specs(snippet_context)
+    block_message_specs = messages.get_block_level_message_specs(snippet_context, block_specs,
+        execute_code=False, session=AnalysisSession())
+    assert block_message_specs
+    block_code_str_ids = {id(block_spec.block_code_str) for block_spec in block_specs}
+    assert {id(message_spec.code_str) for message_spec in block_message_specs} <= block_code_str_ids
+
+def test_project_files(monkeypatch, tmp_path, caplog):
+    rel_paths = ['a.py', 'b.txt', 'env/lib.py', 'build/gen.py', 'pkg/c.py', 'pkg/c_pb2.py', 'pkg/keep.log.py',
+        'pkg/fixtures/d.py', 'pkg/sub/e.py', 'pkg/sub/f.py', 'latin.py']
+    for rel_path in rel_paths:
+        (tmp_path / rel_path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel_path).write_text(f"name = '{rel_path}'\n")
+    (tmp_path / 'latin.py').write_bytes("# -*- coding: latin-1 -*-\nname = 'caf\xe9'\n".encode('latin-1'))
+    (tmp_path / '.gitignore').write_text("# generated\nbuild/\n*.log.py\n")
+    (tmp_path / 'pkg' / 'sub' / '.gitignore').write_text("*.py\n!f.py\n")
+    def get_rel_paths(**kwargs):
+        return ['/'.join(path.relative_to(tmp_path).parts)
+            for path in project_files.iter_project_file_paths(tmp_path, **kwargs)]
+    assert get_rel_paths() == ['a.py', 'latin.py', 'build/gen.py', 'env/lib.py', 'pkg/c.py', 'pkg/c_pb2.py',
+        'pkg/keep.log.py', 'pkg/fixtures/d.py', 'pkg/sub/e.py', 'pkg/sub/f.py']
+    assert get_rel_paths(exclude_folders=['env'], exclude_patterns=['*_pb2.py', 'pkg/fixtures'],
+        use_gitignore=True) == ['a.py', 'latin.py', 'pkg/c.py', 'pkg/sub/f.py']
+    assert get_rel_paths(include_patterns=['pkg/**/*.py'], exclude_patterns=['*/sub']) == [
+        'pkg/c.py', 'pkg/c_pb2.py', 'pkg/keep.log.py', 'pkg/fixtures/d.py']
+    ## a soft limit only
+    monkeypatch.setattr(conf, 'MAX_PROJECT_MODULES', 1)
+    with caplog.at_level(logging.WARNING):
+        code_items = list(Pipeline.get_code_items(project_path=tmp_path, exclude_folders=['env', 'build', 'pkg']))
+    assert "More than 1 modules" in caplog.text
+    assert code_items == [("name = 'a.py'", tmp_path / 'a.py'), ("# -*- coding: latin-1 -*-\nname = 'caf\xe9'",
+        tmp_path / 'latin.py')]
+
+def test_project_report(monkeypatch, tmp_path):
+    """
+    One report for a project - only the index is opened, with a page per module to load from it.
+    """
+    opened_urls = []
+    monkeypatch.setattr(html_displayer.webbrowser, 'open_new_tab', opened_urls.append)
+    output_settings = OutputSettings(jobs=1, use_cache=False, tmp_html_path=tmp_path)
+    code_items_dets = _get_code_items_dets(output_settings)
+    report_path = Pipeline.display_project_report(iter(code_items_dets), output_settings, project_path=Path('proj'))
+    index_path = report_path / html_displayer.REPORT_INDEX_FNAME
+    assert opened_urls == [index_path.as_uri()]
+    index_html = index_path.read_text()
+    module_page_paths = sorted((report_path / html_displayer.REPORT_MODULES_FOLDER).iterdir())
+    assert [path.name for path in module_page_paths] == [
+        f"{n}_{code_file_path.stem}.html" for n, (_code, code_file_path) in enumerate(CODE_ITEMS, 1)]
+    for module_page_path in module_page_paths:
+        assert f"href='{html_displayer.REPORT_MODULES_FOLDER}/{module_page_path.name}'" in index_html
+    n_warnings = Counter(message_dets.source
+        for _code, _code_file_path, messages_dets, _multi_block in code_items_dets
+        for message_dets in [*messages_dets[0], *messages_dets[1]] if message_dets.warning)
+    for source, n in n_warnings.items():
+        assert f"<tr><td>{source}</td><td class='count'>{n:,}</td>" in index_html
+
+def test_report_module_page_names(tmp_path):
+    """
+    Paths which clean to the same name (e.g. pkg/a_b.py and pkg_a/b.py) should still get their own pages,
+    and page urls should be safe to use as they are.
+    """
+    report_path = html_displayer.make_report_folder(tmp_html_path=tmp_path)
+    code_file_paths = [Path('pkg/a_b.py'), Path('pkg_a/b.py'), Path('pkg/odd #name?.py')]
+    page_urls = [html_displayer.write_report_module_page(str(code_file_path),
+            report_path=report_path, code_file_path=code_file_path, page_n=page_n)
+        for page_n, code_file_path in enumerate(code_file_paths, 1)]
+    assert page_urls[-1] == f"{html_displayer.REPORT_MODULES_FOLDER}/3_odd%20%23name%3F.html"
+    for page_url, code_file_path in zip(page_urls, code_file_paths):
+        assert (report_path / unquote(page_url)).read_text() == str(code_file_path)
+
+def test_json_output():
+    output_settings = OutputSettings(format_name=conf.Format.JSON, jobs=1, use_cache=False)
+    code_items_dets = _get_code_items_dets(output_settings)
+    formatted_help_dets = list(Pipeline.get_formatted_help_dets(iter(code_items_dets), output_settings))
+    assert len(formatted_help_dets) == len(CODE_ITEMS)
+    for (formatted_help, code_file_path), (_code, _file_path, messages_dets, multi_block) in zip(
+            formatted_help_dets, code_items_dets):
+        assert '\n' not in formatted_help  ## so a project is JSON Lines
+        code_item_dict = json.loads(formatted_help)
+        assert code_item_dict['code_file_path'] == str(code_file_path)
+        assert code_item_dict['multi_block'] == multi_block
+        overall_messages_dets, block_messages_dets = messages_dets
+        message_dicts = code_item_dict['messages']
+        assert len(message_dicts) == len(overall_messages_dets) + len(block_messages_dets)
+        assert sorted((message_dict['source'], message_dict['warning'], message_dict['first_line_no'])
+            for message_dict in message_dicts if message_dict['scope'] == 'block') == sorted(
+            (message_dets.source, message_dets.warning, message_dets.first_line_no)
+            for message_dets in block_messages_dets)
+        for message_dict in message_dicts:
+            assert set(message_dict['message_level_strs']) == set(conf.LEVEL_OPTIONS)
+            assert conf.PYTHON_CODE_START not in message_dict['message_level_strs'][conf.Level.MAIN]
+
+def test_lazy_helpers(monkeypatch, tmp_path):
+    """
+    Helpers registered from the manifest must be the same helpers, in the same order, as registered by importing
+    every helper module - and must give the same results - but importing SuperHELP shouldn't import any of them.
+    """
+    helpers.load_helpers()
+    eager_manifest = helper_manifest.get_helper_manifest()
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    helper_manifest.store_helper_manifest()
+    eager_code_items_dets = _get_code_items_dets(OutputSettings(jobs=1, use_cache=False))
+    orig_helper_specs = {kind: list(helper_specs) for kind, helper_specs in helper_manifest.KIND2HELPER_SPECS.items()}
+    try:
+        assert helper_manifest.register_helpers_from_manifest()
+        for helper_specs in helper_manifest.KIND2HELPER_SPECS.values():
+            assert all(isinstance(helper_spec.helper, helpers.LazyHelperFunc) for helper_spec in helper_specs)
+        assert helper_manifest.get_helper_manifest() == eager_manifest
+        lazy_code_items_dets = _get_code_items_dets(OutputSettings(jobs=1, use_cache=False))
+        assert lazy_code_items_dets == eager_code_items_dets
+    finally:
+        for kind, helper_specs in helper_manifest.KIND2HELPER_SPECS.items():
+            helper_specs[:] = orig_helper_specs[kind]
+    ## a fresh process imports no helper modules (nor what they need e.g. flake8)
+    package_path = Path(__file__).parent.parent
+    check_imports = dedent("""\
+        import sys
+        import superhelp.helper
+        print(sorted(name for name in sys.modules
+            if name.startswith('superhelp.helpers.') or name.split('.')[0] == 'flake8'))
+        """)
+    result = subprocess.run([sys.executable, '-c', check_imports], cwd=package_path,
+        capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '[]', result.stdout + result.stderr
+
+def test_untrusted_helper_manifest(monkeypatch, tmp_path):
+    """
+    A manifest referring to anything outside the SuperHELP helper modules (e.g. planted to run builtins.exec),
+    or not belonging to the current user, should be ignored.
+    """
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    helpers.load_helpers()
+    manifest = helper_manifest.get_helper_manifest()
+    manifest['helpers'][0]['module'] = 'builtins'
+    manifest['helpers'][0]['func_name'] = 'exec'
+    manifest_path = helper_manifest.get_manifest_path()
+    manifest_path.parent.mkdir(mode=0o700, parents=True)
+    manifest_path.write_text(json.dumps(manifest), encoding='utf-8')
+    assert helper_manifest._read_helper_manifest() is None
+    helper_manifest.store_helper_manifest()
+    assert helper_manifest._read_helper_manifest() is not None
+    uid = os.getuid()
+    monkeypatch.setattr(os, 'getuid', lambda: uid + 1)  ## as if someone else
+    assert helper_manifest._read_helper_manifest() is None
+
+HEAVY_MODULES = ['astpath', 'concurrent.futures', 'flake8', 'importlib.metadata', 'lxml', 'markdown',
+    'multiprocessing', 'pygments', 'tabulate']
+
+def test_light_import(monkeypatch, tmp_path):
+    """
+    Importing SuperHELP (and getting the JSON formatter and displayer) shouldn't import anything heavy
+    e.g. markdown and pygments are only for the terminal, HTML, and Markdown formats - nor any helper modules.
+    How long the import takes is measured by benchmarks/import_benchmark.py.
+    """
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    helper_manifest.store_helper_manifest()  ## as made on first run
+    check_import = dedent("""\
+        import sys
+        import superhelp
+        from superhelp import conf
+        from superhelp.helper import Pipeline
+        Pipeline._get_formatter_module(conf.Format.JSON)
+        Pipeline._get_displayer_module(conf.Format.JSON)
+        print(sorted(name for name in sys.modules if name.split('.')[0] in {heavy_modules}
+            or name in {heavy_modules} or name.startswith('superhelp.helpers.')))
+        """).format(heavy_modules=set(HEAVY_MODULES))
+    package_path = Path(__file__).parent.parent
+    result = subprocess.run([sys.executable, '-c', check_import], cwd=package_path,
+        capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '[]', result.stdout + result.stderr
+
+def test_daemon(monkeypatch, tmp_path):
+    """
+    Help from the daemon must be the same as help worked out in-process.
+    """
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmp_path))  ## so the daemon state file is ours alone
+    monkeypatch.setattr(conf, 'INCLUDE_LINTING', True)  ## as in the daemon
+    package_path = Path(__file__).parent.parent
+    daemon_process = subprocess.Popen([sys.executable, '-c', 'from superhelp import daemon; daemon.serve()'],
+        cwd=package_path, stdout=subprocess.PIPE, text=True)
+    try:
+        assert 'listening' in daemon_process.stdout.readline()
+        daemon_dets = daemon.get_daemon_dets()
+        assert daemon_dets.pid == daemon_process.pid
+        state_path = daemon.get_daemon_state_path()
+        assert stat.S_IMODE(state_path.stat().st_mode) == 0o600
+        assert stat.S_IMODE(state_path.parent.stat().st_mode) == 0o700
+        ## a state file others could read (or which isn't ours) is ignored
+        state_path.chmod(0o644)
+        assert daemon.get_daemon_dets() is None
+        state_path.chmod(0o600)
+        uid = os.getuid()
+        with monkeypatch.context() as other_user_monkeypatch:
+            other_user_monkeypatch.setattr(os, 'getuid', lambda: uid + 1)  ## as if someone else
+            assert daemon.get_daemon_dets() is None
+        assert daemon.get_daemon_dets() == daemon_dets
+        code_items = CODE_ITEMS + [(CODE_ITEMS[0][0], None)]
+        all_output_settings = [OutputSettings(format_name=format_name, use_cache=False)
+            for format_name in (conf.Format.JSON, conf.Format.MD, conf.Format.JSON, conf.Format.MD)]
+        with ThreadPoolExecutor(max_workers=len(all_output_settings)) as executor:  ## requests at the same time
+            all_daemon_formatted_help_dets = list(executor.map(
+                partial(daemon.request_formatted_help_dets, code_items), all_output_settings))
+        for output_settings, daemon_formatted_help_dets in zip(all_output_settings, all_daemon_formatted_help_dets):
+            code_items_dets = Pipeline.get_code_items_dets(iter(code_items), output_settings=output_settings)
+            assert daemon_formatted_help_dets == list(
+                Pipeline.get_formatted_help_dets(code_items_dets, output_settings))
+        ## no daemon help without the token
+        bad_daemon_dets = daemon.DaemonDets(**{**daemon_dets.__dict__, 'token': 'guess'})
+        monkeypatch.setattr(daemon, 'get_daemon_dets', lambda: bad_daemon_dets)
+        assert daemon.request_formatted_help_dets(code_items, OutputSettings()) is None
+    finally:
+        daemon_process.terminate()
+        daemon_process.wait(timeout=10)
+        daemon_process.stdout.close()
+    assert not daemon.get_daemon_state_path().exists()
+
+def test_async_pipeline(monkeypatch):
+    """
+    Concurrent async runs sharing a small pool of threads must each get exactly what a run on its own would get
+    (e.g. lint messages explained in full, their own terminal colours) - and must not block the event loop.
+    """
+    monkeypatch.setattr(conf, 'INCLUDE_LINTING', True)
+    all_output_settings = [
+        OutputSettings(format_name=conf.Format.CLI, theme_name=conf.Theme.DARK, use_cache=False),
+        OutputSettings(format_name=conf.Format.CLI, theme_name=conf.Theme.LIGHT, use_cache=False),
+        OutputSettings(format_name=conf.Format.JSON, use_cache=True),
+        OutputSettings(format_name=conf.Format.MD, detail_level=conf.Level.BRIEF, use_cache=False),
+    ] * 2
+    expected_formatted_help_dets = [
+        list(Pipeline.get_formatted_help_dets(Pipeline.get_code_items_dets(iter(CODE_ITEMS),
+            output_settings=output_settings), output_settings))
+        for output_settings in all_output_settings]
+
+    async def code_items():
+        for code_item in CODE_ITEMS:
+            yield code_item
+            await asyncio.sleep(0)
+
+    async def get_formatted_help_dets(pipeline, output_settings):
+        code_items_dets = pipeline.get_code_items_dets(code_items(), output_settings=output_settings)
+        return [formatted_help_dets async for formatted_help_dets
+            in pipeline.get_formatted_help_dets(code_items_dets, output_settings)]
+
+    async def run_all():
+        n_ticks = 0
+        async def tick():
+            nonlocal n_ticks
+            while True:
+                n_ticks += 1
+                await asyncio.sleep(0.001)
+        ticker = asyncio.create_task(tick())
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            pipeline = async_helper.AsyncPipeline(executor)
+            all_formatted_help_dets = await asyncio.gather(*[get_formatted_help_dets(pipeline, output_settings)
+                for output_settings in all_output_settings])
+        ticker.cancel()
+        return all_formatted_help_dets, n_ticks
+
+    all_formatted_help_dets, n_ticks = asyncio.run(run_all())
+    assert all_formatted_help_dets == expected_formatted_help_dets
+    assert n_ticks > 10  ## the event loop kept running while the work was done
+
+    async def get_snippet_help():
+        return [formatted_help_dets async for formatted_help_dets in async_helper.get_formatted_help_dets(
+            CODE_ITEMS[0][0], output_settings=all_output_settings[0])]
+    assert asyncio.run(get_snippet_help()) == list(helper.get_formatted_help_dets(
+        CODE_ITEMS[0][0], output_settings=all_output_settings[0]))
+
+def test_concurrent_sessions(monkeypatch):
+    """
+    Runs in threads at the same time (each with its own analysis session) must each get exactly what
+    a run on its own would get e.g. lint messages explained in full, and terminal help in its own colours.
+    """
+    monkeypatch.setattr(conf, 'INCLUDE_LINTING', True)
+    all_output_settings = [
+        OutputSettings(format_name=conf.Format.CLI, theme_name=theme_name, use_cache=use_cache)
+        for theme_name, use_cache in product(conf.THEME_OPTIONS, [True, False])] * 3
+    code = '\n'.join(code for code, _code_file_path in CODE_ITEMS if not code.startswith('def broken'))
+
+    def get_formatted_help(output_settings):
+        return list(helper.get_formatted_help_dets(code, output_settings=output_settings))
+
+    expected_formatted_help_dets = [get_formatted_help(output_settings) for output_settings in all_output_settings]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        all_formatted_help_dets = list(executor.map(get_formatted_help, all_output_settings))
+    assert all_formatted_help_dets == expected_formatted_help_dets
+    session = Pipeline.new_session(OutputSettings())
+    list(Pipeline.get_code_items_dets(iter(CODE_ITEMS), output_settings=OutputSettings(), session=session))
+    assert session.repeat_set and session.lint_supplemented  ## all tracked in the session
+
+def test_profile(monkeypatch):
+    """
+    Profiling must time every stage and helper without changing the help.
+    """
+    monkeypatch.setattr(conf, 'INCLUDE_LINTING', True)
+    code = CODE_ITEMS[2][0]
+    output_settings = OutputSettings(format_name=conf.Format.MD)
+    profiled_output_settings = OutputSettings(format_name=conf.Format.MD, profile=True)
+    session = Pipeline.new_session(profiled_output_settings)
+    assert (list(helper.get_formatted_help_dets(code, output_settings=profiled_output_settings, session=session))
+        == list(helper.get_formatted_help_dets(code, output_settings=output_settings)))
+    profile_dict = session.profile.to_dict()
+    assert set(profile_dict['stages']) == {'parse', 'blocks', 'prepare', 'format', 'helpers', 'filters'}
+    for_index_timing = profile_dict['helpers']['superhelp.helpers.for_help.for_index_iteration']
+    assert for_index_timing['calls'] == 1 and for_index_timing['messages'] == 1 and for_index_timing['matches'] == 1
+    helper_costs = [timing['total_secs'] + timing['filter_secs'] for timing in profile_dict['helpers'].values()]
+    assert helper_costs == sorted(helper_costs, reverse=True)
+    assert helper.get_help_profile(code, output_settings=output_settings).keys() == profile_dict.keys()
+    assert helper.show_help(code, output_settings=output_settings) is None